@@ -0,0 +1,198 @@
+"""
+This module deals with turning a country's months into time series for charts
+over long periods.
+
+A country's hits, sentiment and magnitude become a DataFrame indexed by the
+first day of each month, so charts get a real time axis instead of one label
+per month. The series can be rolled up into quarters or years: hits are added
+up, and sentiment and magnitude are averaged weighted by each month's hits, so
+a month with many articles counts for more than a quiet one. The rollups of a
+country are made once and kept until its data file changes.
+
+Charts choose the finest period that fits in a number of points, and past the
+yearly rollup thin the points out with downsample_indices, so drawing fifty
+years of data costs the same as drawing a few.
+"""
+from functools import lru_cache
+from dataset import file_version
+from dates import parse_year_months, to_year_months
+from lazy import lazy_import
+from storage import country_data_source, frame_columns, read_frame
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+HITS = "Number of Hits"
+SENTIMENT = "Sentiment Score (-1 to 1)"
+MAGNITUDE = "Magnitude"
+SERIES_COLUMNS = [HITS, SENTIMENT, MAGNITUDE]
+
+# Months in each period a series can be rolled up to.
+PERIODS = {"month": 1, "quarter": 3, "year": 12}
+
+# Most points drawn on a chart over time; fifty years of months.
+MAX_POINTS = 600
+
+def monthly_series(frame):
+    """
+    Turn a country's data into a time series.
+
+    Args:
+        frame: A pandas DataFrame with a "MM-YYYY" column and any of the
+        hits, sentiment and magnitude columns.
+
+    Returns:
+        A pandas DataFrame of the hits, sentiment and magnitude columns (NaN
+        for any frame does not have), indexed by a DatetimeIndex of the first
+        day of each month named "Month".
+    """
+    months = parse_year_months(to_year_months(frame["MM-YYYY"]))
+    return pd.DataFrame(
+        {column: pd.to_numeric(frame[column]).to_numpy(dtype=float)
+         if column in frame else np.full(len(frame), np.nan)
+         for column in SERIES_COLUMNS},
+        index=pd.DatetimeIndex(months.astype("datetime64[ns]"), name="Month"))
+
+def hit_weighted(values, hits, groups, group_count):
+    """
+    Average values within groups, weighted by hits, skipping missing values.
+
+    Args:
+        values: A NumPy float array.
+        hits: A NumPy float array of the same length.
+        groups: A NumPy int array of each value's group number.
+        group_count: An int representing the number of groups.
+
+    Returns:
+        A NumPy float array with one average per group, NaN for a group with
+        no hits.
+    """
+    present = ~np.isnan(values)
+    weights = np.bincount(groups, np.where(present, hits, 0), group_count)
+    sums = np.bincount(groups, np.where(present, values * hits, 0), group_count)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(weights > 0, sums / weights, np.nan)
+
+def rollup(series, period):
+    """
+    Roll a monthly series up into longer periods.
+
+    Args:
+        series: A DataFrame as returned by monthly_series.
+        period: A string, one of the keys of PERIODS.
+
+    Returns:
+        A DataFrame like series with one row per period, indexed by the first
+        day of the period, with the hits added up, sentiment and magnitude
+        weighted by hits, and a "Months" column of the number of months in
+        each period.
+    """
+    months = series.index.values.astype("datetime64[M]").astype(np.int64)
+    periods, groups = np.unique(months // PERIODS[period], return_inverse=True)
+    hits = np.nan_to_num(series[HITS].to_numpy(dtype=float))
+
+    rolled = pd.DataFrame(
+        {HITS: np.bincount(groups, hits, len(periods)),
+         SENTIMENT: hit_weighted(series[SENTIMENT].to_numpy(dtype=float), hits,
+                                 groups, len(periods)),
+         MAGNITUDE: hit_weighted(series[MAGNITUDE].to_numpy(dtype=float), hits,
+                                 groups, len(periods)),
+         "Months": np.bincount(groups, minlength=len(periods))},
+        index=pd.DatetimeIndex(
+            (periods * PERIODS[period]).astype("datetime64[M]").astype(
+                "datetime64[ns]"), name="Month"))
+    return rolled
+
+@lru_cache(maxsize=32)
+def _country_rollups(filepath, version):
+    """
+    Read a data file and roll it up into every period. The file's version is
+    only part of the cache key.
+    """
+    del version
+    # Files not processed yet have no sentiment columns; monthly_series gives
+    # them NaN scores.
+    present = frame_columns(filepath)
+    series = monthly_series(read_frame(filepath, ["MM-YYYY"] + [
+        column for column in SERIES_COLUMNS if column in present]))
+    return {period: rollup(series, period) for period in PERIODS}
+
+def country_rollups(country_name):
+    """
+    Give a country's series rolled up into every period, made once per
+    version of its data file.
+
+    Args:
+        country_name: A string representing the name of the country.
+
+    Returns:
+        A dictionary from each period in PERIODS to a DataFrame as returned
+        by rollup. The DataFrames are shared and should not be modified.
+    """
+    filepath = country_data_source(country_name)
+    return _country_rollups(filepath, file_version(filepath))
+
+def downsample_indices(x_values, y_values, max_points):
+    """
+    Choose which points of a series to draw so its shape is kept, using the
+    Largest-Triangle-Three-Buckets method: the points are split into
+    max_points buckets, and from each the point forming the largest triangle
+    with the point kept before it and the average of the next bucket is kept.
+
+    Args:
+        x_values: A NumPy array of numbers, in increasing order.
+        y_values: A NumPy array of numbers without NaN.
+        max_points: An int representing how many points to keep, at least 3.
+
+    Returns:
+        A NumPy int array of the positions of the points to keep, including
+        the first and last.
+    """
+    count = len(y_values)
+    if count <= max_points or max_points < 3:
+        return np.arange(count)
+
+    x_values = np.asarray(x_values, dtype=float)
+    y_values = np.asarray(y_values, dtype=float)
+    edges = np.linspace(1, count - 1, max_points - 1).astype(int)
+    kept = [0]
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+        else:
+            next_start, next_end = count - 1, count
+        next_x = x_values[next_start:next_end].mean()
+        next_y = y_values[next_start:next_end].mean()
+        last_x, last_y = x_values[kept[-1]], y_values[kept[-1]]
+        areas = np.abs((last_x - next_x) * (y_values[start:end] - last_y)
+                       - (last_x - x_values[start:end]) * (next_y - last_y))
+        kept.append(start + int(np.argmax(areas)))
+    kept.append(count - 1)
+    return np.array(kept)
+
+def chart_series(country_name, period="auto", max_points=MAX_POINTS):
+    """
+    Give the points to draw for a country's chart over time.
+
+    Args:
+        country_name: A string representing the name of the country.
+        period: A string, one of the keys of PERIODS, or "auto" for the
+        finest period with at most max_points points. (Optional).
+        max_points: An int representing the most points to draw. A series
+        with more is downsampled. (Optional).
+
+    Returns:
+        A tuple of a DataFrame as returned by rollup, with at most max_points
+        rows, and the name of its period.
+    """
+    rollups = country_rollups(country_name)
+    if period == "auto":
+        period = next((name for name in PERIODS
+                       if len(rollups[name]) <= max_points), "year")
+    series = rollups[period]
+    if len(series) > max_points:
+        x_values = series.index.values.astype(np.int64)
+        series = series.iloc[downsample_indices(
+            x_values, series[HITS].to_numpy(dtype=float), max_points)]
+    return series, period
@@ -0,0 +1,424 @@
+"""
+This module deals with measuring how long the whole workflow takes on much
+more data than has been collected so far, so changes that slow it down can be
+caught.
+
+A benchmark run makes a synthetic dataset of scale countries, each as large as
+Chile_data.csv (so scale 10, 100 and 1000 hold 10, 100 and 1000 times its
+data): Chile's months and headlines, shifted by a different number of months
+for each country, with the country's name in place of Chile's and hits scaled
+by a random factor. It then times each stage on that data:
+    synthesize: write the synthetic data files.
+    collect: collect headlines into new data files from a stub Article Search
+        server (see stub_api) that waits latency seconds per request and
+        answers 429 past requests_per_second.
+    survey: count the hits of every synthetic country with hits-only
+        requests to the stub.
+    process_api: score the collected countries with a SentimentEngine
+        pointed at the stub's analyzeSentiment endpoint.
+    process: score every synthetic country with the lexicon backend.
+    index: add every country to a search index, and search: run queries on it.
+    termcounts: count the words of every country for word clouds.
+    render: save the charts of a few countries, and a comparison chart of
+        every country.
+Everything runs in a scratch folder, never touching CountryData.
+
+Each run's stage times are added to .benchmarks/results.jsonl with the commit
+they were measured on, and runs of two commits can be compared, for example:
+    python benchmark.py --scales 10 100 --latency 0.05
+    python benchmark.py --compare 1b6a529 HEAD
+"""
+import argparse
+from contextlib import contextmanager
+import json
+import os
+from os import path
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import obtaining
+from flags import flag_path
+from lazy import lazy_import
+from obtaining import survey_hits, write_hits_and_headlines_to_file
+from panel import load_panel
+from processing import sentiment_and_magnitude_to_csv
+from rendering import save_chart
+from scheduling import FetchScheduler
+from search import TermIndex
+from sentiment import LexiconSentimentBackend, SentimentEngine
+from storage import DATA_FOLDER, HEADLINES, country_data_path, read_frame
+from stub_api import StubAPIServer
+from termcounts import load_term_counts
+
+np = lazy_import("numpy")
+
+SCALES = (10, 100, 1000)
+SOURCE_COUNTRY = "Chile"
+RESULTS_FILE = ".benchmarks/results.jsonl"
+STAGES = ("synthesize", "collect", "survey", "process_api", "process", "index",
+          "search", "termcounts", "render")
+
+# Queries timed by the search stage.
+SEARCH_QUERIES = ("coup", "military AND junta", '"human rights"',
+                  "election NOT coup")
+
+def synthetic_country_name(number):
+    """
+    Name a synthetic country.
+
+    Args:
+        number: An int.
+
+    Returns:
+        A string, such as "Synthetica0007".
+    """
+    return f"Synthetica{number:04d}"
+
+def synthesize_dataset(scale, source_country=SOURCE_COUNTRY, seed=0):
+    """
+    Write the data files of scale synthetic countries, each made from the
+    source country's data, into the current folder's CountryData.
+
+    Args:
+        scale: An int representing the number of countries.
+        source_country: A string representing the name of the country whose
+        data file, in the repository's CountryData, is copied. (Optional).
+        seed: An int seeding the random hit counts. (Optional).
+
+    Returns:
+        A list of strings of the synthetic country names.
+    """
+    source = read_frame(path.join(path.dirname(path.abspath(__file__)),
+                                  country_data_path(source_country)))
+    rng = np.random.default_rng(seed)
+    os.makedirs(DATA_FOLDER, exist_ok=True)
+
+    names = []
+    for number in range(scale):
+        name = synthetic_country_name(number)
+        shift = number % len(source)
+        frame = source.copy()
+        frame["Country Name"] = name
+        frame[HEADLINES] = np.roll(
+            source[HEADLINES].astype(str).str.replace(
+                source_country, name).str.replace(
+                    source_country.upper(), name.upper()).to_numpy(), shift)
+        frame["Number of Hits"] = np.round(
+            np.roll(source["Number of Hits"].to_numpy(), shift)
+            * rng.lognormal(0, 0.5)).astype(int)
+        frame["Sentiment Score (-1 to 1)"] = np.nan
+        frame["Magnitude"] = np.nan
+        frame.to_csv(country_data_path(name), index=False)
+        names.append(name)
+    return names
+
+@contextmanager
+def working_folder(folder):
+    """
+    Run the body of a with statement in another folder.
+
+    Args:
+        folder: A string representing the folder.
+
+    Yields:
+        The folder.
+    """
+    previous = os.getcwd()
+    os.makedirs(folder, exist_ok=True)
+    os.chdir(folder)
+    try:
+        yield folder
+    finally:
+        os.chdir(previous)
+
+def timed(stages, stage, func, *args, **kwargs):
+    """
+    Call a function and record how long it took.
+
+    Args:
+        stages: A dictionary from stage names to seconds to record in.
+        stage: A string naming the stage.
+        func: The function to call.
+        *args: The arguments to call func with.
+        **kwargs: The keyword arguments to call func with.
+
+    Returns:
+        What func returned.
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    stages[stage] = time.perf_counter() - start
+    return result
+
+def stub_scheduler(requests_per_second):
+    """
+    Make a scheduler that keeps to the stub's rate limit, or sends as fast as
+    it can if the stub has none.
+    """
+    requests_per_minute = 600000 if requests_per_second is None \
+        else requests_per_second * 60
+    return FetchScheduler(requests_per_minute=requests_per_minute,
+                          requests_per_day=None, max_workers=8, burst=8,
+                          base_backoff=0.05, max_backoff=1)
+
+def run_benchmark(scale, folder, latency=0.05, requests_per_second=None,
+                  collect_countries=2, collect_months=12, render_countries=3):
+    """
+    Time every stage of the workflow on a synthetic dataset.
+
+    Args:
+        scale: An int representing the number of synthetic countries, each as
+        large as the source country's data.
+        folder: A string representing an empty scratch folder to work in.
+        latency: A float representing the seconds the stub server waits
+        before answering each request. (Optional).
+        requests_per_second: A float representing the stub server's rate
+        limit, or None for no limit. (Optional).
+        collect_countries: An int representing how many countries to collect
+        from the stub. (Optional).
+        collect_months: An int representing how many months to collect for
+        each, starting at January 1973. (Optional).
+        render_countries: An int representing how many countries to save
+        charts for. (Optional).
+
+    Returns:
+        A dictionary from each stage in STAGES to the seconds it took.
+    """
+    stages = {}
+    end_month = obtaining.month_list("197301", "209912")[collect_months - 1]
+    with working_folder(folder), StubAPIServer(
+            latency=latency, requests_per_second=requests_per_second,
+            burst=8) as stub:
+        names = timed(stages, "synthesize", synthesize_dataset, scale)
+
+        article_search_url = obtaining.ARTICLE_SEARCH_URL
+        obtaining.ARTICLE_SEARCH_URL = stub.article_search_url
+        try:
+            with stub_scheduler(requests_per_second) as scheduler:
+                collected = [f"Collected{number}"
+                             for number in range(collect_countries)]
+                timed(stages, "collect", lambda: [
+                    write_hits_and_headlines_to_file(
+                        name, "197301", end_month, "key", scheduler)
+                    for name in collected])
+                timed(stages, "survey", survey_hits, names, "197301",
+                      end_month, "key", scheduler)
+        finally:
+            obtaining.ARTICLE_SEARCH_URL = article_search_url
+
+        with stub_scheduler(requests_per_second) as scheduler, \
+                SentimentEngine(stub.sentiment_url,
+                                scheduler=scheduler) as engine:
+            timed(stages, "process_api", lambda: [
+                sentiment_and_magnitude_to_csv(name, backend=engine)
+                for name in collected])
+
+        backend = LexiconSentimentBackend()
+        timed(stages, "process", lambda: [
+            sentiment_and_magnitude_to_csv(name, backend=backend)
+            for name in names])
+
+        index = TermIndex(path.join(".cache", "terms.sqlite"))
+        try:
+            timed(stages, "index", lambda: [index.add_country(name)
+                                            for name in names])
+            timed(stages, "search", lambda: [index.search(query)
+                                             for query in SEARCH_QUERIES])
+        finally:
+            index.close()
+
+        timed(stages, "termcounts", lambda: [load_term_counts(name)
+                                             for name in names])
+
+        def render():
+            os.makedirs("Charts", exist_ok=True)
+            flag = path.join(path.dirname(path.abspath(__file__)),
+                             flag_path(SOURCE_COUNTRY))
+            os.makedirs(path.dirname(flag_path(names[0])), exist_ok=True)
+            for name in names[:render_countries]:
+                shutil.copyfile(flag, flag_path(name))
+                for chart in ("scatter", "bubble", "word_cloud"):
+                    save_chart(path.join("Charts", f"{name}_{chart}.png"),
+                               chart, name, **(
+                                   {"preview": True}
+                                   if chart == "word_cloud" else {}))
+            load_panel(names)
+            save_chart(path.join("Charts", "comparison.png"), "comparison",
+                       names, normalization="zscore", window=12)
+
+        timed(stages, "render", render)
+    return stages
+
+def current_commit():
+    """
+    Give the commit the working tree is on.
+
+    Returns:
+        A string of the abbreviated commit hash, with "+" added if there are
+        uncommitted changes, or "unknown" outside a git repository.
+    """
+    repository = path.dirname(path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                cwd=repository, check=True,
+                                capture_output=True, text=True).stdout.strip()
+        changes = subprocess.run(["git", "status", "--porcelain",
+                                  "--untracked-files=no"],
+                                 cwd=repository, check=True,
+                                 capture_output=True, text=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit + ("+" if changes.strip() else "")
+
+def save_result(result, filepath=RESULTS_FILE):
+    """
+    Add a run's result to the results file.
+
+    Args:
+        result: A dictionary as made by main, with "commit", "scale" and
+        "stages" keys.
+        filepath: A string representing the path of the JSON lines file.
+        (Optional).
+
+    Returns:
+        None.
+    """
+    if path.dirname(filepath):
+        os.makedirs(path.dirname(filepath), exist_ok=True)
+    with open(filepath, "a", encoding="utf-8") as results_file:
+        results_file.write(json.dumps(result) + "\n")
+
+def load_results(filepath=RESULTS_FILE):
+    """
+    Read every result saved by save_result.
+
+    Args:
+        filepath: A string representing the path of the JSON lines file.
+        (Optional).
+
+    Returns:
+        A list of result dictionaries, empty if there is no file.
+    """
+    if not path.exists(filepath):
+        return []
+    with open(filepath, encoding="utf-8") as results_file:
+        return [json.loads(line) for line in results_file if line.strip()]
+
+def resolve_commit(commit):
+    """
+    Turn a commit name such as HEAD into the abbreviated hash results are
+    saved under, leaving it as it is if git can't resolve it.
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", commit],
+                              cwd=path.dirname(path.abspath(__file__)),
+                              check=True, capture_output=True,
+                              text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return commit
+
+def compare_results(results, base_commit, head_commit):
+    """
+    Compare the stage times of two commits, using the median of each
+    commit's runs at each scale.
+
+    Args:
+        results: A list of result dictionaries, as given by load_results.
+        base_commit: A string representing the commit to compare against, as
+        saved by current_commit, so ending in "+" for runs with uncommitted
+        changes.
+        head_commit: A string representing the commit being compared.
+
+    Returns:
+        A dictionary from (scale, stage) tuples to (base seconds, head
+        seconds, head divided by base) tuples, for the scales and stages both
+        commits have results for.
+    """
+    def medians(commit):
+        times = {}
+        for result in results:
+            if result["commit"] == commit:
+                for stage, seconds in result["stages"].items():
+                    times.setdefault((result["scale"], stage), []).append(
+                        seconds)
+        return {key: statistics.median(values)
+                for key, values in times.items()}
+
+    base = medians(base_commit)
+    head = medians(head_commit)
+    return {key: (base[key], head[key],
+                  head[key] / base[key] if base[key] else float("inf"))
+            for key in sorted(base.keys() & head.keys(),
+                              key=lambda key: (key[0], STAGES.index(key[1])
+                                               if key[1] in STAGES else 0))}
+
+def main(argv=None):
+    """
+    Run benchmarks or compare results from the command line.
+
+    Args:
+        argv: A list of the command line arguments. Default is sys.argv.
+        (Optional).
+
+    Returns:
+        An int exit status: 0, or 1 if a comparison finds no common results.
+    """
+    parser = argparse.ArgumentParser(
+        description="Time the workflow on synthetic data.")
+    parser.add_argument("--scales", nargs="+", type=int, default=[SCALES[0]],
+                        help="numbers of synthetic countries, each as large "
+                        f"as {SOURCE_COUNTRY}'s data (default: {SCALES[0]}; "
+                        f"the standard scales are {SCALES})")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="seconds the stub API waits per request")
+    parser.add_argument("--requests-per-second", type=float,
+                        help="stub API rate limit (default: none)")
+    parser.add_argument("--collect-countries", type=int, default=2)
+    parser.add_argument("--collect-months", type=int, default=12)
+    parser.add_argument("--render-countries", type=int, default=3)
+    parser.add_argument("--folder", help="scratch folder (default: a new "
+                        "temporary folder, removed after)")
+    parser.add_argument("--results", default=RESULTS_FILE,
+                        help="results file to add to or compare from")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "HEAD"),
+                        help="compare two commits' saved results")
+    args = parser.parse_args(argv)
+    results_path = path.abspath(args.results)
+
+    if args.compare:
+        comparison = compare_results(load_results(results_path),
+                                     *map(resolve_commit, args.compare))
+        for (scale, stage), (base, head, ratio) in comparison.items():
+            print(f"{scale:>6} {stage:<12} {base:10.3f}s {head:10.3f}s "
+                  f"{ratio:6.2f}x")
+        return 0 if comparison else 1
+
+    commit = current_commit()
+    for scale in args.scales:
+        folder = args.folder or tempfile.mkdtemp(prefix="benchmark-")
+        try:
+            stages = run_benchmark(
+                scale, path.join(folder, str(scale)), args.latency,
+                args.requests_per_second, args.collect_countries,
+                args.collect_months, args.render_countries)
+        finally:
+            if not args.folder:
+                shutil.rmtree(folder, ignore_errors=True)
+        result = {"commit": commit, "time": time.time(), "scale": scale,
+                  "python": platform.python_version(),
+                  "options": {"latency": args.latency,
+                              "requests_per_second": args.requests_per_second,
+                              "collect_countries": args.collect_countries,
+                              "collect_months": args.collect_months,
+                              "render_countries": args.render_countries},
+                  "stages": stages}
+        save_result(result, results_path)
+        for stage, seconds in stages.items():
+            print(f"{scale:>6} {stage:<12} {seconds:10.3f}s")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
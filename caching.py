@@ -0,0 +1,261 @@
+"""
+This module deals with keeping API responses on disk so that requests that
+have already been answered do not need to be sent again.
+
+Responses are stored in a SQLite file under a key made from the endpoint and
+the normalized request parameters (search term, date range, page, or a hash of
+the text being analyzed). API keys are never part of the key, so a cache can be
+shared between people with different keys. Entries can expire after a time to
+live, and the least recently used entries are dropped once the cache grows past
+a size limit.
+
+A cache runs in one of three modes:
+    "normal": use stored responses and store new ones.
+    "cache-only": never touch the network, and raise CacheMiss for anything
+    not stored (expired entries are still used).
+    "refresh": always send the request and store the new response.
+"""
+from concurrent.futures import Future
+import hashlib
+import json
+from os import makedirs, path
+import sqlite3
+import threading
+import time
+from lazy import lazy_import
+from metrics import count
+
+requests = lazy_import("requests")
+
+DEFAULT_CACHE_PATH = ".cache/responses.sqlite"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+MODES = ("normal", "cache-only", "refresh")
+
+# Parameters that only identify who is asking, not what is being asked for.
+IGNORED_PARAMS = {"api-key", "key"}
+
+class CacheMiss(KeyError):
+    """
+    Raised when a cache in "cache-only" mode does not have a response.
+    """
+
+def text_hash(text):
+    """
+    Hash a piece of text for use in a cache key.
+
+    Args:
+        text: A string.
+
+    Returns:
+        A string of the hexadecimal SHA-256 digest of the UTF-8 text.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    A size-bounded, persistent cache of successful API responses.
+
+    Attributes:
+        mode: A string that is one of MODES.
+        ttl: A number representing how many seconds a response stays fresh, or
+        None if responses never expire.
+        max_bytes: An int representing the largest total size of stored
+        response bodies before old ones are evicted.
+        stats: A dictionary counting cache "hits", "misses", "stores" and
+        "evictions".
+    """
+
+    def __init__(self, filepath=DEFAULT_CACHE_PATH, mode="normal", ttl=None,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            filepath: A string representing the path of the SQLite file.
+            (Optional).
+            mode: A string that is one of MODES. (Optional).
+            ttl: A number of seconds after which responses expire. Default is
+            None, which keeps them forever. (Optional).
+            max_bytes: An int representing the size limit. (Optional).
+        """
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, not {mode!r}")
+        self.mode = mode
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._lock = threading.Lock()
+
+        if path.dirname(filepath):
+            makedirs(path.dirname(filepath), exist_ok=True)
+        self._connection = sqlite3.connect(filepath, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, status INTEGER, content BLOB, "
+            "content_type TEXT, size INTEGER, stored_at REAL, "
+            "accessed_at REAL)")
+        self._connection.commit()
+
+    def close(self):
+        """
+        Close the underlying database file.
+
+        Returns:
+            None.
+        """
+        with self._lock:
+            self._connection.close()
+
+    @staticmethod
+    def key(endpoint, params):
+        """
+        Make the cache key for a request.
+
+        Args:
+            endpoint: A string representing the URL of the endpoint, without
+            any query string or API key.
+            params: A dictionary of the request parameters. Parameters in
+            IGNORED_PARAMS are left out, and the search term is lowercased and
+            has its whitespace collapsed.
+
+        Returns:
+            A string of the hexadecimal SHA-256 digest identifying the request.
+        """
+        normalized = {name: str(value) for name, value in params.items()
+                      if name not in IGNORED_PARAMS}
+        if "q" in normalized:
+            normalized["q"] = " ".join(normalized["q"].lower().split())
+        return text_hash(json.dumps([endpoint, normalized], sort_keys=True))
+
+    def lookup(self, key):
+        """
+        Find the stored response for a key, following the cache mode.
+
+        Args:
+            key: A string made by ResponseCache.key.
+
+        Returns:
+            A requests Response rebuilt from the stored one, or None if the
+            request should be sent.
+
+        Raises:
+            CacheMiss: If the cache is in "cache-only" mode and has no response
+            for the key.
+        """
+        if self.mode == "refresh":
+            with self._lock:
+                self.stats["misses"] += 1
+            count("cache_lookups_total", result="miss")
+            return None
+
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT status, content, content_type, stored_at FROM "
+                "responses WHERE key = ?", (key,)).fetchone()
+            expired = (row is not None and self.ttl is not None
+                       and time.time() - row[3] > self.ttl)
+            if row is None or (expired and self.mode != "cache-only"):
+                self.stats["misses"] += 1
+                count("cache_lookups_total", result="miss")
+                if self.mode == "cache-only":
+                    raise CacheMiss(key)
+                return None
+
+            self.stats["hits"] += 1
+            count("cache_lookups_total", result="hit")
+            self._connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                (time.time(), key))
+            self._connection.commit()
+
+        response = requests.Response()
+        response.status_code = row[0]
+        response._content = row[1] # pylint: disable=protected-access
+        response.headers["Content-Type"] = row[2]
+        response.encoding = "utf-8"
+        return response
+
+    def store(self, key, response):
+        """
+        Store a response if it was successful, then evict old responses until
+        the cache is under its size limit.
+
+        Args:
+            key: A string made by ResponseCache.key.
+            response: A requests Response.
+
+        Returns:
+            None.
+        """
+        if response.status_code != 200:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, response.status_code, response.content,
+                 response.headers.get("Content-Type", "application/json"),
+                 len(response.content), now, now))
+            self.stats["stores"] += 1
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self):
+        total = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._connection.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at"
+                ).fetchall():
+            self._connection.execute("DELETE FROM responses WHERE key = ?",
+                                     (key,))
+            self.stats["evictions"] += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def call(self, key, send):
+        """
+        Give the stored response for a key, or send the request and store it.
+
+        Args:
+            key: A string made by ResponseCache.key.
+            send: A function with no arguments that sends the request and
+            returns a requests Response.
+
+        Returns:
+            A requests Response.
+        """
+        response = self.lookup(key)
+        if response is None:
+            response = send()
+            self.store(key, response)
+        return response
+
+    def submit(self, key, scheduler, func, *args, **kwargs):
+        """
+        Like FetchScheduler.submit, but stored responses are returned right
+        away without using any of the scheduler's rate limit.
+
+        Args:
+            key: A string made by ResponseCache.key.
+            scheduler: A FetchScheduler to send uncached requests through.
+            func: A function returning a requests Response.
+            *args: Positional arguments for func.
+            **kwargs: Keyword arguments for func.
+
+        Returns:
+            A Future that resolves to the Response.
+        """
+        response = self.lookup(key)
+        if response is not None:
+            future = Future()
+            future.set_result(response)
+            return future
+
+        def send(*args, **kwargs):
+            response = func(*args, **kwargs)
+            self.store(key, response)
+            return response
+
+        return scheduler.submit(send, *args, **kwargs)
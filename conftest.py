@@ -0,0 +1,26 @@
+"""
+This module deals with pytest fixtures shared by the test modules.
+"""
+import pytest
+import obtaining
+from scheduling import FetchScheduler
+from stub_api import StubAPIServer
+
+@pytest.fixture(name="stub")
+def fixture_stub(monkeypatch):
+    """
+    Run a stub Article Search server and point the obtaining module at it.
+    """
+    with StubAPIServer() as server:
+        monkeypatch.setattr(obtaining, "ARTICLE_SEARCH_URL",
+                            server.article_search_url)
+        yield server
+
+@pytest.fixture(name="scheduler")
+def fixture_scheduler():
+    """
+    Give a scheduler with limits high enough for tests to run quickly.
+    """
+    with FetchScheduler(requests_per_minute=60000, requests_per_day=None,
+                        burst=100, base_backoff=0.01) as scheduler:
+        yield scheduler
@@ -0,0 +1,407 @@
+"""
+This module deals with storing every collected headline in one file that can
+be read in pieces without loading all of it.
+
+build_corpus writes the headlines of all countries to one UTF-8 file, one
+headline per line, ordered by country, month and position in the month. Next
+to it goes an index array with the byte range of each headline (a few
+headlines have line breaks of their own, so the index is what says where each
+one ends). HeadlineCorpus memory-maps both files, so the headlines of any range
+of months are one contiguous slice of the file that can be read without copying
+the rest of the corpus into memory.
+
+The corpus records the version of each country's data file it was built from
+(see dataset.file_version). Reading a country whose file has changed since
+raises StaleCorpus instead of giving old headlines, and open_corpus builds the
+corpus again first when any country is out of date. country_corpus keeps a
+corpus per country in .cache/corpus, so a change to one country only rebuilds
+that country's; word counting, search indexing and sentiment scoring read
+headlines through it.
+"""
+from glob import glob
+from itertools import groupby
+import json
+import mmap
+import os
+from os import path
+from dates import to_year_months
+from dataset import file_version, remove_possessives
+from lazy import lazy_import
+from storage import DATA_FOLDER, HEADLINES, country_data_source, \
+    headline_list, read_frame, replace_file
+
+np = lazy_import("numpy")
+
+CORPUS_FOLDER = ".cache/corpus"
+CORPUS_FILE = "headlines.corpus"
+INDEX_FILE = "headlines.index.npy"
+COUNTRIES_FILE = "headlines.countries.json"
+
+# Fields of each index entry, as a NumPy structured dtype.
+INDEX_DTYPE = [("country", "<i4"), ("month", "<i4"), ("number", "<i4"),
+               ("start", "<i8"), ("end", "<i8")]
+
+class StaleCorpus(RuntimeError):
+    """
+    Raised when a country's data file has changed since the corpus was built.
+    """
+
+def source_version(filepath):
+    """
+    Identify the version of a data file the corpus was built from.
+
+    Args:
+        filepath: A string representing the path of the file.
+
+    Returns:
+        A list of the file's modification time in nanoseconds and its size, or
+        None if there is no file.
+    """
+    return list(file_version(filepath)) if path.exists(filepath) else None
+
+def collected_countries(folder=DATA_FOLDER):
+    """
+    List the countries that have a data file.
+
+    Args:
+        folder: A string representing the data folder. (Optional).
+
+    Returns:
+        A sorted list of strings of country names.
+    """
+    suffix = "_data.csv"
+    return sorted(path.basename(csv_path)[:-len(suffix)]
+                  for csv_path in glob(f"{folder}/*{suffix}"))
+
+def build_corpus(country_names=None, folder=DATA_FOLDER):
+    """
+    Write the headline corpus and its index for a list of countries.
+
+    Each country's months are written in time order, whatever their order in
+    its data file, and months without hits have no headlines, as in
+    dataset.CountryDataset. Each file is replaced whole, so a corpus being
+    read is never seen half-written.
+
+    Args:
+        country_names: A list of strings of country names. Default is every
+        country with a data file. (Optional).
+        folder: A string representing the folder to write the corpus to.
+        (Optional).
+
+    Returns:
+        An int representing the number of headlines written.
+    """
+    country_names = country_names or collected_countries()
+    index = []
+    sources = []
+    os.makedirs(folder, exist_ok=True)
+
+    def write_corpus(filepath):
+        offset = 0
+        with open(filepath, "wb") as corpus_file:
+            for country_id, country_name in enumerate(country_names):
+                source = path.abspath(country_data_source(country_name))
+                # The version is taken before reading, so a file changed while
+                # it is read is seen as changed afterwards.
+                sources.append({"country": country_name, "source": source,
+                                "version": source_version(source)})
+                frame = read_frame(source, ["MM-YYYY", "Number of Hits",
+                                            HEADLINES]).dropna(
+                                                subset=["MM-YYYY"])
+                months = to_year_months(frame["MM-YYYY"]).astype(np.int32)
+                # HeadlineCorpus finds months by binary search.
+                order = np.argsort(months, kind="stable")
+                for month, hits, headlines in zip(
+                        months[order].tolist(),
+                        frame["Number of Hits"].to_numpy()[order],
+                        frame[HEADLINES].to_numpy()[order]):
+                    if hits == 0:
+                        continue
+                    for number, headline in enumerate(
+                            headline_list(headlines)):
+                        encoded = headline.encode("utf-8")
+                        corpus_file.write(encoded + b"\n")
+                        index.append((country_id, month, number, offset,
+                                      offset + len(encoded)))
+                        offset += len(encoded) + 1
+
+    def write_index(filepath):
+        with open(filepath, "wb") as index_file:
+            np.save(index_file, np.array(index, dtype=INDEX_DTYPE))
+
+    def write_countries(filepath):
+        with open(filepath, "w", encoding="utf-8") as countries_file:
+            json.dump(sources, countries_file)
+
+    replace_file(path.join(folder, CORPUS_FILE), write_corpus)
+    replace_file(path.join(folder, INDEX_FILE), write_index)
+    replace_file(path.join(folder, COUNTRIES_FILE), write_countries)
+    return len(index)
+
+def open_corpus(country_names=None, folder=DATA_FOLDER):
+    """
+    Open the headline corpus, building it first if it is missing, does not
+    hold the same countries, or any of their data files have changed.
+
+    Args:
+        country_names: A list of strings of country names. Default is every
+        country with a data file. (Optional).
+        folder: A string representing the folder holding the corpus.
+        (Optional).
+
+    Returns:
+        A HeadlineCorpus.
+    """
+    country_names = country_names or collected_countries()
+    if path.exists(path.join(folder, COUNTRIES_FILE)):
+        corpus = HeadlineCorpus(folder)
+        if corpus.countries == list(country_names) \
+                and not corpus.stale_countries():
+            return corpus
+        corpus.close()
+    build_corpus(country_names, folder)
+    return HeadlineCorpus(folder)
+
+def country_corpus(country_name, folder=CORPUS_FOLDER):
+    """
+    Open a corpus of one country's headlines, kept in a folder of its own and
+    built again only when that country's data file changes.
+
+    Args:
+        country_name: A string representing the name of the country.
+        folder: A string representing the folder holding every country's
+        corpus. (Optional).
+
+    Returns:
+        A HeadlineCorpus.
+    """
+    return open_corpus([country_name], path.join(folder, country_name))
+
+class HeadlineCorpus:
+    """
+    A read-only, memory-mapped view of the headline corpus.
+
+    Attributes:
+        countries: A list of the country names in the corpus.
+        index: A NumPy structured array with the country number, month
+        (YYYYMM as an int), headline number, and start and end byte of each
+        headline, sorted in corpus order.
+    """
+
+    def __init__(self, folder=DATA_FOLDER):
+        """
+        Args:
+            folder: A string representing the folder holding the corpus.
+            (Optional).
+        """
+        with open(path.join(folder, COUNTRIES_FILE), encoding="utf-8") as file:
+            sources = json.load(file)
+        self.countries = [source["country"] for source in sources]
+        self._sources = {source["country"]: source for source in sources}
+        self._country_ids = {name: number for number, name
+                             in enumerate(self.countries)}
+        self.index = np.load(path.join(folder, INDEX_FILE), mmap_mode="r")
+        self._keys = (self.index["country"].astype(np.int64) * 1000000
+                      + self.index["month"])
+
+        # The file stays open as long as the corpus, until close.
+        self._file = open( # pylint: disable=consider-using-with
+            path.join(folder, CORPUS_FILE), "rb")
+        if path.getsize(self._file.name) == 0:
+            self._data = b""
+        else:
+            self._data = mmap.mmap(self._file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.index)
+
+    def close(self):
+        """
+        Unmap and close the corpus file.
+
+        Returns:
+            None.
+        """
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+    def is_stale(self, country_name):
+        """
+        Check whether a country's data file has changed since the corpus was
+        built.
+
+        Args:
+            country_name: A string representing the name of the country.
+
+        Returns:
+            A boolean that is True if the file is now a different version, or
+            the country would now be read from another file.
+        """
+        source = self._sources[country_name]
+        return (source["source"]
+                != path.abspath(country_data_source(country_name))
+                or source["version"] != source_version(source["source"]))
+
+    def stale_countries(self):
+        """
+        List the countries whose data files have changed since the corpus was
+        built.
+
+        Returns:
+            A list of strings of country names.
+        """
+        return [country_name for country_name in self.countries
+                if self.is_stale(country_name)]
+
+    def _rows(self, country_name, start_month, end_month):
+        if self.is_stale(country_name):
+            raise StaleCorpus(f"{country_name}'s data has changed since the "
+                              f"corpus was built")
+        country = self._country_ids[country_name] * 1000000
+        first = np.searchsorted(self._keys, country + int(start_month), "left")
+        last = np.searchsorted(self._keys, country + int(end_month), "right")
+        return first, last
+
+    def range_bytes(self, country_name, start_month, end_month):
+        """
+        Give the headlines for a range of months as one slice of the file.
+
+        Args:
+            country_name: A string representing the name of the country.
+            start_month: A string representing the first month, in YYYYMM
+            format.
+            end_month: A string representing the last month, in YYYYMM format.
+
+        Returns:
+            A memoryview of the UTF-8 headlines, one per line, sharing memory
+            with the mapped file.
+        """
+        first, last = self._rows(country_name, start_month, end_month)
+        if first == last:
+            return memoryview(b"")
+        return memoryview(self._data)[int(self.index["start"][first]):
+                                      int(self.index["end"][last - 1])]
+
+    def iter_headlines(self, country_name, start_month, end_month):
+        """
+        Go through the headlines for a range of months one at a time.
+
+        Args:
+            country_name: A string representing the name of the country.
+            start_month: A string representing the first month, in YYYYMM
+            format.
+            end_month: A string representing the last month, in YYYYMM format.
+
+        Yields:
+            A tuple of the month (YYYYMM as an int), the headline's number in
+            the month, and the headline string.
+        """
+        first, last = self._rows(country_name, start_month, end_month)
+        rows = self.index[first:last]
+        for month, number, start, end in zip(rows["month"], rows["number"],
+                                             rows["start"], rows["end"]):
+            yield (int(month), int(number),
+                   self._data[int(start):int(end)].decode("utf-8"))
+
+    def headline(self, country_name, year_month, number):
+        """
+        Give one headline.
+
+        Args:
+            country_name: A string representing the name of the country.
+            year_month: A string representing the month, in YYYYMM format.
+            number: An int representing the headline's position in the month.
+
+        Returns:
+            The headline string.
+
+        Raises:
+            KeyError: If there is no such headline.
+        """
+        first, last = self._rows(country_name, year_month, year_month)
+        if not 0 <= number < last - first:
+            raise KeyError((country_name, year_month, number))
+        row = self.index[first + number]
+        return self._data[int(row["start"]):int(row["end"])].decode("utf-8")
+
+    def month_text(self, country_name, year_month):
+        """
+        Give one month's headlines as a single string, cleaned the same way as
+        CountryDataset.headline_text.
+
+        Args:
+            country_name: A string representing the name of the country.
+            year_month: A string representing the month, in YYYYMM format.
+
+        Returns:
+            A string of the month's headlines separated by spaces.
+        """
+        return remove_possessives(" ".join(
+            headline for _, _, headline in self.iter_headlines(
+                country_name, year_month, year_month)))
+
+    def month_headlines(self, country_name, year_months):
+        """
+        Give the headlines of each of a list of months.
+
+        Args:
+            country_name: A string representing the name of the country.
+            year_months: A list of strings representing months in YYYYMM
+            format.
+
+        Returns:
+            A list with a list of headlines for each month, as given by
+            iter_month_headlines, which is empty for a month without any.
+        """
+        if not year_months:
+            return []
+        found = dict(self.iter_month_headlines(country_name, min(year_months),
+                                               max(year_months)))
+        return [found.get(year_month, []) for year_month in year_months]
+
+    def iter_month_texts(self, country_name, start_month, end_month):
+        """
+        Go through a range of months one month's text at a time, so consumers
+        such as sentiment scoring never hold more than one month in memory.
+
+        Args:
+            country_name: A string representing the name of the country.
+            start_month: A string representing the first month, in YYYYMM
+            format.
+            end_month: A string representing the last month, in YYYYMM format.
+
+        Yields:
+            A tuple of the month as a YYYYMM string and its text as returned by
+            month_text. Months without headlines are skipped.
+        """
+        for month, headlines in self.iter_month_headlines(
+                country_name, start_month, end_month):
+            yield month, " ".join(headlines)
+
+    def iter_month_headlines(self, country_name, start_month, end_month):
+        """
+        Go through a range of months one month's headlines at a time.
+
+        Args:
+            country_name: A string representing the name of the country.
+            start_month: A string representing the first month, in YYYYMM
+            format.
+            end_month: A string representing the last month, in YYYYMM format.
+
+        Yields:
+            A tuple of the month as a YYYYMM string and a list of its
+            headlines, cleaned the same way as CountryDataset.headline_list.
+            Months without headlines are skipped.
+        """
+        headlines = self.iter_headlines(country_name, start_month, end_month)
+        for month, month_headlines in groupby(headlines, lambda row: row[0]):
+            yield (str(month), [remove_possessives(headline)
+                                for _, _, headline in month_headlines])
@@ -0,0 +1,206 @@
+"""
+This module deals with loading a country's csv file once and looking up its
+months quickly.
+
+A CountryDataset parses the csv (or its Parquet copy, see the storage module)
+a single time and indexes its rows by month, so finding one month's headlines
+does not mean reading and scanning the whole file again. load_country_dataset
+keeps one dataset per country for the life of the process and only reloads it
+when the file on disk changes.
+"""
+from os import path, stat
+import threading
+from dates import to_year_months
+from storage import HEADLINES, country_data_source, headline_list, \
+    parse_headline_list, read_frame
+
+_datasets = {}
+_datasets_lock = threading.Lock()
+
+def remove_possessives(headline_text):
+    """
+    Remove possessive "'s" endings from headline text.
+
+    Args:
+        headline_text: A string of headlines.
+
+    Returns:
+        The string without any "'s" or curly-quote "s".
+    """
+    headline_text = headline_text.replace(chr(8217)+"s", "")#
+    headline_text = headline_text.replace("'s", "")#
+
+    return headline_text
+
+def clean_headlines(headlines):
+    """
+    Turn the text of a stored headline list into one string of headlines.
+
+    Parses the list the same way the storage module does for Parquet files, so
+    no quotes, commas, or brackets are left over from it, and removes
+    possessive "'s" endings.
+
+    Args:
+        headlines: A string holding a list of headlines as saved in the csv.
+
+    Returns:
+        headline_text: A string with the headlines separated by spaces.
+    """
+    return remove_possessives(" ".join(parse_headline_list(headlines)))
+
+class CountryDataset:
+    """
+    One country's collected data, parsed once and indexed by month.
+
+    Attributes:
+        country_name: A string representing the name of the country.
+        filepath: A string representing the path the data was loaded from.
+        frame: A pandas DataFrame of the data file, as returned by
+        storage.read_frame. It is shared by everything using the dataset, so
+        it should not be modified.
+        version: A tuple of the file's modification time and size when loaded.
+    """
+
+    def __init__(self, country_name, filepath=None):
+        """
+        Args:
+            country_name: A string representing the name of the country.
+            filepath: A string representing the path of the csv or Parquet
+            file. Default is the one storage.country_data_source picks.
+            (Optional).
+        """
+        self.country_name = country_name
+        self.filepath = filepath or country_data_source(country_name)
+        self.version = file_version(self.filepath)
+        self.frame = read_frame(self.filepath)
+        self._rows = {year_month: row for row, year_month in enumerate(
+            to_year_months(self.frame["MM-YYYY"]).tolist())}
+        self._texts = {}
+
+    def __len__(self):
+        return len(self.frame)
+
+    def months(self):
+        """
+        List the months in the dataset, in file order.
+
+        Returns:
+            A list of strings representing months in YYYYMM format.
+        """
+        return list(self._rows)
+
+    def row_number(self, year_month):
+        """
+        Find the position of a month's row.
+
+        Args:
+            year_month: A string representing the month, in YYYYMM format.
+
+        Returns:
+            An int representing the row's position in the frame.
+
+        Raises:
+            KeyError: If the month is not in the dataset.
+        """
+        return self._rows[year_month]
+
+    def headline_text(self, year_month):
+        """
+        Give one month's headlines as a single string.
+
+        Args:
+            year_month: A string representing the month, in YYYYMM format.
+
+        Returns:
+            A string that contains one month's headlines, or an empty string
+            for a month with no hits.
+        """
+        if year_month not in self._texts:
+            row = self.row_number(year_month)
+            headlines = self.frame[HEADLINES].iloc[row]
+            if self.frame["Number of Hits"].iloc[row] == 0:
+                self._texts[year_month] = ""
+            elif isinstance(headlines, str):
+                self._texts[year_month] = clean_headlines(headlines)
+            else:
+                self._texts[year_month] = remove_possessives(
+                    " ".join(headlines))
+        return self._texts[year_month]
+
+    def headline_list(self, year_month):
+        """
+        Give one month's headlines as a list, with possessives removed the same
+        way as in headline_text.
+
+        Args:
+            year_month: A string representing the month, in YYYYMM format.
+
+        Returns:
+            A list of headline strings, which is empty for a month with no
+            hits.
+        """
+        row = self.row_number(year_month)
+        if self.frame["Number of Hits"].iloc[row] == 0:
+            return []
+        return [remove_possessives(headline) for headline
+                in headline_list(self.frame[HEADLINES].iloc[row])]
+
+    def headline_texts(self, start_month=None, end_month=None):
+        """
+        Give each month's headlines as a string for a range of months.
+
+        Args:
+            start_month: A string representing the first month, in YYYYMM
+            format. Default is the first month in the file. (Optional).
+            end_month: A string representing the last month, in YYYYMM format.
+            Default is the last month in the file. (Optional).
+
+        Returns:
+            A list of strings, one per month in file order.
+        """
+        months = self.months()
+        first = self.row_number(start_month) if start_month else 0
+        last = self.row_number(end_month) if end_month else len(months) - 1
+        return [self.headline_text(month) for month in months[first:last + 1]]
+
+def file_version(filepath):
+    """
+    Identify the current version of a file on disk.
+
+    Args:
+        filepath: A string representing the path of the file.
+
+    Returns:
+        A tuple of the file's modification time in nanoseconds and its size.
+    """
+    info = stat(filepath)
+    return (info.st_mtime_ns, info.st_size)
+
+def load_country_dataset(country_name):
+    """
+    Give the dataset for a country, parsing its csv only if it has not been
+    loaded yet or has changed since it was.
+
+    Args:
+        country_name: A string representing the name of the country.
+
+    Returns:
+        A CountryDataset for the country.
+    """
+    filepath = country_data_source(country_name)
+    with _datasets_lock:
+        dataset = _datasets.get(path.abspath(filepath))
+        if dataset is None or dataset.version != file_version(filepath):
+            dataset = CountryDataset(country_name, filepath)
+            _datasets[path.abspath(filepath)] = dataset
+        return dataset
+
+def clear_dataset_cache():
+    """
+    Forget every loaded dataset so the next load reads the files again.
+
+    Returns:
+        None.
+    """
+    with _datasets_lock:
+        _datasets.clear()
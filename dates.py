@@ -0,0 +1,128 @@
+"""
+This module deals with months: building ranges of them and converting between
+the ways they are written.
+
+Months are written as YYYYMM strings when collecting (and in dataset lookups)
+and as MM-YYYY strings in the csv files. Here they are NumPy datetime64[M]
+values, so a whole range of months, and the first and last day of each, comes
+from one array operation instead of a loop stepping one month at a time, and
+the Gregorian calendar (including century leap years) is handled by NumPy.
+Every function takes and returns arrays, converting all the months at once.
+"""
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+MONTH = "datetime64[M]"
+DAY = "datetime64[D]"
+
+def parse_year_months(year_months):
+    """
+    Turn months in YYYYMM format into datetime64 months.
+
+    Args:
+        year_months: A string or sequence of strings (or ints) of months in
+        YYYYMM format.
+
+    Returns:
+        A NumPy datetime64[M] array of the same shape.
+    """
+    numbers = np.asarray(year_months).astype(np.int64)
+    return ((numbers // 100 - 1970) * 12 + numbers % 100 - 1).astype(MONTH)
+
+def format_year_months(months):
+    """
+    Write datetime64 months in YYYYMM format.
+
+    Args:
+        months: A datetime64[M] value or array.
+
+    Returns:
+        A NumPy array of strings of the same shape.
+    """
+    numbers = np.asarray(months, dtype=MONTH).astype(np.int64)
+    return ((numbers // 12 + 1970) * 100 + numbers % 12 + 1).astype(str)
+
+def to_year_months(month_years):
+    """
+    Convert months from MM-YYYY to YYYYMM format.
+
+    Args:
+        month_years: A sequence, Series or Index of strings of months in
+        MM-YYYY format.
+
+    Returns:
+        A NumPy array of strings of the months in YYYYMM format.
+    """
+    month_years = pd.Series(np.asarray(month_years, dtype=str))
+    return (month_years.str[3:] + month_years.str[:2]).to_numpy(dtype=str)
+
+def to_month_years(year_months):
+    """
+    Convert months from YYYYMM to MM-YYYY format.
+
+    Args:
+        year_months: A sequence, Series or Index of strings of months in
+        YYYYMM format.
+
+    Returns:
+        A NumPy array of strings of the months in MM-YYYY format.
+    """
+    year_months = pd.Series(np.asarray(year_months, dtype=str))
+    return (year_months.str[4:] + "-" + year_months.str[:4]).to_numpy(
+        dtype=str)
+
+def month_range(begin_month, end_month):
+    """
+    Give every month in a time period (inclusive).
+
+    Args:
+        begin_month: A string representing the first month in YYYYMM format.
+        end_month: A string representing the last month in YYYYMM format.
+
+    Returns:
+        A NumPy datetime64[M] array, empty if end_month is before
+        begin_month.
+    """
+    return np.arange(parse_year_months(begin_month),
+                     parse_year_months(end_month) + 1)
+
+def month_bounds(months):
+    """
+    Give the first and last day of each month.
+
+    Args:
+        months: A datetime64[M] value or array.
+
+    Returns:
+        A tuple of two NumPy datetime64[D] arrays of the first and last days.
+    """
+    months = np.asarray(months, dtype=MONTH)
+    return months.astype(DAY), (months + 1).astype(DAY) - 1
+
+def format_days(days):
+    """
+    Write days in the YYYYMMDD format the Article Search API takes.
+
+    Args:
+        days: A datetime64[D] value or array.
+
+    Returns:
+        A NumPy array of strings of the same shape.
+    """
+    return np.char.replace(np.datetime_as_string(days, unit="D"), "-", "")
+
+def month_date_ranges(year_months):
+    """
+    Give the first and last day of each month as API dates.
+
+    Args:
+        year_months: A sequence of strings of months in YYYYMM format.
+
+    Returns:
+        A tuple of two NumPy arrays of strings of the first and last days in
+        YYYYMMDD format.
+    """
+    first_days, last_days = month_bounds(parse_year_months(year_months))
+    return format_days(first_days), format_days(last_days)
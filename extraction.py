@@ -0,0 +1,178 @@
+"""
+This module deals with pulling the fields collection and processing need out
+of API responses.
+
+Each response body is parsed once, with orjson if it is installed and the
+standard json module otherwise, and the fields are then read with plain
+dictionary access. Callers that need several fields of one response parse it
+with response_document and hand the result to each function, instead of
+parsing the body again for every field.
+
+Running this module compares the time taken per response and to import with
+the jq queries used before (which needs the optional pyjq library). The
+modules used only for that are imported when it runs, so importing this
+module stays quick.
+"""
+import json
+from lazy import import_seconds, lazy_import
+from metrics import timer
+
+orjson = lazy_import("orjson", optional=True)
+
+def parse_body(content):
+    """
+    Parse a JSON response body.
+
+    Args:
+        content: The body as bytes or a string.
+
+    Returns:
+        The parsed JSON, usually a dictionary.
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+def response_document(response_):
+    """
+    Parse the JSON body of a response.
+
+    Args:
+        response_: A Response, or a cached one from a ResponseCache.
+
+    Returns:
+        The parsed JSON, usually a dictionary.
+    """
+    with timer("stage_seconds", stage="parse"):
+        return parse_body(response_.content)
+
+def article_hits(document):
+    """
+    Give the number of results of an Article Search response.
+
+    Args:
+        document: A parsed Article Search response.
+
+    Returns:
+        An int representing the number of hits.
+    """
+    return document["response"]["meta"]["hits"]
+
+def article_docs(document):
+    """
+    Give the id and main headline of each article in an Article Search
+    response.
+
+    Args:
+        document: A parsed Article Search response.
+
+    Returns:
+        A list of [id, headline] lists, one for each article on the page, with
+        None for a missing headline.
+    """
+    return [[doc.get("_id"), (doc.get("headline") or {}).get("main")]
+            for doc in document["response"]["docs"]]
+
+def article_month_counts(document):
+    """
+    Give the number of results in each month of an Article Search response
+    with a pub_month facet.
+
+    Args:
+        document: A parsed Article Search response.
+
+    Returns:
+        A dictionary from each month number (1 to 12) with results to its
+        number of hits.
+    """
+    facets = document["response"].get("facets") or {}
+    return {int(term["term"]): term["count"]
+            for term in (facets.get("pub_month") or {}).get("terms", [])}
+
+def sentiment_scores(document):
+    """
+    Give the document sentiment of an analyzeSentiment response.
+
+    Args:
+        document: A parsed analyzeSentiment response.
+
+    Returns:
+        A list of the sentiment score and magnitude. The API leaves out
+        fields that are zero, which are given as 0.0.
+    """
+    sentiment = document["documentSentiment"]
+    return [sentiment.get("score", 0.0), sentiment.get("magnitude", 0.0)]
+
+def sample_article_page(num_docs=10):
+    """
+    Make the body of an Article Search response shaped like a real one, with
+    the fields of each article the API sends when no fields are limited.
+
+    Args:
+        num_docs: An int representing the number of articles. (Optional).
+
+    Returns:
+        The body as bytes.
+    """
+    docs = [{"_id": f"nyt://article/{number:08d}",
+             "abstract": "An abstract of the article. " * 4,
+             "web_url": f"https://www.nytimes.com/1973/09/12/{number}.html",
+             "snippet": "A snippet of the article. " * 4,
+             "lead_paragraph": "The lead paragraph of the article. " * 8,
+             "source": "The New York Times",
+             "multimedia": [],
+             "headline": {"main": f"Headline number {number}", "kicker": None,
+                          "print_headline": f"Headline {number}"},
+             "keywords": [{"name": "glocations", "value": "Chile",
+                           "rank": rank, "major": "N"} for rank in range(5)],
+             "pub_date": "1973-09-12T05:00:00+0000",
+             "document_type": "article", "news_desk": "Foreign",
+             "byline": {"original": "By A Reporter", "person": []},
+             "type_of_material": "News", "word_count": 800}
+            for number in range(num_docs)]
+    return json.dumps({"status": "OK", "response": {
+        "docs": docs, "meta": {"hits": 25, "offset": 0}}}).encode("utf-8")
+
+def benchmark(repeat=2000):
+    """
+    Compare reading a page of articles here with the jq queries used before,
+    printing the microseconds per response and the import times.
+
+    Args:
+        repeat: An int representing how many responses to read. (Optional).
+
+    Returns:
+        A dictionary from the name of each measurement to its value.
+    """
+    import timeit # pylint: disable=import-outside-toplevel
+    content = sample_article_page()
+
+    def read_once():
+        document = parse_body(content)
+        return article_hits(document), article_docs(document)
+
+    results = {"extraction_us": timeit.timeit(read_once, number=repeat)
+                                / repeat * 1e6,
+               "extraction_import_s": import_seconds("extraction")}
+    try:
+        import pyjq # pylint: disable=import-outside-toplevel
+    except ImportError:
+        pyjq = None
+    if pyjq is not None:
+        def read_with_jq():
+            hits = pyjq.all(".response .meta .hits", json.loads(content))[0]
+            docs = pyjq.all(".response .docs[] | [._id, .headline .main]",
+                            json.loads(content))
+            return hits, docs
+
+        assert read_with_jq() == read_once()
+        results["pyjq_us"] = timeit.timeit(read_with_jq, number=repeat) \
+            / repeat * 1e6
+        results["pyjq_import_s"] = import_seconds("pyjq")
+
+    for name, value in results.items():
+        print(f"{name}: {value:.4g}")
+    return results
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,95 @@
+"""
+This module deals with the country flags that word clouds are shaped and
+colored by.
+
+A flag is opened, converted to a NumPy mask and turned into an
+ImageColorGenerator once, then kept for later word clouds of the same country
+at the same size. A limited number of flags are kept, dropping the least
+recently used, and a flag is read again if its file changes. Flags can also be
+shrunk for quick preview word clouds; full size is the default.
+"""
+from functools import lru_cache
+from os import stat
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+wc = lazy_import("wordcloud")
+
+FLAGS_FOLDER = "CountryFlags"
+
+# Flags kept in memory. The flags are at most a few megabytes each as arrays.
+FLAG_CACHE_SIZE = 16
+
+# Longest side, in pixels, of a flag shrunk for a preview.
+PREVIEW_SIZE = 400
+
+def flag_path(country_name):
+    """
+    Give the path of a country's flag.
+
+    Args:
+        country_name: A string representing the name of the country.
+
+    Returns:
+        A string representing the path to the flag's PNG file.
+    """
+    return f"{FLAGS_FOLDER}/{country_name}_flag.png"
+
+@lru_cache(maxsize=FLAG_CACHE_SIZE)
+def _load_flag(filepath, version, max_size):
+    """
+    Read a flag into a read-only array, shrunk to fit max_size if given. The
+    file's version is only part of the cache key.
+    """
+    del version
+    with Image.open(filepath) as image:
+        if max_size is not None and max(image.size) > max_size:
+            image.thumbnail((max_size, max_size), Image.LANCZOS)
+        mask = np.array(image)
+    mask.setflags(write=False)
+    return mask, wc.ImageColorGenerator(mask)
+
+def _flag(country_name, max_size):
+    filepath = flag_path(country_name)
+    info = stat(filepath)
+    return _load_flag(filepath, (info.st_mtime_ns, info.st_size), max_size)
+
+def flag_mask(country_name, max_size=None):
+    """
+    Give a country's flag as a mask for WordCloud.
+
+    Args:
+        country_name: A string representing the name of the country.
+        max_size: An int representing the longest side in pixels to shrink
+        the flag to, such as PREVIEW_SIZE. Default keeps the full size.
+        (Optional).
+
+    Returns:
+        A read-only NumPy array of the flag's pixels, shared by every caller.
+    """
+    return _flag(country_name, max_size)[0]
+
+def flag_colors(country_name, max_size=None):
+    """
+    Give a color function that colors words like the country's flag.
+
+    Args:
+        country_name: A string representing the name of the country.
+        max_size: An int representing the longest side in pixels, which must
+        be the same as for the word cloud's mask. Default keeps the full size.
+        (Optional).
+
+    Returns:
+        An ImageColorGenerator for the flag, shared by every caller.
+    """
+    return _flag(country_name, max_size)[1]
+
+def clear_flag_cache():
+    """
+    Forget every loaded flag.
+
+    Returns:
+        None.
+    """
+    _load_flag.cache_clear()
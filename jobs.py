@@ -0,0 +1,151 @@
+"""
+This module deals with keeping track of how far a collection run has got, so
+that a run that crashes or runs out of API quota can pick up where it stopped.
+
+A JobStore records every page of Article Search results as it arrives (its
+number of hits and the id and headline of each article), and every month once
+it has been written to the country's csv file. Collecting with a JobStore
+skips months that have already been written and pages that have already been
+fetched, so restarting a finished run sends no requests at all. A month is only
+skipped while the csv file still has it, so deleting or resetting the file
+collects its months again.
+"""
+import json
+from os import makedirs, path
+import sqlite3
+import threading
+
+DEFAULT_JOB_PATH = ".cache/jobs.sqlite"
+
+class JobStore:
+    """
+    A persistent record of the pages and months a collection run has finished.
+    """
+
+    def __init__(self, filepath=DEFAULT_JOB_PATH):
+        """
+        Args:
+            filepath: A string representing the path of the SQLite file.
+            (Optional).
+        """
+        self._lock = threading.Lock()
+        if path.dirname(filepath):
+            makedirs(path.dirname(filepath), exist_ok=True)
+        self._connection = sqlite3.connect(filepath, check_same_thread=False)
+        self._connection.executescript(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "country TEXT, begin_date TEXT, end_date TEXT, page INTEGER, "
+            "hits INTEGER, docs TEXT, "
+            "PRIMARY KEY (country, begin_date, end_date, page));"
+            "CREATE TABLE IF NOT EXISTS months ("
+            "country TEXT, month TEXT, PRIMARY KEY (country, month));")
+        self._connection.commit()
+
+    def close(self):
+        """
+        Close the underlying database file.
+
+        Returns:
+            None.
+        """
+        with self._lock:
+            self._connection.close()
+
+    def page(self, country, begin_date, end_date, page):
+        """
+        Find a page of results that has already been fetched.
+
+        Args:
+            country: A string representing the search term.
+            begin_date: A string representing the start date in format
+            YYYYMMDD.
+            end_date: A string representing the end date in format YYYYMMDD.
+            page: An int representing the page number, counting from zero.
+
+        Returns:
+            A list of the number of hits and a list of [id, headline] lists for
+            the page, or None if the page has not been fetched.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT hits, docs FROM pages WHERE country = ? AND "
+                "begin_date = ? AND end_date = ? AND page = ?",
+                (country, begin_date, end_date, page)).fetchone()
+        if row is None:
+            return None
+        return [row[0], json.loads(row[1])]
+
+    def record_page(self, country, begin_date, end_date, page, hits, docs):
+        """
+        Record a page of results as fetched.
+
+        Args:
+            country: A string representing the search term.
+            begin_date: A string representing the start date in format
+            YYYYMMDD.
+            end_date: A string representing the end date in format YYYYMMDD.
+            page: An int representing the page number, counting from zero.
+            hits: An int representing the number of hits for the date range.
+            docs: A list of [id, headline] lists for the articles on the page.
+
+        Returns:
+            None.
+        """
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+                (country, begin_date, end_date, page, hits, json.dumps(docs)))
+            self._connection.commit()
+
+    def completed_months(self, country):
+        """
+        Find the months that have been written to a country's csv file.
+
+        Args:
+            country: A string representing the search term.
+
+        Returns:
+            A set of strings representing months in the format YYYYMM.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT month FROM months WHERE country = ?",
+                (country,)).fetchall()
+        return {row[0] for row in rows}
+
+    def mark_month_done(self, country, month):
+        """
+        Record that a month has been written to the country's csv file. Its
+        pages are no longer needed and are dropped.
+
+        Args:
+            country: A string representing the search term.
+            month: A string representing the month in the format YYYYMM.
+
+        Returns:
+            None.
+        """
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO months VALUES (?, ?)", (country, month))
+            self._connection.execute(
+                "DELETE FROM pages WHERE country = ? AND begin_date LIKE ?",
+                (country, month + "%"))
+            self._connection.commit()
+
+    def reset(self, country):
+        """
+        Forget everything recorded for a country so it is collected again.
+
+        Args:
+            country: A string representing the search term.
+
+        Returns:
+            None.
+        """
+        with self._lock:
+            self._connection.execute("DELETE FROM pages WHERE country = ?",
+                                     (country,))
+            self._connection.execute("DELETE FROM months WHERE country = ?",
+                                     (country,))
+            self._connection.commit()
@@ -0,0 +1,104 @@
+"""
+This module deals with putting off importing heavy libraries until they are
+used.
+
+pandas, NumPy, requests, matplotlib and wordcloud take from a tenth of a second
+to most of a second each to import, and every process pays that again,
+including each worker process of a pool. Modules name these libraries with
+lazy_import instead of an import statement, so they are only imported the
+first time one of their attributes is used. Importing the collection and
+scheduling modules then never loads the plotting libraries at all, and a
+command that only collects hits never loads pandas.
+
+Names imported with "from library import name" can't be put off this way, so
+modules use the library's module object instead, as in np.array or
+backend_agg.FigureCanvasAgg. import_seconds and imported_libraries measure what
+importing a module costs in a new interpreter.
+"""
+import importlib
+from importlib.util import find_spec
+import sys
+import types
+
+class LazyModule(types.ModuleType):
+    """
+    A stand-in for a module that imports the module the first time one of its
+    attributes is looked up, then keeps the module's attributes itself so later
+    lookups are as quick as on the module.
+
+    The real module is imported with importlib.import_module, so threads that
+    use it for the first time at once wait on the same import.
+    """
+
+    def __getattr__(self, name):
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, name)
+
+    def __dir__(self):
+        return dir(importlib.import_module(self.__name__))
+
+def lazy_import(name, optional=False):
+    """
+    Name a module without importing it yet.
+
+    Args:
+        name: A string representing the module's full name, such as "numpy"
+        or "matplotlib.figure".
+        optional: A boolean that is True if the library might not be
+        installed. (Optional).
+
+    Returns:
+        A LazyModule for the module, or None if optional is True and the
+        library is not installed. Modules that have already been imported
+        are given as they are.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    if optional and find_spec(name.partition(".")[0]) is None:
+        return None
+    return LazyModule(name)
+
+def import_seconds(module):
+    """
+    Time importing a module in a new interpreter.
+
+    Args:
+        module: A string representing the name of the module.
+
+    Returns:
+        A float representing the seconds taken by the import alone.
+    """
+    code = (f"import time; start = time.perf_counter(); import {module}; "
+            f"print(time.perf_counter() - start)")
+    return float(run_python(code))
+
+def imported_libraries(module):
+    """
+    List the libraries that importing a module loads, in a new interpreter.
+
+    Args:
+        module: A string representing the name of the module.
+
+    Returns:
+        A set of strings of the top-level names of every module imported by
+        the end of the import, including the standard library's.
+    """
+    code = (f"import sys; import {module}; print(' '.join("
+            f"{{name.partition('.')[0] for name in sys.modules}}))")
+    return set(run_python(code).split())
+
+def run_python(code):
+    """
+    Run Python code in a new interpreter.
+
+    Args:
+        code: A string of the code to run.
+
+    Returns:
+        A string of what the code printed.
+    """
+    import subprocess # pylint: disable=import-outside-toplevel
+    return subprocess.run([sys.executable, "-c", code], check=True,
+                          capture_output=True, text=True).stdout
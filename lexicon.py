@@ -0,0 +1,63 @@
+"""
+This module holds the word list used by the offline lexicon sentiment backend.
+
+Each word has a valence from -4 (most negative) to 4 (most positive), in the
+style of the VADER lexicon, chosen for the vocabulary of news headlines about
+politics and foreign affairs. Words are lowercase.
+"""
+
+LEXICON = {
+    # Negative
+    "abuse": -3.0, "accused": -1.5, "aggression": -2.5, "alarm": -2.0,
+    "arrest": -1.5, "arrested": -1.5, "arrests": -1.5, "assassinated": -3.5,
+    "assassination": -3.5, "attack": -2.5, "attacked": -2.5, "attacks": -2.5,
+    "bad": -2.5, "bankrupt": -2.5, "battle": -2.0, "blast": -2.5,
+    "blockade": -2.0, "blood": -2.0, "bloody": -2.5, "bomb": -3.0,
+    "bombing": -3.0, "bombs": -3.0, "boycott": -1.5, "brutal": -3.0,
+    "casualties": -2.5, "chaos": -2.5, "clash": -2.0, "clashes": -2.0,
+    "collapse": -2.5, "condemn": -2.0, "condemned": -2.0, "conflict": -2.0,
+    "corruption": -2.5, "coup": -2.5, "crackdown": -2.5, "crash": -2.5,
+    "crime": -2.5, "crises": -2.5, "crisis": -2.5, "critics": -1.0,
+    "dead": -3.0, "deadly": -3.0, "death": -3.0, "deaths": -3.0,
+    "debt": -1.5, "decline": -1.5, "defeat": -2.0, "deficit": -1.5,
+    "denounce": -2.0, "denounced": -2.0, "deny": -1.0, "denies": -1.0,
+    "dictator": -2.5, "dictatorship": -2.5, "disaster": -3.0,
+    "dispute": -1.5, "drought": -2.0, "earthquake": -2.5, "exile": -1.5,
+    "exiles": -1.5, "explosion": -2.5, "fail": -2.0, "fails": -2.0,
+    "failure": -2.0, "famine": -3.0, "fear": -2.0, "fears": -2.0,
+    "fight": -1.5, "fighting": -2.0, "fire": -1.5, "flee": -2.0,
+    "fraud": -2.5, "guerrilla": -1.5, "guerrillas": -1.5, "hostage": -2.5,
+    "hunger": -2.0, "illegal": -2.0, "inflation": -1.5, "injured": -2.0,
+    "invasion": -2.5, "jail": -2.0, "jailed": -2.0, "junta": -2.0,
+    "kill": -3.0, "killed": -3.0, "killing": -3.0, "killings": -3.0,
+    "loss": -2.0, "losses": -2.0, "massacre": -3.5, "murder": -3.5,
+    "murdered": -3.5, "oppression": -2.5, "overthrow": -2.5,
+    "overthrown": -2.5, "plot": -1.5, "poverty": -2.0, "prison": -2.0,
+    "protest": -1.0, "protests": -1.0, "purge": -2.5, "rebel": -1.5,
+    "rebellion": -2.0, "rebels": -1.5, "recession": -2.0,
+    "refugees": -1.5, "repression": -2.5, "revolt": -2.0, "riot": -2.5,
+    "riots": -2.5, "seized": -1.5, "shortage": -1.5, "shortages": -1.5,
+    "slump": -2.0, "strike": -1.0, "strikes": -1.0, "struggle": -1.5,
+    "terror": -3.0, "terrorism": -3.0, "terrorist": -3.0, "threat": -2.0,
+    "threatens": -2.0, "torture": -3.5, "tortured": -3.5, "tragedy": -3.0,
+    "turmoil": -2.5, "unrest": -2.0, "violence": -3.0, "violent": -3.0,
+    "war": -2.5, "wars": -2.5, "warns": -1.5, "worst": -3.0,
+    "wounded": -2.5,
+    # Positive
+    "accord": 1.5, "agree": 1.5, "agreement": 1.5, "aid": 1.5,
+    "alliance": 1.0, "applause": 2.0, "approve": 1.5, "approved": 1.5,
+    "best": 3.0, "boom": 2.0, "celebrate": 2.5, "celebrates": 2.5,
+    "ceasefire": 1.5, "cooperation": 2.0, "democracy": 1.5,
+    "democratic": 1.0, "elected": 1.0, "freed": 2.0, "freedom": 2.0,
+    "friendly": 2.0, "gain": 1.5, "gains": 1.5, "good": 2.0, "growth": 1.5,
+    "help": 1.5, "hope": 2.0, "hopes": 1.5, "improve": 2.0,
+    "improved": 2.0, "independence": 1.5, "liberty": 2.0, "peace": 2.5,
+    "peaceful": 2.5, "praise": 2.5, "praised": 2.5, "progress": 2.0,
+    "prosper": 2.5, "prosperity": 2.5, "rebuild": 1.5, "recover": 1.5,
+    "recovery": 1.5, "reform": 1.0, "reforms": 1.0, "release": 1.0,
+    "released": 1.0, "rescue": 2.0, "rescued": 2.0, "stability": 1.5,
+    "stable": 1.5, "success": 2.5, "successful": 2.5, "support": 1.5,
+    "treaty": 1.0, "triumph": 3.0, "truce": 1.5, "unity": 2.0,
+    "victory": 2.5, "welcome": 2.0, "welcomed": 2.0, "win": 2.5,
+    "wins": 2.5, "won": 2.0,
+}
@@ -0,0 +1,302 @@
+"""
+This module deals with measuring where the time of a run goes.
+
+The collection, processing and visualization modules count what they do and
+time how long it takes in one registry shared by the whole process:
+    stage_seconds: the time taken by each stage, labeled with the stage. The
+        coarse stages are collect, survey, process and render, and within
+        them request (waiting on the API), parse (reading JSON responses),
+        read and write (country data files) and save (chart images).
+    requests_total: API responses received, labeled with the endpoint's path
+        and the status code.
+    response_bytes_total: the size of the response bodies received.
+    retries_total: requests sent again after the API pushed back or the
+        connection failed.
+    request_errors_total: requests whose connection failed or timed out,
+        labeled with the endpoint and the requests exception.
+    rate_limit_wait_seconds_total and backoff_wait_seconds_total: time spent
+        sleeping to stay under the rate limits and to back off.
+    cache_lookups_total: ResponseCache lookups, labeled hit or miss.
+    months_scored_total: months given new sentiment scores.
+
+Export the counts with prometheus_text or json_lines, or write them to a file
+with write_metrics. Two environment variables turn on more without changing
+any code:
+    NYTC_METRICS: a file to write the main process's metrics to when it
+        exits, as JSON lines if the name ends in .jsonl and as Prometheus text
+        otherwise.
+    NYTC_PROFILE: a folder to save a cProfile profile of every coarse stage
+        in, named after the stage, which can be read with pstats or snakeviz.
+For example:
+    NYTC_METRICS=metrics.prom NYTC_PROFILE=profiles python pipeline.py Chile
+
+Metrics are kept per process, so work done in a process pool's workers, such
+as lexicon scoring and chart rendering in the pipeline, is timed in the stage
+that waits on it but not counted in detail.
+"""
+import atexit
+from contextlib import contextmanager
+import itertools
+import json
+import os
+from os import path
+import threading
+import time
+
+METRICS_VARIABLE = "NYTC_METRICS"
+PROFILE_VARIABLE = "NYTC_PROFILE"
+PREFIX = "nytc_"
+
+class Metrics:
+    """
+    A thread-safe registry of counters and timers.
+
+    Each value is kept under its name and labels, so requests_total with
+    status="200" and with status="429" are counted apart.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timers = {}
+
+    def count(self, name, value=1, **labels):
+        """
+        Add to a counter.
+
+        Args:
+            name: A string naming the counter, such as "requests_total".
+            value: A number to add. Default is one. (Optional).
+            **labels: Strings telling apart values of the same counter.
+
+        Returns:
+            None.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        """
+        Record one timing.
+
+        Args:
+            name: A string naming the timer, such as "stage_seconds".
+            seconds: A float representing the time taken.
+            **labels: Strings telling apart values of the same timer.
+
+        Returns:
+            None.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            count, total, longest = self._timers.get(key, (0, 0.0, 0.0))
+            self._timers[key] = (count + 1, total + seconds,
+                                 max(longest, seconds))
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        Time the body of a with statement, as observe does.
+
+        Args:
+            name: A string naming the timer.
+            **labels: Strings telling apart values of the same timer.
+
+        Yields:
+            None.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        """
+        Give every metric's current value.
+
+        Returns:
+            A list of dictionaries, one per name and labels, with "name",
+            "labels" and either "value" for a counter or "count", "sum" and
+            "max" for a timer, sorted by name and labels.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            timers = dict(self._timers)
+        return [{"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(counters.items())] + [
+                    {"name": name, "labels": dict(labels), "count": count,
+                     "sum": total, "max": longest}
+                    for (name, labels), (count, total, longest)
+                    in sorted(timers.items())]
+
+    def reset(self):
+        """
+        Forget every metric.
+
+        Returns:
+            None.
+        """
+        with self._lock:
+            self._counters.clear()
+            self._timers.clear()
+
+REGISTRY = Metrics()
+count = REGISTRY.count
+observe = REGISTRY.observe
+timer = REGISTRY.timer
+
+_profiling = threading.local()
+_profile_numbers = itertools.count()
+
+@contextmanager
+def stage(name, **labels):
+    """
+    Time a coarse stage of the workflow into stage_seconds, and profile it if
+    the NYTC_PROFILE environment variable names a folder.
+
+    Stages within a stage that is already being profiled are only timed, since
+    the outer profile includes them.
+
+    Args:
+        name: A string naming the stage, such as "collect".
+        **labels: Strings telling apart runs of the stage, such as the chart
+        drawn.
+
+    Yields:
+        None.
+    """
+    folder = os.environ.get(PROFILE_VARIABLE)
+    profiler = None
+    if folder and not getattr(_profiling, "active", False):
+        import cProfile # pylint: disable=import-outside-toplevel
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Only one profiler can run at a time from Python 3.12, so stages
+            # running at once in other threads go unprofiled.
+            profiler = None
+        else:
+            _profiling.active = True
+
+    try:
+        with REGISTRY.timer("stage_seconds", stage=name, **labels):
+            yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _profiling.active = False
+            os.makedirs(folder, exist_ok=True)
+            profiler.dump_stats(path.join(
+                folder, f"{name}-{os.getpid()}-{next(_profile_numbers)}.prof"))
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace(
+        "\n", "\\n")
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"'
+                          for key, value in labels.items()) + "}"
+
+def prometheus_text(metrics=REGISTRY):
+    """
+    Format metrics in the Prometheus text exposition format.
+
+    Timers are given as summaries, with _count and _sum, and the longest time
+    as a _max gauge.
+
+    Args:
+        metrics: A Metrics registry. Default is the process's. (Optional).
+
+    Returns:
+        A string with a line per value, each name prefixed with "nytc_".
+    """
+    families = {}
+    for metric in metrics.snapshot():
+        name = PREFIX + metric["name"]
+        labels = _label_text(metric["labels"])
+        if "value" in metric:
+            families.setdefault((name, "counter"), []).append(
+                f"{name}{labels} {metric['value']}")
+        else:
+            families.setdefault((name, "summary"), []).extend([
+                f"{name}_count{labels} {metric['count']}",
+                f"{name}_sum{labels} {metric['sum']}"])
+            families.setdefault((f"{name}_max", "gauge"), []).append(
+                f"{name}_max{labels} {metric['max']}")
+
+    lines = []
+    for (name, kind), samples in families.items():
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+def json_lines(metrics=REGISTRY):
+    """
+    Format metrics as structured log lines.
+
+    Args:
+        metrics: A Metrics registry. Default is the process's. (Optional).
+
+    Returns:
+        A string with one JSON object per line, as given by Metrics.snapshot,
+        each with the time it was taken and the process id.
+    """
+    now = time.time()
+    return "".join(json.dumps({"time": now, "pid": os.getpid(), **metric})
+                   + "\n" for metric in metrics.snapshot())
+
+def write_metrics(filepath, metrics=REGISTRY):
+    """
+    Save metrics to a file, replacing it.
+
+    Args:
+        filepath: A string representing the path of the file, written as JSON
+        lines if it ends in .jsonl and as Prometheus text otherwise.
+        metrics: A Metrics registry. Default is the process's. (Optional).
+
+    Returns:
+        The filepath.
+    """
+    # storage times its reads and writes here, so it is imported late.
+    from storage import replace_file # pylint: disable=import-outside-toplevel
+    text = json_lines(metrics) if filepath.endswith(".jsonl") \
+        else prometheus_text(metrics)
+
+    def write(temporary_path):
+        with open(temporary_path, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write(text)
+
+    replace_file(filepath, write)
+    return filepath
+
+def _write_metrics_at_exit(filepath, pid):
+    # Forked worker processes inherit the exit handler, but the file belongs
+    # to the process that registered it.
+    if os.getpid() == pid:
+        write_metrics(filepath)
+
+def register_exit_handler():
+    """
+    Save the metrics to the file named by NYTC_METRICS when the process
+    exits, if it is set and this is not a worker process. Spawned workers
+    import this module again, and would otherwise replace the file with their
+    own few metrics.
+
+    Returns:
+        A boolean that is True if the handler was registered.
+    """
+    if not os.environ.get(METRICS_VARIABLE):
+        return False
+    import multiprocessing # pylint: disable=import-outside-toplevel
+    if multiprocessing.parent_process() is not None:
+        return False
+    atexit.register(_write_metrics_at_exit,
+                    path.abspath(os.environ[METRICS_VARIABLE]), os.getpid())
+    return True
+
+register_exit_handler()
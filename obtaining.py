@@ -4,30 +4,51 @@ as writing that information to csv files.
 
 There are helper functions included towards the top of this module that help
 with iterating through months/days for API calls that span multiple months.
+They are built on the dates module, which works on whole ranges of months at
+once.
 An NYT developer API key for the article search API is required to run some
 of the functions in this module.
+
+Requests go through a FetchScheduler from the scheduling module, which keeps
+several requests in flight at once while staying under the API's rate limits.
+Passing a ResponseCache from the caching module to the collection functions
+answers requests that have been made before from disk instead, and passing a
+JobStore from the jobs module lets an interrupted collection run resume.
+Collected months are saved through a DatasetWriter from the writing module.
 """
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import groupby
 import math
-from os import path
-import time
-import pandas as pd
-import requests
-import pyjq
-
-month_days_general = {
-    "01": "31",
-    "02": "28",
-    "03": "31",
-    "04": "30",
-    "05": "31",
-    "06": "30",
-    "07": "31",
-    "08": "31",
-    "09": "30",
-    "10": "31",
-    "11": "30",
-    "12": "31"
-}
+from caching import ResponseCache
+from dates import format_year_months, month_date_ranges, month_range, \
+    parse_year_months, to_month_years
+from extraction import article_docs, article_hits, article_month_counts, \
+    response_document
+from lazy import lazy_import
+from metrics import count, stage
+from scheduling import default_scheduler, iter_in_order
+from writing import DatasetWriter
+
+asyncio = lazy_import("asyncio")
+pd = lazy_import("pandas")
+requests = lazy_import("requests")
+
+ARTICLE_SEARCH_URL = "https://api.nytimes.com/svc/search/v2/articlesearch.json"
+REQUEST_TIMEOUT = 30
+
+# The API returns ten results per page and will not go past page 99, so a date
+# range with more than 1000 hits has to be split up to see all of them.
+PAGE_SIZE = 10
+MAX_PAGES = 100
+
+# Fields of each article asked for when collecting headlines, and when only
+# counting hits, so responses leave out the rest of each article.
+ARTICLE_FIELDS = "_id,headline"
+COUNT_FIELDS = "_id"
+
+# Number of months collected at once. Each one only waits on its requests, the
+# scheduler decides how many are actually sent at a time.
+MONTHS_IN_FLIGHT = 8
 
 def days_in_month(year_month):
     """
@@ -40,12 +61,7 @@ def days_in_month(year_month):
         A two-character string for the number of days in that month in format
         DD.
     """
-    year = year_month[0:4]
-    month = year_month[4:]
-
-    if int(year) % 4 == 0 and month == "02":
-        return "29"
-    return month_days_general[month]
+    return month_date_ranges([year_month])[1][0][6:]
 
 def next_month(year_month):
     """
@@ -57,36 +73,188 @@ def next_month(year_month):
     Returns:
         A string representing the following month in format YYYYMM.
     """
-    year = year_month[0:4]
-    month = year_month[4:]
+    return str(format_year_months(parse_year_months(year_month) + 1))
+
+def articles_cache_key(search_term, begin_date, end_date, page=0):
+    """
+    Make the response cache key for a NYTimes Article Search request.
+
+    Args:
+        search_term: A string representing the search term.
+        begin_date: A string representing the start date in format YYYYMMDD.
+        end_date: A string representing the end date in format YYYYMMDD.
+        page: An int representing page number for the results of the search.
+              Default is zero. (Optional).
 
-    if month == "12":
-        return str(int(year) + 1) + "01"
-    if month == "09":
-        return year + "10"
-    return year + month[0] + str(int(month[1]) + 1)
+    Returns:
+        A string identifying the request, which does not depend on the API key
+        but does on the fields asked for, so responses of different shapes
+        are never mixed up.
+    """
+    return ResponseCache.key(ARTICLE_SEARCH_URL,
+                             {"q": search_term, "begin_date": begin_date,
+                              "end_date": end_date, "page": page,
+                              "fl": ARTICLE_FIELDS})
 
-def request_articles(search_term, begin_date, end_date, api_key, page=1):
+def request_articles(search_term, begin_date, end_date, api_key, page=0,
+                     cache=None):
     """
     Gets NYTimes Article Search API response for given search term, date range,
-    and API key. Can also provide a page of search results, but one is default.
+    and API key. Can also provide a page of search results, but the first one
+    (page zero) is default.
 
     Args:
+        search_term: A string representing the search term.
+        begin_date: A string representing the start date in format YYYYMMDD.
+        end_date: A string representing the end date in format YYYYMMDD.
+        api_key: A string representing a NYTimes Developer API key.
+        page: An int representing page number for the results of the search,
+              counting from zero. Default is zero. (Optional).
+        cache: A ResponseCache to look the response up in and store it in.
+               (Optional).
+
+    Returns:
+        A Response for this request in NYTimes Article Search API.
+    """
+    if cache is not None:
+        return cache.call(articles_cache_key(search_term, begin_date, end_date,
+                                             page),
+                          lambda: request_articles(search_term, begin_date,
+                                                   end_date, api_key, page))
+
+    return requests.get(ARTICLE_SEARCH_URL,
+                        params={"q": search_term,
+                                "fq": "source:(\"The New York Times\")",
+                                "begin_date": begin_date,
+                                "end_date": end_date,
+                                "page": page,
+                                "fl": ARTICLE_FIELDS,
+                                "api-key": api_key},
+                        timeout=REQUEST_TIMEOUT)
+
+def submit_request_articles(scheduler, search_term, begin_date, end_date,
+                            api_key, page=0, cache=None):
+    """
+    Schedule a NYTimes Article Search request, answering it from the cache
+    without using any of the rate limit if it has been made before.
+
+    Args:
+        scheduler: A FetchScheduler to send the request through.
         search_term: A string representing the search term.
         begin_date: A string representing the start date in format YYYYMMDD.
         end_date: A string representing the end date in format YYYYMMDD.
         api_key: A string representing a NYTimes Developer API key.
         page: An int representing page number for the results of the search.
-              Default is one. (Optional).
+              Default is zero. (Optional).
+        cache: A ResponseCache to look the response up in and store it in.
+               (Optional).
+
+    Returns:
+        A Future that resolves to the Response.
+    """
+    if cache is None:
+        return scheduler.submit(request_articles, search_term, begin_date,
+                                end_date, api_key, page)
+    return cache.submit(articles_cache_key(search_term, begin_date, end_date,
+                                           page),
+                        scheduler, request_articles, search_term, begin_date,
+                        end_date, api_key, page)
+
+def month_counts_cache_key(search_term, begin_date, end_date):
+    """
+    Make the response cache key for a request counting hits by month.
+
+    Args:
+        search_term: A string representing the search term.
+        begin_date: A string representing the start date in format YYYYMMDD.
+        end_date: A string representing the end date in format YYYYMMDD.
+
+    Returns:
+        A string identifying the request, which does not depend on the API key.
+    """
+    return ResponseCache.key(ARTICLE_SEARCH_URL,
+                             {"q": search_term, "begin_date": begin_date,
+                              "end_date": end_date, "fl": COUNT_FIELDS,
+                              "facet_fields": "pub_month"})
+
+def request_month_counts(search_term, begin_date, end_date, api_key,
+                         cache=None):
+    """
+    Gets the number of hits in each month of a date range from the NYTimes
+    Article Search API in one request, asking for as little else as possible:
+    only the ids of the first page of articles, and the hits counted by month
+    of publication as a facet.
+
+    Args:
+        search_term: A string representing the search term.
+        begin_date: A string representing the start date in format YYYYMMDD.
+        end_date: A string representing the end date in format YYYYMMDD. The
+        range should not be longer than a year, since months of different
+        years are counted together.
+        api_key: A string representing a NYTimes Developer API key.
+        cache: A ResponseCache to look the response up in and store it in.
+               (Optional).
 
     Returns:
         A Response for this request in NYTimes Article Search API.
     """
-    return requests.get(f"https://api.nytimes.com/svc/search/v2/" \
-                        f"articlesearch.json?q={search_term}&fq=" \
-                        f"source:(\"The New York Times\")&begin_" \
-                        f"date={begin_date}&end_date={end_date}&" \
-                        f"page={page}&api-key={api_key}")
+    if cache is not None:
+        return cache.call(month_counts_cache_key(search_term, begin_date,
+                                                 end_date),
+                          lambda: request_month_counts(search_term, begin_date,
+                                                       end_date, api_key))
+
+    return requests.get(ARTICLE_SEARCH_URL,
+                        params={"q": search_term,
+                                "fq": "source:(\"The New York Times\")",
+                                "begin_date": begin_date,
+                                "end_date": end_date,
+                                "fl": COUNT_FIELDS,
+                                "facet": "true",
+                                "facet_fields": "pub_month",
+                                "facet_filter": "true",
+                                "api-key": api_key},
+                        timeout=REQUEST_TIMEOUT)
+
+def submit_request_month_counts(scheduler, search_term, begin_date, end_date,
+                                api_key, cache=None):
+    """
+    Schedule a request counting hits by month, answering it from the cache
+    without using any of the rate limit if it has been made before.
+
+    Args:
+        scheduler: A FetchScheduler to send the request through.
+        search_term: A string representing the search term.
+        begin_date: A string representing the start date in format YYYYMMDD.
+        end_date: A string representing the end date in format YYYYMMDD.
+        api_key: A string representing a NYTimes Developer API key.
+        cache: A ResponseCache to look the response up in and store it in.
+               (Optional).
+
+    Returns:
+        A Future that resolves to the Response.
+    """
+    if cache is None:
+        return scheduler.submit(request_month_counts, search_term, begin_date,
+                                end_date, api_key)
+    return cache.submit(month_counts_cache_key(search_term, begin_date,
+                                               end_date),
+                        scheduler, request_month_counts, search_term,
+                        begin_date, end_date, api_key)
+
+def get_month_counts(response_):
+    """
+    Finds the number of results in each month for a request made by
+    request_month_counts.
+
+    Args:
+        response_: A Response from the NYTimes article search API.
+
+    Returns:
+        A dictionary from each month number (1 to 12) with results to its
+        number of hits.
+    """
+    return article_month_counts(response_document(response_))
 
 def get_hits(response_):
     """
@@ -99,12 +267,67 @@ def get_hits(response_):
         A positive integer representing number of hits, as indicated by the
         API response.
     """
-    return pyjq.all(".response .meta .hits", response_.json())[0]
+    return article_hits(response_document(response_))
+
+def get_docs(response_):
+    """
+    Finds the id and main headline of each article in a NYTimes API response.
+
+    Args:
+        response_: A Response from the NYTimes article search API.
+
+    Returns:
+        A list of [id, headline] lists, one for each article on the page that
+        has a headline.
+    """
+    return headline_docs(article_docs(response_document(response_)))
+
+def headline_docs(docs):
+    """
+    Leave out the articles without a headline, which would otherwise be
+    saved as the text None and break indexing.
+
+    Args:
+        docs: A list of [id, headline] lists, as given by
+        extraction.article_docs.
+
+    Returns:
+        A list of the [id, headline] lists whose headline is not empty.
+    """
+    return [doc for doc in docs if doc[1]]
+
+def split_date_range(begin_date, end_date):
+    """
+    Split a date range within one month into smaller date ranges.
+
+    Ranges longer than a week are split into weeks, and shorter ones into
+    single days.
+
+    Args:
+        begin_date: A string representing the start date in format YYYYMMDD.
+        end_date: A string representing the end date in format YYYYMMDD, in
+        the same month as begin_date.
+
+    Returns:
+        A list of [begin_date, end_date] lists covering the same days.
+    """
+    year_month = begin_date[:6]
+    first_day = int(begin_date[6:])
+    last_day = int(end_date[6:])
+    step = 7 if last_day - first_day >= 7 else 1
+
+    return [[f"{year_month}{day:02d}",
+             f"{year_month}{min(day + step - 1, last_day):02d}"]
+            for day in range(first_day, last_day + 1, step)]
 
 def write_data_to_file(country_name, date, num_hits, headlines):
     """
     Write collected data to csv file for one month.
 
+    The month replaces the file's row for the same month if there is one. To
+    write many months, a DatasetWriter from the writing module saves them in
+    batches instead of reading and writing the file for each one.
+
     Args:
         country_name: A string representing the name of the country whose data
         is being collected
@@ -116,23 +339,8 @@ def write_data_to_file(country_name, date, num_hits, headlines):
     Returns:
         None.
     """
-    information = pd.DataFrame([[country_name, date, num_hits, headlines]],
-                               columns = ['Country Name', 'MM-YYYY',
-                                          'Number of Hits',
-                                          'Month\'s Headlines'])
-
-    filepath = f'CountryData/{country_name}_data.csv'
-
-    if path.exists(filepath):
-        existing_data = pd.read_csv(filepath)
-
-        if existing_data["Country Name"].dropna().empty:
-            information.to_csv(filepath, mode = 'w', header = True, index = False)
-        else:
-            information.to_csv(filepath, mode = 'a', header = False, index = False)
-
-    else:
-        information.to_csv(filepath, mode = 'w', header = True, index = False)
+    with DatasetWriter(country_name) as writer:
+        writer.write(date, num_hits, headlines)
 
 def reset_data_entries(country_name):
     """
@@ -153,7 +361,97 @@ def reset_data_entries(country_name):
     new_table.to_csv(f'CountryData/{country_name}_data.csv', mode = 'w',
                      header = True, index = False)
 
-def monthly_hits(search_term, begin_month, end_month, api_key):
+def month_list(begin_month, end_month):
+    """
+    List every month in a time period (inclusive).
+
+    Args:
+        begin_month: String representing the starting month in the format
+        YYYYMM.
+        end_month: String representing the ending month in the format
+        YYYYMM.
+
+    Returns:
+        A list of strings representing each month in the format YYYYMM.
+    """
+    return format_year_months(month_range(begin_month, end_month)).tolist()
+
+def iter_monthly_hits(search_term, begin_month, end_month, api_key,
+                      scheduler=None, cache=None, by_year=True):
+    """
+    Go through the hits per month for a search term in a time period
+    (inclusive), giving back each month as soon as it and the months before
+    it are done.
+
+    By default the months of each year are counted with one request that
+    leaves out the articles themselves (see request_month_counts), so a year
+    costs one request instead of twelve. If the months' counts don't add up
+    to the year's hits, as when the facet leaves months out, the months of
+    that year are requested one at a time instead. Only MONTHS_IN_FLIGHT
+    requests are made ahead of the one being waited on, so nothing builds up
+    if the months are used slower than they arrive.
+
+    Args:
+        search_term: String representing the search query (country name).
+        begin_month: String representing the starting month in the format
+        YYYYMM.
+        end_month: String representing the ending month in the format
+        YYYYMM.
+        api_key: String representing a NYTimes Developer API key.
+        scheduler: A FetchScheduler to send the requests through. Default is
+        the scheduler shared by the whole process. (Optional).
+        cache: A ResponseCache to answer repeated requests from. (Optional).
+        by_year: A boolean that is False to make a full request for each
+        month instead, sharing cached responses with headline collection.
+        (Optional).
+
+    Yields:
+        A list of the search term, the month in YYYYMM format and its number
+        of hits.
+    """
+    scheduler = scheduler or default_scheduler()
+
+    def iter_each_month(months):
+        begin_dates, end_dates = month_date_ranges(months)
+        responses = iter_in_order(
+            lambda dates: submit_request_articles(scheduler, search_term,
+                                                  dates[0], dates[1], api_key,
+                                                  cache=cache),
+            zip(begin_dates.tolist(), end_dates.tolist()), MONTHS_IN_FLIGHT)
+        for current_month, response in zip(months, responses):
+            yield [search_term, current_month, get_hits(response)]
+
+    months = month_list(begin_month, end_month)
+    if not by_year:
+        yield from iter_each_month(months)
+        return
+
+    years = [list(year_months) for _, year_months in
+             groupby(months, key=lambda year_month: year_month[:4])]
+
+    def submit_year(year_months):
+        begin_dates, end_dates = month_date_ranges([year_months[0],
+                                                    year_months[-1]])
+        return submit_request_month_counts(scheduler, search_term,
+                                           begin_dates[0], end_dates[1],
+                                           api_key, cache)
+
+    responses = iter_in_order(submit_year, years, MONTHS_IN_FLIGHT)
+    for year_months, response in zip(years, responses):
+        if len(year_months) == 1:
+            yield [search_term, year_months[0], get_hits(response)]
+            continue
+        document = response_document(response)
+        counts = article_month_counts(document)
+        if sum(counts.values()) != article_hits(document):
+            yield from iter_each_month(year_months)
+            continue
+        for current_month in year_months:
+            yield [search_term, current_month,
+                   counts.get(int(current_month[4:]), 0)]
+
+def monthly_hits(search_term, begin_month, end_month, api_key, scheduler=None,
+                 cache=None, by_year=True):
     """
     Gives hits per month for a search term in a time period (inclusive).
 
@@ -164,33 +462,219 @@ def monthly_hits(search_term, begin_month, end_month, api_key):
         end_month: String representing the ending month in the format
         YYYYMM.
         api_key: String representing a NYTimes Developer API key.
+        scheduler: A FetchScheduler to send the requests through. Default is
+        the scheduler shared by the whole process. (Optional).
+        cache: A ResponseCache to answer repeated requests from. (Optional).
+        by_year: A boolean that is False to make a full request for each
+        month instead of one hits-only request per year. (Optional).
 
     Returns:
         search_date_hits: A list containing integers representing the monthly
         number of hits for the search term.
     """
-    search_date_hits = []
-    i = 0
-    current_month = begin_month
-    while current_month != next_month(end_month):
-        #Appends "01" to YYYYMM and appends days_in_month(current_month)
-        #to get start and end dates
-        search_date_hits.append(
-            [
-                search_term,
-                current_month,
-                get_hits(request_articles(search_term, current_month + \
-                "01", current_month + days_in_month(current_month), api_key))
-            ]
-        )
-        i += 1
-        current_month = next_month(current_month)
-        time.sleep(6)
-    return search_date_hits
-
-def collect_headlines_and_hits(search_query, yyyymm_start, yyyymm_end, api_key):
+    return list(iter_monthly_hits(search_term, begin_month, end_month, api_key,
+                                  scheduler, cache, by_year))
+
+@stage("survey")
+def survey_hits(search_terms, begin_month, end_month, api_key, scheduler=None,
+                cache=None):
     """
-    Collect the headlines and hits over a period of time for a given search
+    Count the hits per month for several search terms at once, sharing one
+    rate limit between them, with one hits-only request per term and year.
+
+    Args:
+        search_terms: A list of strings that represent the search terms.
+        begin_month: String representing the starting month in the format
+        YYYYMM.
+        end_month: String representing the ending month in the format
+        YYYYMM.
+        api_key: String representing a NYTimes Developer API key.
+        scheduler: A FetchScheduler to send the requests through. Default is
+        the scheduler shared by the whole process. (Optional).
+        cache: A ResponseCache to answer repeated requests from. (Optional).
+
+    Returns:
+        A dictionary mapping each search term to the list returned by
+        monthly_hits for it.
+    """
+    scheduler = scheduler or default_scheduler()
+
+    with ThreadPoolExecutor(max_workers=max(1, len(search_terms))) as pool:
+        results = {
+            search_term: pool.submit(monthly_hits, search_term, begin_month,
+                                     end_month, api_key, scheduler, cache)
+            for search_term in search_terms
+        }
+        return {search_term: result.result()
+                for search_term, result in results.items()}
+
+def submit_page(scheduler, search_term, begin_date, end_date, api_key, page=0,
+                cache=None, job=None):
+    """
+    Schedule a page of NYTimes Article Search results and pull out the parts
+    collection needs, skipping the request if a JobStore already has the page.
+
+    Args:
+        scheduler: A FetchScheduler to send the request through.
+        search_term: A string representing the search term.
+        begin_date: A string representing the start date in format YYYYMMDD.
+        end_date: A string representing the end date in format YYYYMMDD.
+        api_key: A string representing a NYTimes Developer API key.
+        page: An int representing page number for the results of the search.
+              Default is zero. (Optional).
+        cache: A ResponseCache to answer repeated requests from. (Optional).
+        job: A JobStore to look the page up in and record it in. (Optional).
+
+    Returns:
+        A Future that resolves to a list of the number of hits and a list of
+        [id, headline] lists for the articles on the page.
+    """
+    page_info = Future()
+    if job is not None:
+        recorded = job.page(search_term, begin_date, end_date, page)
+        if recorded is not None:
+            page_info.set_result(recorded)
+            return page_info
+
+    def read_response(request):
+        try:
+            document = response_document(request.result())
+            result = [article_hits(document), article_docs(document)]
+            if job is not None:
+                job.record_page(search_term, begin_date, end_date, page,
+                                *result)
+            page_info.set_result(result)
+        except Exception as error: # pylint: disable=broad-except
+            page_info.set_exception(error)
+
+    submit_request_articles(scheduler, search_term, begin_date, end_date,
+                            api_key, page, cache).add_done_callback(
+                                read_response)
+    return page_info
+
+def collect_date_range(search_query, begin_date, end_date, api_key, scheduler,
+                       first_page=None, cache=None, job=None):
+    """
+    Collect every article in a date range, splitting the range into smaller
+    ones when it has more hits than the API will page through.
+
+    Args:
+        search_query: A string that represents the search term.
+        begin_date: A string representing the start date in format YYYYMMDD.
+        end_date: A string representing the end date in format YYYYMMDD.
+        api_key: A string that represents the user's public api key.
+        scheduler: A FetchScheduler to send the requests through.
+        first_page: The result of submit_page for page zero of this date range
+        if it has already been requested. (Optional).
+        cache: A ResponseCache to answer repeated requests from. (Optional).
+        job: A JobStore to record fetched pages in. (Optional).
+
+    Returns:
+        A dictionary mapping article ids to headlines, in the order the API
+        returned them, leaving out articles without a headline.
+    """
+    if first_page is None:
+        first_page = submit_page(scheduler, search_query, begin_date, end_date,
+                                 api_key, cache=cache, job=job).result()
+    num_hits, docs = first_page
+    articles = dict(headline_docs(docs))
+
+    if num_hits > PAGE_SIZE * MAX_PAGES and begin_date != end_date:
+        windows = split_date_range(begin_date, end_date)
+        window_pages = [
+            submit_page(scheduler, search_query, window_begin, window_end,
+                        api_key, cache=cache, job=job)
+            for window_begin, window_end in windows
+        ]
+        for (window_begin, window_end), window_page in zip(windows,
+                                                           window_pages):
+            articles.update(collect_date_range(search_query, window_begin,
+                                               window_end, api_key, scheduler,
+                                               window_page.result(), cache,
+                                               job))
+        return articles
+
+    num_pages = min(math.ceil(num_hits / PAGE_SIZE), MAX_PAGES)
+    pages = [
+        submit_page(scheduler, search_query, begin_date, end_date, api_key,
+                    page, cache, job)
+        for page in range(1, num_pages)
+    ]
+    for page in pages:
+        articles.update(headline_docs(page.result()[1]))
+    return articles
+
+def collect_month(search_query, year_month, api_key, scheduler=None,
+                  cache=None, job=None):
+    """
+    Collect the headlines and hits for one month.
+
+    Args:
+        search_query: A string that represents the search term.
+        year_month: A string that represents the month in the YYYYMM format.
+        api_key: A string that represents the user's public api key.
+        scheduler: A FetchScheduler to send the requests through. Default is
+        the scheduler shared by the whole process. (Optional).
+        cache: A ResponseCache to answer repeated requests from. (Optional).
+        job: A JobStore to record fetched pages in. (Optional).
+
+    Returns:
+        A list of the following info: ['country name', 'month', 'hits',
+        'headlines'], where headlines is an empty string if there were no hits.
+    """
+    scheduler = scheduler or default_scheduler()
+    begin_date, end_date = (dates[0] for dates in
+                            month_date_ranges([year_month]))
+
+    first_page = submit_page(scheduler, search_query, begin_date, end_date,
+                             api_key, cache=cache, job=job).result()
+    num_hits = first_page[0]
+    if num_hits == 0:
+        return [search_query, year_month, num_hits, ""]
+
+    articles = collect_date_range(search_query, begin_date, end_date, api_key,
+                                  scheduler, first_page, cache, job)
+    return [search_query, year_month, num_hits, list(articles.values())]
+
+def iter_months(search_query, months, api_key, scheduler=None, cache=None,
+                job=None):
+    """
+    Collect several months at once, giving back each month's info in order as
+    soon as it and the months before it are done.
+
+    Args:
+        search_query: A string that represents the search term.
+        months: A list of strings that represent months in the YYYYMM format.
+        api_key: A string that represents the user's public api key.
+        scheduler: A FetchScheduler to send the requests through. Default is
+        the scheduler shared by the whole process. (Optional).
+        cache: A ResponseCache to answer repeated requests from. (Optional).
+        job: A JobStore to record fetched pages in. (Optional).
+
+    Yields:
+        A list for each month as returned by collect_month.
+    """
+    scheduler = scheduler or default_scheduler()
+
+    # The collecting threads only queue requests on the scheduler and wait on
+    # them, so they need a pool of their own to avoid blocking its workers.
+    with ThreadPoolExecutor(max_workers=MONTHS_IN_FLIGHT) as pool:
+        yield from iter_in_order(
+            lambda current_month: pool.submit(collect_month, search_query,
+                                              current_month, api_key,
+                                              scheduler, cache, job),
+            months, MONTHS_IN_FLIGHT)
+
+def iter_headlines_and_hits(search_query, yyyymm_start, yyyymm_end, api_key,
+                            scheduler=None, cache=None, job=None):
+    """
+    Go through the headlines and hits over a period of time for a given
+    search, giving back each month as soon as it and the months before it are
+    done.
+
+    Only MONTHS_IN_FLIGHT months are collected at a time, so memory use does
+    not grow with the length of the period, and the first month can be used
+    (written, scored, charted) while later ones are still being collected.
 
     Args:
         search_query: A string that represents the search term.
@@ -199,60 +683,148 @@ def collect_headlines_and_hits(search_query, yyyymm_start, yyyymm_end, api_key):
         yyyymm_end: A string that represents the end date in the YYYYMM
         format.
         api_key: A string that represents the user's public api key.
+        scheduler: A FetchScheduler to send the requests through. Default is
+        the scheduler shared by the whole process. (Optional).
+        cache: A ResponseCache to answer repeated requests from. (Optional).
+        job: A JobStore to record fetched pages in. (Optional).
+
+    Yields:
+        A list for each month as returned by collect_month: ['country name',
+        'month', 'hits', 'headlines'].
+    """
+    yield from iter_months(search_query, month_list(yyyymm_start, yyyymm_end),
+                           api_key, scheduler, cache, job)
 
-    Returns:
-        headlines_and_hits: a list containing a list of the following info:
-        ['country name', 'month range', 'hits', 'headlines'] for each month
-        indicated by the time frame for the inputs.
+async def aiter_headlines_and_hits(search_query, yyyymm_start, yyyymm_end,
+                                   api_key, scheduler=None, cache=None,
+                                   job=None):
     """
-    headlines_and_hits = []
-    current_month = yyyymm_start
+    Go through the headlines and hits over a period of time from asyncio code.
+
+    Collection runs on threads as in iter_headlines_and_hits, so the event
+    loop is free while months are being collected.
 
-    while current_month != next_month(yyyymm_end):
-        month_all_info = []
-        month_headlines = []
-        request = request_articles(search_query, current_month + \
-                "01", current_month + days_in_month(current_month), api_key)
-        num_hits = get_hits(request)
+    Args:
+        search_query: A string that represents the search term.
+        yyyymm_start: A string that represents the start date in the YYYYMM
+        format.
+        yyyymm_end: A string that represents the end date in the YYYYMM
+        format.
+        api_key: A string that represents the user's public api key.
+        scheduler: A FetchScheduler to send the requests through. Default is
+        the scheduler shared by the whole process. (Optional).
+        cache: A ResponseCache to answer repeated requests from. (Optional).
+        job: A JobStore to record fetched pages in. (Optional).
 
-        month_all_info += [search_query, current_month, num_hits]
+    Yields:
+        A list for each month as returned by collect_month.
+    """
+    loop = asyncio.get_running_loop()
+    months = iter_headlines_and_hits(search_query, yyyymm_start, yyyymm_end,
+                                     api_key, scheduler, cache, job)
+    try:
+        while True:
+            entry = await loop.run_in_executor(None, next, months, None)
+            if entry is None:
+                return
+            yield entry
+    finally:
+        await loop.run_in_executor(None, months.close)
+
+def collect_headlines_and_hits(search_query, yyyymm_start, yyyymm_end, api_key,
+                               scheduler=None, cache=None, job=None):
+    """
+    Collect the headlines and hits over a period of time for a given search
 
-        if num_hits == 0:
-            month_all_info.append("")
-            headlines_and_hits.append(month_all_info)
-            current_month = next_month(current_month)
-            continue
+    Months are collected several at a time, and the pages within each month
+    are requested in parallel. Headlines are de-duplicated by article id. To
+    use each month as soon as it is collected, see iter_headlines_and_hits.
 
-        num_pages = math.ceil(num_hits / 10)
-        page_headlines = pyjq.all('.response .docs[] .headline .main',
-                                  request.json())
+    Args:
+        search_query: A string that represents the search term.
+        yyyymm_start: A string that represents the start date in the YYYYMM
+        format.
+        yyyymm_end: A string that represents the end date in the YYYYMM
+        format.
+        api_key: A string that represents the user's public api key.
+        scheduler: A FetchScheduler to send the requests through. Default is
+        the scheduler shared by the whole process. (Optional).
+        cache: A ResponseCache to answer repeated requests from. (Optional).
+        job: A JobStore to record fetched pages in. (Optional).
 
-        month_headlines += page_headlines
+    Returns:
+        headlines_and_hits: a list containing a list of the following info:
+        ['country name', 'month range', 'hits', 'headlines'] for each month
+        indicated by the time frame for the inputs.
+    """
+    return list(iter_headlines_and_hits(search_query, yyyymm_start, yyyymm_end,
+                                        api_key, scheduler, cache, job))
 
-        time.sleep(6)
-        if num_pages >= 1:
-            for _ in range(1, num_pages):
-                begin_date = current_month + "01"
-                end_date = current_month + days_in_month(current_month)
-                request = request_articles(search_query, begin_date, end_date,
-                                           api_key)
-                page_headlines = pyjq.all('.response .docs[] .headline .main',
-                                          request.json())
-                month_headlines += page_headlines
-                time.sleep(6)
+def collect_countries(search_queries, yyyymm_start, yyyymm_end, api_key,
+                      scheduler=None, cache=None):
+    """
+    Collect the headlines and hits for several search terms at once, sharing
+    one rate limit between them.
 
-            month_all_info.append(month_headlines)
+    Args:
+        search_queries: A list of strings that represent the search terms.
+        yyyymm_start: A string that represents the start date in the YYYYMM
+        format.
+        yyyymm_end: A string that represents the end date in the YYYYMM
+        format.
+        api_key: A string that represents the user's public api key.
+        scheduler: A FetchScheduler to send the requests through. Default is
+        the scheduler shared by the whole process. (Optional).
+        cache: A ResponseCache to answer repeated requests from. (Optional).
 
-        headlines_and_hits.append(month_all_info)
-        current_month = next_month(current_month)
+    Returns:
+        A dictionary mapping each search term to the list returned by
+        collect_headlines_and_hits for it.
+    """
+    scheduler = scheduler or default_scheduler()
+
+    with ThreadPoolExecutor(max_workers=max(1, len(search_queries))) as pool:
+        results = {
+            search_query: pool.submit(collect_headlines_and_hits, search_query,
+                                      yyyymm_start, yyyymm_end, api_key,
+                                      scheduler, cache)
+            for search_query in search_queries
+        }
+        return {search_query: result.result()
+                for search_query, result in results.items()}
+
+def mark_months_done(job, search_term, months):
+    """
+    Record months as written in a job store and empty the list of them.
 
-    return headlines_and_hits
+    Args:
+        job: A JobStore, or None to only empty the list.
+        search_term: String representing the search query.
+        months: A list of strings representing months in the format YYYYMM.
 
-def write_hits_and_headlines_to_file(search_term, begin_month, end_month, api_key):
+    Returns:
+        None.
+    """
+    if job is not None:
+        for month in months:
+            job.mark_month_done(search_term, month)
+    months.clear()
+
+@stage("collect")
+def write_hits_and_headlines_to_file(search_term, begin_month, end_month, api_key,
+                                     scheduler=None, cache=None, job=None,
+                                     index=None):
     """
     For a given search term and start/end dates, write the collected data to a
     csv file, with a new row for each month's info
 
+    Months are written in batches, in order, through a DatasetWriter, and
+    replace any rows already in the file for the same months. With a
+    JobStore, months it has recorded as written are skipped if the csv file
+    still has them, so re-running an interrupted call carries on from where it
+    stopped, while months lost since, by deleting the file or resetting it
+    with reset_data_entries, are collected again.
+
     Args:
         search_term: String representing the search query.
         begin_month: String representing the start date in the format
@@ -260,20 +832,38 @@ def write_hits_and_headlines_to_file(search_term, begin_month, end_month, api_ke
         end_month: String representing the end date in the format
         YYYYMM.
         api_key: String representing a NYTimes Developer API key.
+        scheduler: A FetchScheduler to send the requests through. Default is
+        the scheduler shared by the whole process. (Optional).
+        cache: A ResponseCache to answer repeated requests from. (Optional).
+        job: A JobStore to checkpoint progress in. (Optional).
+        index: A TermIndex from the search module to add the months to as
+        they are written. (Optional).
 
     Returns:
         search_date_hits_and_headlines: A list containing the info that was
         written to the csv file.
     """
-    search_date_hits_and_headlines = collect_headlines_and_hits(search_term,
-                                                                begin_month,
-                                                                end_month,
-                                                                api_key)
-
-    for entry in search_date_hits_and_headlines:
-        monthyear = entry[1]
-
-        date = f'{monthyear[4:]}-{monthyear[0:4]}'
-
-        write_data_to_file(entry[0], date, entry[2], entry[3])
+    months = month_list(begin_month, end_month)
+    search_date_hits_and_headlines = []
+    unsaved_months = []
+    with DatasetWriter(search_term, index=index) as writer:
+        if job is not None:
+            completed_months = job.completed_months(search_term) & \
+                writer.written_months()
+            months = [month for month in months
+                      if month not in completed_months]
+        month_years = dict(zip(months, to_month_years(months).tolist()))
+
+        for entry in iter_months(search_term, months, api_key, scheduler,
+                                 cache, job):
+            monthyear = entry[1]
+
+            date = month_years[monthyear]
+
+            unsaved_months.append(monthyear)
+            count("months_collected_total")
+            if writer.write(date, entry[2], entry[3]):
+                mark_months_done(job, search_term, unsaved_months)
+            search_date_hits_and_headlines.append(entry)
+    mark_months_done(job, search_term, unsaved_months)
     return search_date_hits_and_headlines
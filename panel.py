@@ -0,0 +1,363 @@
+"""
+This module deals with comparing many countries at once.
+
+A CountryPanel holds the hits, sentiment and magnitude of several countries as
+NumPy arrays with one row per country and one column per month, over a month
+index shared by every country, with NaN for months a country was not
+collected. Every statistic works on all the countries at once with array
+operations, so comparing hundreds of countries costs a few array passes rather
+than a DataFrame per country:
+    normalize: scale each country's series (z-scores, fraction of its peak,
+        or share of every country's total in each month).
+    rolling: average or add up each country's series over a moving window.
+    correlation: correlate every pair of countries over the months both have.
+    event_window and event_statistics: line the countries up around a month,
+        such as a coup, and compare them before and after it.
+Panels can be saved and read back as a compressed .npz file.
+"""
+from functools import lru_cache
+import warnings
+from aggregation import HITS, MAGNITUDE, SENTIMENT
+from dataset import file_version
+from dates import MONTH, parse_year_months, to_year_months
+from lazy import lazy_import
+from storage import country_data_source, frame_columns, read_frame, \
+    replace_file
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# The panel's metrics and the data file column each is read from.
+METRICS = {"hits": HITS, "sentiment": SENTIMENT, "magnitude": MAGNITUDE}
+
+NORMALIZATIONS = ("zscore", "peak", "share")
+
+class CountryPanel:
+    """
+    The hits, sentiment and magnitude of several countries, month by month.
+
+    Attributes:
+        countries: A list of strings of the country names, in row order.
+        months: A NumPy datetime64[M] array of every month from the first
+        collected for any country to the last, in column order.
+        hits, sentiment, magnitude: NumPy float32 arrays with a row for each
+        country and a column for each month, NaN where a month was not
+        collected or scored.
+    """
+
+    def __init__(self, countries, months, hits, sentiment, magnitude):
+        """
+        Args:
+            countries: A list of strings of the country names.
+            months: A NumPy datetime64[M] array of consecutive months.
+            hits: An array of shape (countries, months).
+            sentiment: An array of shape (countries, months).
+            magnitude: An array of shape (countries, months).
+        """
+        self.countries = list(countries)
+        self.months = np.asarray(months, dtype=MONTH)
+        self.hits = np.asarray(hits, dtype=np.float32)
+        self.sentiment = np.asarray(sentiment, dtype=np.float32)
+        self.magnitude = np.asarray(magnitude, dtype=np.float32)
+        self._rows = {country: row for row, country
+                      in enumerate(self.countries)}
+
+    @classmethod
+    def from_countries(cls, country_names):
+        """
+        Read the data files of several countries into a panel.
+
+        Args:
+            country_names: A list of strings of the country names.
+
+        Returns:
+            A CountryPanel.
+        """
+        frames = []
+        for country_name in country_names:
+            # Countries not processed yet have no sentiment columns, and are
+            # left NaN below.
+            source = country_data_source(country_name)
+            present = frame_columns(source)
+            frames.append(read_frame(source, ["MM-YYYY"] + [
+                column for column in METRICS.values() if column in present]))
+        country_months = [parse_year_months(to_year_months(frame["MM-YYYY"]))
+                          for frame in frames]
+        collected = [months for months in country_months if len(months)]
+        if not collected:
+            months = np.array([], dtype=MONTH)
+        else:
+            months = np.arange(min(months.min() for months in collected),
+                               max(months.max() for months in collected) + 1)
+
+        arrays = {metric: np.full((len(frames), len(months)), np.nan,
+                                  dtype=np.float32) for metric in METRICS}
+        for row, (frame, months_collected) in enumerate(zip(frames,
+                                                            country_months)):
+            columns = (months_collected - months[0]).astype(np.int64) \
+                if len(months_collected) else []
+            for metric, column in METRICS.items():
+                if column in frame:
+                    arrays[metric][row, columns] = pd.to_numeric(
+                        frame[column]).to_numpy(dtype=np.float32)
+        return cls(country_names, months, **arrays)
+
+    @classmethod
+    def load(cls, filepath):
+        """
+        Read a panel saved by save.
+
+        Args:
+            filepath: A string representing the path of the .npz file.
+
+        Returns:
+            A CountryPanel.
+        """
+        with np.load(filepath) as saved:
+            return cls(saved["countries"].tolist(), saved["months"],
+                       saved["hits"], saved["sentiment"], saved["magnitude"])
+
+    def save(self, filepath):
+        """
+        Write the panel to a file.
+
+        Args:
+            filepath: A string representing the path of the .npz file.
+
+        Returns:
+            None.
+        """
+        def write(temporary_path):
+            with open(temporary_path, "wb") as saved:
+                np.savez_compressed(
+                    saved, countries=np.array(self.countries, dtype=str),
+                    months=self.months, hits=self.hits,
+                    sentiment=self.sentiment, magnitude=self.magnitude)
+
+        replace_file(filepath, write)
+
+    def metric(self, metric):
+        """
+        Give one metric's array.
+
+        Args:
+            metric: A string, one of the keys of METRICS.
+
+        Returns:
+            A NumPy array of shape (countries, months), shared with the panel.
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r}; expected one of "
+                             f"{', '.join(METRICS)}")
+        return getattr(self, metric)
+
+    def row(self, country_name):
+        """
+        Give a country's row number.
+
+        Args:
+            country_name: A string representing the name of the country.
+
+        Returns:
+            An int.
+
+        Raises:
+            KeyError: If the country is not in the panel.
+        """
+        return self._rows[country_name]
+
+    def frame(self, values):
+        """
+        Label an array of the panel's shape for display.
+
+        Args:
+            values: A metric name or an array of shape (countries, months),
+            such as returned by normalize or rolling.
+
+        Returns:
+            A pandas DataFrame with a column for each country, indexed by the
+            first day of each month.
+        """
+        if isinstance(values, str):
+            values = self.metric(values)
+        return pd.DataFrame(np.asarray(values).T, columns=self.countries,
+                            index=pd.DatetimeIndex(
+                                self.months.astype("datetime64[ns]"),
+                                name="Month"))
+
+    def normalize(self, metric, method="zscore"):
+        """
+        Scale a metric so countries of different sizes can be compared.
+
+        Args:
+            metric: A string, one of the keys of METRICS.
+            method: A string, one of NORMALIZATIONS: "zscore" to subtract each
+            country's mean and divide by its standard deviation, "peak" to
+            divide by each country's largest value, or "share" to divide by
+            every country's total in each month. (Optional).
+
+        Returns:
+            A NumPy float64 array of shape (countries, months).
+        """
+        values = self.metric(metric).astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if method == "zscore":
+                return (values - np.nanmean(values, axis=1, keepdims=True)) \
+                    / np.nanstd(values, axis=1, keepdims=True)
+            if method == "peak":
+                return values / np.nanmax(np.abs(values), axis=1,
+                                          keepdims=True)
+            if method == "share":
+                return values / np.nansum(values, axis=0, keepdims=True)
+        raise ValueError(f"Unknown normalization {method!r}; expected one of "
+                         f"{', '.join(NORMALIZATIONS)}")
+
+    def rolling(self, metric, window, how="mean"):
+        """
+        Average or add up a metric over a moving window of months, skipping
+        missing months.
+
+        Args:
+            metric: A string, one of the keys of METRICS, or an array of shape
+            (countries, months).
+            window: An int representing the number of months in the window,
+            which ends at each month.
+            how: A string, "mean" or "sum". (Optional).
+
+        Returns:
+            A NumPy float64 array of shape (countries, months), NaN for the
+            first window - 1 months and for months without a value.
+        """
+        values = np.asarray(self.metric(metric) if isinstance(metric, str)
+                            else metric, dtype=np.float64)
+        present = ~np.isnan(values)
+        padding = np.zeros((len(values), 1))
+        sums = np.hstack([padding, np.cumsum(np.where(present, values, 0),
+                                             axis=1)])
+        counts = np.hstack([padding, np.cumsum(present, axis=1)])
+        window_sums = sums[:, window:] - sums[:, :-window]
+        window_counts = counts[:, window:] - counts[:, :-window]
+
+        result = np.full(values.shape, np.nan)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            totals = window_sums / window_counts if how == "mean" \
+                else window_sums
+        result[:, window - 1:] = np.where(window_counts > 0, totals, np.nan)
+        result[~present] = np.nan
+        return result
+
+    def correlation(self, metric):
+        """
+        Correlate every pair of countries' series, each pair over the months
+        both have values for.
+
+        Args:
+            metric: A string, one of the keys of METRICS, or an array of shape
+            (countries, months).
+
+        Returns:
+            A pandas DataFrame of Pearson correlations with a row and column
+            for each country, NaN for pairs with fewer than two months in
+            common or no variation.
+        """
+        values = np.asarray(self.metric(metric) if isinstance(metric, str)
+                            else metric, dtype=np.float64)
+        present = (~np.isnan(values)).astype(np.float64)
+        values = np.nan_to_num(values)
+
+        # Sums over the months each pair has in common, for every pair at once.
+        count = present @ present.T
+        sum_x = values @ present.T
+        sum_xx = (values ** 2) @ present.T
+        sum_xy = values @ values.T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            correlations = (count * sum_xy - sum_x * sum_x.T) / np.sqrt(
+                (count * sum_xx - sum_x ** 2)
+                * (count * sum_xx.T - sum_x.T ** 2))
+        correlations[count < 2] = np.nan
+        return pd.DataFrame(np.clip(correlations, -1, 1),
+                            index=self.countries, columns=self.countries)
+
+    def event_window(self, metric, event_month, before=6, after=6):
+        """
+        Line every country's series up around a month.
+
+        Args:
+            metric: A string, one of the keys of METRICS, or an array of shape
+            (countries, months).
+            event_month: A string representing the month in YYYYMM format.
+            before: An int representing the months to include before it.
+            (Optional).
+            after: An int representing the months to include after it.
+            (Optional).
+
+        Returns:
+            A NumPy float64 array with a row for each country and a column for
+            each month from before months before the event to after months
+            after it, NaN for months outside the panel.
+        """
+        values = np.asarray(self.metric(metric) if isinstance(metric, str)
+                            else metric, dtype=np.float64)
+        event = int((parse_year_months(event_month) - self.months[0])
+                    .astype(np.int64)) if len(self.months) else 0
+        columns = np.arange(event - before, event + after + 1)
+        inside = (columns >= 0) & (columns < len(self.months))
+        window = np.full((len(values), len(columns)), np.nan)
+        window[:, inside] = values[:, columns[inside]]
+        return window
+
+    def event_statistics(self, metric, event_month, before=6, after=6):
+        """
+        Compare each country's series before and after a month.
+
+        Args:
+            metric: A string, one of the keys of METRICS, or an array of shape
+            (countries, months).
+            event_month: A string representing the month in YYYYMM format.
+            before: An int representing the months before it to average.
+            (Optional).
+            after: An int representing the months after it to average, not
+            counting the month itself. (Optional).
+
+        Returns:
+            A pandas DataFrame indexed by country with the columns "Before"
+            (the mean of the months before the event), "Event" (the event's
+            month), "After" (the mean of the months after it) and "Change"
+            (After minus Before).
+        """
+        window = self.event_window(metric, event_month, before, after)
+        with warnings.catch_warnings():
+            # Countries with no values on one side of the event get NaN.
+            warnings.simplefilter("ignore", RuntimeWarning)
+            statistics = pd.DataFrame(
+                {"Before": np.nanmean(window[:, :before], axis=1),
+                 "Event": window[:, before],
+                 "After": np.nanmean(window[:, before + 1:], axis=1)},
+                index=pd.Index(self.countries, name="Country Name"))
+        statistics["Change"] = statistics["After"] - statistics["Before"]
+        return statistics
+
+@lru_cache(maxsize=8)
+def _load_panel(country_names, versions):
+    """
+    Read a panel. The data files' versions are only part of the cache key.
+    """
+    del versions
+    return CountryPanel.from_countries(list(country_names))
+
+def load_panel(country_names):
+    """
+    Give the panel of several countries, read again only when one of their
+    data files changes.
+
+    Args:
+        country_names: A list of strings of the country names.
+
+    Returns:
+        A CountryPanel, shared by every caller, whose arrays should not be
+        modified.
+    """
+    country_names = tuple(country_names)
+    return _load_panel(country_names, tuple(
+        file_version(country_data_source(country_name))
+        for country_name in country_names))
@@ -0,0 +1,277 @@
+"""
+This module deals with running the whole workflow for many countries at once.
+
+For each country the pipeline runs three stages, each after the one before it
+has finished for that country:
+    obtain: collect hits and headlines into the country's csv
+        (obtaining.write_hits_and_headlines_to_file).
+    process: score the sentiment of each month
+        (processing.sentiment_and_magnitude_to_csv).
+    render: save the country's charts as PNG files (rendering.save_chart).
+Different countries are in different stages at the same time: one country can
+be rendered while the next is scored and others are still being collected.
+Collection and scoring run on threads, since they mostly wait on the APIs, and
+every country draws from one FetchScheduler per API, so the rate limits hold
+for the whole run. Rendering is CPU-bound and runs in worker processes.
+
+Run this module with a list of countries and a date range to use it from the
+command line, for example:
+    python pipeline.py Chile Bolivia --start 197301 --end 197312 --nyt-key KEY
+"""
+import argparse
+from concurrent.futures import Future, ProcessPoolExecutor, \
+    ThreadPoolExecutor, wait
+import multiprocessing
+import os
+from os import path
+import threading
+from caching import ResponseCache
+from flags import flag_path
+from jobs import JobStore
+from obtaining import write_hits_and_headlines_to_file
+from processing import API_KEY, API_PATH, sentiment_and_magnitude_to_csv
+from rendering import save_chart
+from scheduling import default_scheduler
+from sentiment import BACKENDS, SentimentEngine
+
+STAGES = ("obtain", "process", "render")
+DEPENDENCIES = {"obtain": (), "process": ("obtain",), "render": ("process",)}
+OUTPUT_FOLDER = "Charts"
+
+# Countries collected or scored at once. Collection is limited by the NYT rate
+# limit rather than by this, which only bounds the threads left waiting on it.
+COUNTRIES_IN_FLIGHT = 4
+
+class StageSkipped(Exception):
+    """
+    Given in place of a stage's result when a stage it depends on failed.
+    """
+
+def render_country(country_name, output_folder=OUTPUT_FOLDER):
+    """
+    Save a country's scatter plot, bubble chart and, if it has a flag, word
+    cloud as PNG files.
+
+    Args:
+        country_name: A string representing the name of the country.
+        output_folder: A string representing the folder to save charts in.
+        (Optional).
+
+    Returns:
+        A list of strings representing the paths of the saved charts.
+    """
+    charts = ["scatter", "bubble"]
+    if path.exists(flag_path(country_name)):
+        charts.append("word_cloud")
+
+    os.makedirs(output_folder, exist_ok=True)
+    return [save_chart(path.join(output_folder, f"{country_name}_{chart}.png"),
+                       chart, country_name)
+            for chart in charts]
+
+def copy_outcome(source, target):
+    """
+    Give a future the result or exception of another, finished one.
+
+    Args:
+        source: A finished Future.
+        target: A Future that is not finished.
+
+    Returns:
+        None.
+    """
+    if source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+def run_after(dependencies, executor, func, *args):
+    """
+    Run a function on an executor once other futures have finished.
+
+    Args:
+        dependencies: A list of Futures to wait for.
+        executor: An Executor to run func on.
+        func: The function to run.
+        *args: The arguments to call func with.
+
+    Returns:
+        A Future of func's result. If a dependency fails, func is not run and
+        the future fails with StageSkipped.
+    """
+    future = Future()
+    remaining = [len(dependencies)]
+    lock = threading.Lock()
+
+    def start():
+        executor.submit(func, *args).add_done_callback(
+            lambda finished: copy_outcome(finished, future))
+
+    def dependency_done(dependency):
+        with lock:
+            remaining[0] -= 1
+            if future.done():
+                return
+            if dependency.exception() is not None:
+                future.set_exception(StageSkipped(repr(dependency.exception())))
+                return
+            if remaining[0]:
+                return
+        start()
+
+    if not dependencies:
+        start()
+    for dependency in dependencies:
+        dependency.add_done_callback(dependency_done)
+    return future
+
+def run_pipeline(countries, start_month, end_month, api_key, stages=STAGES,
+                 backend=None, scheduler=None, cache=None, job=None,
+                 output_folder=OUTPUT_FOLDER,
+                 countries_in_flight=COUNTRIES_IN_FLIGHT,
+                 render_processes=None):
+    """
+    Obtain, process and render several countries, overlapping the stages of
+    different countries.
+
+    A country that fails in one stage skips the stages after it, without
+    stopping the other countries.
+
+    Args:
+        countries: A list of strings of country names, used as search terms.
+        start_month: A string representing the first month in YYYYMM format.
+        end_month: A string representing the last month in YYYYMM format.
+        api_key: A string representing a NYTimes Developer API key.
+        stages: A list of the stage names to run. Default is every stage.
+        (Optional).
+        backend: A sentiment backend shared by every country. Default is a
+        SentimentEngine for processing.API_KEY. (Optional).
+        scheduler: A FetchScheduler for NYT requests shared by every country.
+        Default is the scheduler shared by the whole process. (Optional).
+        cache: A ResponseCache to answer repeated requests from. (Optional).
+        job: A JobStore to checkpoint collection in. (Optional).
+        output_folder: A string representing the folder to save charts in.
+        (Optional).
+        countries_in_flight: An int representing how many countries are
+        collected, and how many are scored, at once. (Optional).
+        render_processes: An int representing the number of processes charts
+        are rendered in. Default is the number of CPUs. (Optional).
+
+    Returns:
+        A dictionary from each country to a dictionary from each stage run to
+        its result: the number of months written, the number of months
+        scored, or the list of chart paths. A stage that failed has its
+        exception instead, and StageSkipped if an earlier stage failed.
+    """
+    scheduler = scheduler or default_scheduler()
+    own_backend = backend is None and "process" in stages
+    if own_backend:
+        backend = SentimentEngine(API_PATH + API_KEY, cache=cache)
+
+    def obtain(country_name):
+        return len(write_hits_and_headlines_to_file(
+            country_name, start_month, end_month, api_key, scheduler, cache,
+            job))
+
+    def process(country_name):
+        return sentiment_and_magnitude_to_csv(country_name, backend=backend)
+
+    obtain_threads = ThreadPoolExecutor(countries_in_flight)
+    process_threads = ThreadPoolExecutor(countries_in_flight)
+    render_pool = ProcessPoolExecutor(
+        render_processes, mp_context=multiprocessing.get_context("spawn"))
+    runs = {"obtain": (obtain_threads, obtain),
+            "process": (process_threads, process),
+            "render": (render_pool, render_country)}
+    extra_args = {"render": (output_folder,)}
+
+    futures = {}
+    try:
+        for country_name in countries:
+            for stage in STAGES:
+                if stage not in stages:
+                    continue
+                dependencies = [futures[(country_name, dependency)]
+                                for dependency in DEPENDENCIES[stage]
+                                if dependency in stages]
+                executor, func = runs[stage]
+                futures[(country_name, stage)] = run_after(
+                    dependencies, executor, func, country_name,
+                    *extra_args.get(stage, ()))
+        wait(futures.values())
+    finally:
+        for executor in (obtain_threads, process_threads, render_pool):
+            executor.shutdown()
+        if own_backend:
+            backend.close()
+
+    results = {country_name: {} for country_name in countries}
+    for (country_name, stage), future in futures.items():
+        results[country_name][stage] = future.exception() or future.result()
+    return results
+
+def main(argv=None):
+    """
+    Run the pipeline from the command line.
+
+    Args:
+        argv: A list of the command line arguments. Default is sys.argv.
+        (Optional).
+
+    Returns:
+        An int exit status: 0 if every stage of every country succeeded, 1
+        otherwise.
+    """
+    parser = argparse.ArgumentParser(
+        description="Collect, score and chart NYT coverage of countries.")
+    parser.add_argument("countries", nargs="+", help="countries to run")
+    parser.add_argument("--start", required=True, help="first month, YYYYMM")
+    parser.add_argument("--end", required=True, help="last month, YYYYMM")
+    parser.add_argument("--nyt-key", default=os.environ.get("NYT_API_KEY", ""),
+                        help="NYT API key (default: $NYT_API_KEY)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES,
+                        default=list(STAGES), help="stages to run")
+    parser.add_argument("--backend", choices=sorted(BACKENDS),
+                        default="google", help="sentiment backend")
+    parser.add_argument("--google-key",
+                        default=os.environ.get("GOOGLE_API_KEY", API_KEY),
+                        help="Natural Language API key (default: "
+                        "$GOOGLE_API_KEY)")
+    parser.add_argument("--cache", help="response cache file to use")
+    parser.add_argument("--resume", metavar="JOB_FILE",
+                        help="job file to checkpoint collection in")
+    parser.add_argument("--output", default=OUTPUT_FOLDER,
+                        help="folder to save charts in")
+    parser.add_argument("--countries-in-flight", type=int,
+                        default=COUNTRIES_IN_FLIGHT)
+    parser.add_argument("--render-processes", type=int)
+    args = parser.parse_args(argv)
+
+    cache = ResponseCache(args.cache) if args.cache else None
+    job = JobStore(args.resume) if args.resume else None
+    if args.backend == "google":
+        backend = SentimentEngine(api_key=args.google_key, cache=cache)
+    else:
+        backend = BACKENDS[args.backend]()
+
+    try:
+        results = run_pipeline(
+            args.countries, args.start, args.end, args.nyt_key, args.stages,
+            backend, cache=cache, job=job, output_folder=args.output,
+            countries_in_flight=args.countries_in_flight,
+            render_processes=args.render_processes)
+    finally:
+        backend.close()
+        for store in (cache, job):
+            if store is not None:
+                store.close()
+
+    failed = False
+    for country_name, stage_results in results.items():
+        for stage, result in stage_results.items():
+            failed = failed or isinstance(result, Exception)
+            print(f"{country_name} {stage}: {result!r}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,21 +2,35 @@
 This file deals with processing the collected data.
 
 These functions access the csv file to get headlines and use Google Cloud
-Natural Language API to get sentiment analysis.
+Natural Language API to get sentiment analysis. Whole countries are scored
+through a SentimentEngine from the sentiment module, which sends requests
+concurrently and only once per distinct text, and only months that changed
+since the country was last scored are scored again. Headlines are read from
+the country's headline corpus (see corpus.country_corpus).
 A google cloud account and API key is needed to run some of the functions in
 this module.
 """
 import json
-#import os
-import pandas as pd
-import pyjq
-import requests
+from corpus import country_corpus
+from dataset import load_country_dataset
+from extraction import response_document, sentiment_scores
+from lazy import lazy_import
+from metrics import count, stage
+from sentiment import SentimentEngine, month_fingerprint, sentiment_body, \
+    sentiment_cache_key
+from storage import SHARE_COLUMNS, country_data_path, replace_file, \
+    write_country_frame
+
+requests = lazy_import("requests")
 
 #PATH_LILA = "api-keys/google-api-key-lila"
 #PATH_ALEX = "/home/softdes/Desktop/google-api-key"
 API_PATH = "https://language.googleapis.com/v1/documents:analyzeSentiment?key="
 API_KEY = ""
 
+SCORE_COLUMNS = ["Sentiment Score (-1 to 1)", "Magnitude"]
+FINGERPRINT_EXTENSION = "sentiment.json"
+
 
 #with open(os.path.abspath(PATH_ALEX), "r") as f:
 #    API_KEY = f.readline()
@@ -27,8 +41,8 @@ def headline_list_to_string(country_name, year_month):
     Create one long string out of a list of strings, where the list of strings
     is one month's headlines.
 
-    Accesses csv to take one month's headlines and remove quotes, commas, and
-    other list artifacts.
+    Looks up one month's headlines in the country's dataset and removes
+    quotes, commas, and other list artifacts.
 
     Args:
         country_name: A string representing the name of the country.
@@ -38,31 +52,14 @@ def headline_list_to_string(country_name, year_month):
         headline_text: A string that contains one month's headlines.
     """
 
-    data_frame = pd.read_csv(f'CountryData/{country_name}_data.csv')
-
-    date = f'{year_month[4:]}-{year_month[0:4]}'
-
-    location = data_frame.index[data_frame['MM-YYYY'] == date][0]
-
-    if data_frame["Number of Hits"][location] == 0:
-        return ""
-
-    headlines = data_frame['Month\'s Headlines'][location]
-
-    headline_text = headlines.strip("['']")
-    headline_text = headline_text.replace("', '", " ")
-    headline_text = headline_text.replace(chr(8217)+"s", "")#
-    headline_text = headline_text.replace("'s", "")#
-
-    return headline_text
+    return load_country_dataset(country_name).headline_text(year_month)
 
 def all_headlines_in_string(country_name):
     """
     Create one long string out of all the headlines collected for a country
     over the entire time frame.
 
-    Accesses csv file's Headlines column to get one string of all headlines
-    in all rows.
+    Joins the headlines of every row in the country's dataset into one string.
 
     Args:
         country_name: A string representing the name of the country.
@@ -70,43 +67,29 @@ def all_headlines_in_string(country_name):
         all_text: A string that contains all the headlines merged in one string.
     """
 
-    country_data = pd.read_csv(f'CountryData/{country_name}_data.csv')
-
-    month_headline_strings = []
-
-    for item in country_data['MM-YYYY']:
-        year = item[3:]
-        month = item[0:2]
-
-        month_headline_strings.append(headline_list_to_string(country_name, year + month))
-
-    all_text = " ".join(month_headline_strings)
+    all_text = " ".join(load_country_dataset(country_name).headline_texts())
 
     return all_text
 
 
 #Google Natural Language API Functions
-def request_sentiment(text):
+def request_sentiment(text, cache=None):
     """
     Sends HTTP post to Google Cloud and receives Response.
 
     Args:
         text: A string to have its context
+        cache: A ResponseCache to look the response up in and store it in.
+        Responses are keyed on a hash of the text. (Optional).
 
     Returns:
         A Response from Google Natural Language API.
     """
+    if cache is not None:
+        return cache.call(sentiment_cache_key(text),
+                          lambda: request_sentiment(text))
 
-    body = {
-        "document": {
-            "type": "PLAIN_TEXT",
-            "language": "en-us",
-            "content": text
-        },
-    "encodingType": "UTF32"
-    }
-
-    response = requests.post(API_PATH + API_KEY, data=json.dumps(body))
+    response = requests.post(API_PATH + API_KEY, data=sentiment_body(text))
     return response
 
 def find_sentiment(response):
@@ -119,40 +102,118 @@ def find_sentiment(response):
     Returns:
         A list containing sentiment score and magnitude score for the response.
     """
+    return sentiment_scores(response_document(response))
 
-    sentiment = pyjq.all(".documentSentiment .score", response.json())[0]
-    magnitude = pyjq.all(".documentSentiment .magnitude", response.json())[0]
-    return [sentiment, magnitude]
-
-def sentiment_and_magnitude_to_csv(country_name):
+def load_fingerprints(country_name):
     """
-    Conduct sentiment analysis on monthly headlines for a given country and
-    update the country's data file with the corresponding scores.
+    Read the fingerprints of a country's scored months.
 
     Args:
-        country_name: A string representing the name of the country whose
-        headlines will be analyzed
-    Return:
-        None.
+        country_name: A string representing the name of the country.
+
+    Returns:
+        A dictionary from months in MM-YYYY format to the month_fingerprint
+        they were last scored with, empty if the country was never scored.
+    """
+    try:
+        with open(country_data_path(country_name, FINGERPRINT_EXTENSION),
+                  encoding="utf-8") as fingerprint_file:
+            return json.load(fingerprint_file)
+    except (OSError, ValueError):
+        return {}
+
+def save_fingerprints(country_name, fingerprints):
     """
+    Replace the fingerprints of a country's scored months.
 
-    country_dataframe = pd.read_csv(f'CountryData/{country_name}_data.csv')
+    Args:
+        country_name: A string representing the name of the country.
+        fingerprints: A dictionary from months in MM-YYYY format to their
+        month_fingerprint.
 
-    sentiment_scores = []
-    magnitudes = []
+    Returns:
+        None.
+    """
+    def write(filepath):
+        with open(filepath, "w", encoding="utf-8") as fingerprint_file:
+            json.dump(fingerprints, fingerprint_file, indent=0, sort_keys=True)
 
-    for item in country_dataframe["MM-YYYY"]:
-        year = item[3:]
-        month = item[0:2]
-        text = headline_list_to_string(country_name, year + month)
-        analysis = find_sentiment(request_sentiment(text))
+    replace_file(country_data_path(country_name, FINGERPRINT_EXTENSION), write)
 
-        sentiment_scores.append(analysis[0])
-        magnitudes.append(analysis[1])
+@stage("process")
+def sentiment_and_magnitude_to_csv(country_name, cache=None, backend=None,
+                                   per_headline=False, aggregate="mean",
+                                   incremental=True):
+    """
+    Conduct sentiment analysis on monthly headlines for a given country and
+    update the country's data file with the corresponding scores.
 
-    country_dataframe["Sentiment Score (-1 to 1)"] = sentiment_scores
-    country_dataframe["Magnitude"] = magnitudes
+    Each scored month's fingerprint (see sentiment.month_fingerprint) is kept
+    in a file next to the country's csv, so later runs only score months that
+    are new or whose headlines, backend or scoring options have changed, and
+    leave the other rows as they are.
 
-    updated_dataframe = country_dataframe
+    Args:
+        country_name: A string representing the name of the country whose
+        headlines will be analyzed
+        cache: A ResponseCache to answer repeated requests from. Only used
+        when backend is not given. (Optional).
+        backend: A sentiment backend from the sentiment module to score the
+        headlines with, such as a SentimentEngine or a
+        LexiconSentimentBackend. Default is a new SentimentEngine for API_KEY.
+        (Optional).
+        per_headline: A boolean that is True to score each headline on its
+        own and combine the scores for the month. Default is False, which
+        scores each month's headlines as one document. (Optional).
+        aggregate: A string naming how headline scores are combined: "mean",
+        "weighted" (by magnitude) or "distribution", which averages them and
+        also writes the shares of negative, neutral and positive headlines in
+        the SHARE_COLUMNS. Only used when per_headline is True. (Optional).
+        incremental: A boolean that is False to score every month again.
+        Default is True. (Optional).
+    Return:
+        An int representing the number of months that were scored.
+    """
 
-    updated_dataframe.to_csv(f'CountryData/{country_name}_data.csv', index = False)
+    dataset = load_country_dataset(country_name)
+    country_dataframe = dataset.frame.copy()
+
+    with country_corpus(country_name) as corpus:
+        months = corpus.month_headlines(country_name, dataset.months())
+    if not per_headline:
+        months = [" ".join(headlines) for headlines in months]
+
+    backend_name = "google" if backend is None else backend.name
+    fingerprints = {
+        date: month_fingerprint(month, backend_name, per_headline, aggregate)
+        for date, month in zip(country_dataframe["MM-YYYY"], months)}
+
+    columns = SCORE_COLUMNS + SHARE_COLUMNS \
+        if per_headline and aggregate == "distribution" else SCORE_COLUMNS
+    old_fingerprints = load_fingerprints(country_name) if incremental else {}
+    scores = country_dataframe.get(columns)
+    changed = [row for row, date in enumerate(country_dataframe["MM-YYYY"])
+               if old_fingerprints.get(date) != fingerprints[date]
+               or scores is None or scores.iloc[row].isna().any()]
+    if not changed:
+        return 0
+
+    changed_months = [months[row] for row in changed]
+    if backend is None:
+        with SentimentEngine(API_PATH + API_KEY, cache=cache) as engine:
+            analysis = engine.score_months(changed_months, per_headline,
+                                           aggregate)
+    else:
+        analysis = backend.score_months(changed_months, per_headline,
+                                        aggregate)
+
+    for column in columns:
+        if column not in country_dataframe:
+            country_dataframe[column] = float("nan")
+    country_dataframe.loc[country_dataframe.index[changed], columns] = \
+        [list(month_analysis) for month_analysis in analysis]
+
+    write_country_frame(country_name, country_dataframe)
+    save_fingerprints(country_name, fingerprints)
+    count("months_scored_total", len(changed))
+    return len(changed)
@@ -0,0 +1,318 @@
+"""
+This module deals with drawing charts without a screen, for saving them as
+image files in bulk.
+
+Charts are drawn with matplotlib's object-oriented API onto a Figure with its
+own Agg canvas, never through pyplot, so there is no global figure state to
+clean up and nothing is shown. Each draw_* function draws one chart onto an
+axis it is given; the visualization module uses the same functions to show
+charts in the notebook. save_chart draws a chart and saves it, and
+render_charts saves many charts in worker processes, such as one word cloud
+per month as frames of an animation.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import math
+import multiprocessing
+import os
+from os import path
+from aggregation import HITS, MAX_POINTS, SENTIMENT, chart_series
+from flags import PREVIEW_SIZE, flag_colors, flag_mask
+from lazy import lazy_import
+from metrics import stage, timer
+from panel import METRICS, load_panel
+from termcounts import load_term_counts
+
+backend_agg = lazy_import("matplotlib.backends.backend_agg")
+mdates = lazy_import("matplotlib.dates")
+mpl_figure = lazy_import("matplotlib.figure")
+wc = lazy_import("wordcloud")
+
+CHART_SIZE = (20, 10)
+WORD_CLOUD_SIZE = (20, 20)
+
+# Label of each period's points in charts over time.
+PERIOD_LABELS = {"month": "Month", "quarter": "Quarter", "year": "Year"}
+
+def style_time_axis(axis, period="month"):
+    """
+    Label, space out and tilt the dates of a chart over time.
+
+    Args:
+        axis: A matplotlib Axes whose x-axis holds dates.
+        period: A string, one of the keys of aggregation.PERIODS, for the
+        period of the points drawn. (Optional).
+
+    Returns:
+        None.
+    """
+    yearly = period == "year"
+    axis.set_xlabel(f'Time Frame ({"YYYY" if yearly else "MM-YYYY"})',
+                    fontsize = 20)
+    axis.xaxis.set_major_locator(mdates.AutoDateLocator(maxticks=30))
+    axis.xaxis.set_major_formatter(
+        mdates.DateFormatter("%Y" if yearly else "%m-%Y"))
+    axis.xaxis.labelpad = 30
+    axis.yaxis.labelpad = 30
+    axis.tick_params(axis="x", labelrotation=45)
+
+def date_span(series):
+    """
+    Give the first and last months of a series in MM-YYYY format.
+    """
+    return (series.index[0].strftime("%m-%Y"),
+            series.index[-1].strftime("%m-%Y"))
+
+@stage("render", chart="scatter")
+def draw_scatter_plot(axis, country_name, period="auto",
+                      max_points=MAX_POINTS):
+    """
+    Draw a scatter plot of hits over time for a country.
+
+    Args:
+        axis: A matplotlib Axes to draw on.
+        country_name: A string that is the name of the country for which to
+        visualize number of hits.
+        period: A string, "month", "quarter", "year" or "auto", for the
+        period each point adds up (see aggregation.chart_series). (Optional).
+        max_points: An int representing the most points to draw. (Optional).
+
+    Returns:
+        None.
+    """
+    series, period = chart_series(country_name, period, max_points)
+    begin_date, end_date = date_span(series)
+
+    axis.scatter(series.index, series[HITS])
+
+    axis.set_ylabel('Number of Hits', fontsize = 20)
+    axis.set_title(f'Number of Hits in NYTimes Articles per ' \
+              f'{PERIOD_LABELS[period]} for {country_name} from ' \
+              f'{begin_date} to {end_date}', fontsize = 25)
+
+    style_time_axis(axis, period)
+
+@stage("render", chart="bubble")
+def draw_bubble_chart(axis, country_name, period="auto",
+                      max_points=MAX_POINTS):
+    """
+    Draw a bubble chart for a country based on number of hits and sentiment
+    score over time.
+
+    Args:
+        axis: A matplotlib Axes to draw on.
+        country_name: A string representing the name of the country for which
+        to create a chart.
+        period: A string, "month", "quarter", "year" or "auto", for the
+        period each bubble adds up, with sentiment weighted by hits (see
+        aggregation.chart_series). (Optional).
+        max_points: An int representing the most bubbles to draw. (Optional).
+
+    Returns:
+        None.
+    """
+    if country_name[-7 :] == "_subset":
+        name = country_name[: -7]
+    else:
+        name = country_name
+
+    series, period = chart_series(country_name, period, max_points)
+    begin_date, end_date = date_span(series)
+
+    # Bubbles are sized by the hits of an average month, so they keep the
+    # same scale whatever the period.
+    scatterplot = axis.scatter(series.index, series[SENTIMENT],
+              s = 10 * series[HITS] / series["Months"], alpha = .5,
+              color = 'purple')
+
+    axis.set_ylabel('Sentiment Score (-1 to 1)', fontsize = 20)
+    axis.set_title(f"New York Times Mentions and Sentiment for {name} from " \
+              f"{begin_date} to {end_date}", fontsize = 20)
+
+    handles, labels = scatterplot.legend_elements(prop = "sizes",
+    alpha = 0.5, color = "purple", num = 4)
+    title = "Number of Hits Times Ten" if period == "month" \
+        else "Average Monthly Hits Times Ten"
+    axis.legend(handles, labels, title = title,
+    labelspacing = 3, handletextpad = 5, borderpad = 3, bbox_to_anchor = (1, 1))
+
+    style_time_axis(axis, period)
+
+@stage("render", chart="comparison")
+def draw_comparison_chart(axis, country_names, metric="hits",
+                          normalization=None, window=1):
+    """
+    Draw a line per country of a metric over time, for comparing countries.
+
+    Args:
+        axis: A matplotlib Axes to draw on.
+        country_names: A list of strings of the names of the countries.
+        metric: A string, "hits", "sentiment" or "magnitude". (Optional).
+        normalization: A string, one of panel.NORMALIZATIONS, to scale each
+        country's series before drawing it. Default draws the values as they
+        are. (Optional).
+        window: An int representing the number of months to average each
+        point over. (Optional).
+
+    Returns:
+        None.
+    """
+    country_panel = load_panel(country_names)
+    values = country_panel.metric(metric) if normalization is None \
+        else country_panel.normalize(metric, normalization)
+    if window > 1:
+        values = country_panel.rolling(values, window)
+
+    dates = country_panel.months.astype("datetime64[D]")
+    for country_name, country_values in zip(country_panel.countries, values):
+        axis.plot(dates, country_values, label = country_name)
+
+    label = METRICS[metric]
+    if normalization is not None:
+        label = f"{label} ({normalization})"
+    if window > 1:
+        label = f"{label}, {window}-Month Average"
+    axis.set_ylabel(label, fontsize = 20)
+    axis.set_title(f"New York Times Coverage of {', '.join(country_names)}",
+                   fontsize = 25)
+    axis.legend(fontsize = 15)
+
+    style_time_axis(axis)
+
+@stage("render", chart="word_cloud")
+def draw_word_cloud(axis, country_name, start_month=None, end_month=None,
+                    preview=False):
+    """
+    Draw a wordcloud, shaped and colored like the country's flag, of the
+    headlines about a country over a range of months.
+
+    Args:
+        axis: A matplotlib Axes to draw on.
+        country_name: A string representing the name of the country.
+        start_month: A string representing the first month in YYYYMM format.
+        Default is the first month collected. (Optional).
+        end_month: A string representing the last month in YYYYMM format.
+        Default is the last month collected. (Optional).
+        preview: A boolean that is True to draw on a smaller copy of the flag
+        (see flags.PREVIEW_SIZE), which is quicker. (Optional).
+
+    Returns:
+        None. A range without any words leaves the axis blank.
+    """
+    axis.axis('off')
+    frequencies = load_term_counts(country_name).frequencies(start_month,
+                                                             end_month)
+    if not frequencies:
+        return
+
+    max_size = PREVIEW_SIZE if preview else None
+    wordcloud = wc.WordCloud(mask=flag_mask(country_name, max_size),
+                          background_color="white",
+                          max_words = len(frequencies)
+                          ).generate_from_frequencies(frequencies)
+    axis.imshow(wordcloud.recolor(color_func = flag_colors(country_name,
+                                                           max_size)))
+
+CHARTS = {"scatter": (draw_scatter_plot, CHART_SIZE),
+          "bubble": (draw_bubble_chart, CHART_SIZE),
+          "word_cloud": (draw_word_cloud, WORD_CLOUD_SIZE),
+          "comparison": (draw_comparison_chart, CHART_SIZE)}
+
+def chart_figure(chart, country_name, *args, **options):
+    """
+    Draw a chart on a new figure that is not managed by pyplot.
+
+    Args:
+        chart: A string naming the chart, one of the keys of CHARTS.
+        country_name: A string representing the name of the country, or a
+        list of them for a comparison chart.
+        *args: Further arguments of the chart's draw function, such as the
+        months of a word cloud.
+        **options: Keyword arguments of the chart's draw function.
+
+    Returns:
+        A matplotlib Figure with an Agg canvas.
+    """
+    draw, figure_size = CHARTS[chart]
+    figure = mpl_figure.Figure(figsize=figure_size)
+    backend_agg.FigureCanvasAgg(figure)
+    draw(figure.subplots(), country_name, *args, **options)
+    return figure
+
+def save_chart(filepath, chart, country_name, *args, **options):
+    """
+    Draw a chart and save it to an image file, freeing the figure after.
+
+    Args:
+        filepath: A string representing the path of the file to save, whose
+        extension gives the format, such as .png.
+        chart: A string naming the chart, one of the keys of CHARTS.
+        country_name: A string representing the name of the country.
+        *args: Further arguments of the chart's draw function.
+        **options: Keyword arguments of the chart's draw function.
+
+    Returns:
+        The filepath.
+    """
+    figure = chart_figure(chart, country_name, *args, **options)
+    try:
+        with timer("stage_seconds", stage="save"):
+            figure.savefig(filepath, bbox_inches="tight")
+    finally:
+        figure.clear()
+    return filepath
+
+def _save_job(job):
+    filepath, chart, country_name, args, options = job
+    return save_chart(filepath, chart, country_name, *args, **options)
+
+def render_charts(jobs, processes=None):
+    """
+    Save many charts at once in worker processes.
+
+    Args:
+        jobs: A list of (filepath, chart, country_name, args, options) tuples,
+        with the arguments of save_chart, args a tuple and options a
+        dictionary.
+        processes: An int representing how many processes to use. Default is
+        the number of CPUs. (Optional).
+
+    Returns:
+        A list of the saved file paths, in the order of jobs.
+    """
+    if not jobs:
+        return []
+    for filepath, *_ in jobs:
+        if path.dirname(filepath):
+            os.makedirs(path.dirname(filepath), exist_ok=True)
+
+    processes = processes or os.cpu_count() or 1
+    # Jobs are sent in chunks so each process reuses the counts and flags it
+    # has loaded for a country across many charts.
+    chunksize = max(1, math.ceil(len(jobs) / (processes * 4)))
+    with ProcessPoolExecutor(
+            processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(_save_job, jobs, chunksize=chunksize))
+
+def month_word_cloud_jobs(country_name, output_folder, start_month=None,
+                          end_month=None, preview=False):
+    """
+    Plan one word cloud per month for a country, for render_charts.
+
+    Args:
+        country_name: A string representing the name of the country.
+        output_folder: A string representing the folder to save them in.
+        start_month: A string representing the first month in YYYYMM format.
+        Default is the first month collected. (Optional).
+        end_month: A string representing the last month in YYYYMM format.
+        Default is the last month collected. (Optional).
+        preview: A boolean that is True to use a smaller flag. (Optional).
+
+    Returns:
+        A list of jobs saving {output_folder}/{country_name}_{YYYYMM}.png.
+    """
+    months = load_term_counts(country_name).months
+    first = months.index(start_month) if start_month else 0
+    last = months.index(end_month) if end_month else len(months) - 1
+    return [(path.join(output_folder, f"{country_name}_{month}.png"),
+             "word_cloud", country_name, (month, month), {"preview": preview})
+            for month in months[first:last + 1]]
@@ -0,0 +1,319 @@
+"""
+This module deals with scheduling API requests so that many of them can run at
+once without going over the rate limits of the API being called.
+
+Requests are run on a thread pool behind a token-bucket limiter with one bucket
+for requests per minute and one for requests per day. Responses with a status
+code that signals the API is overloaded (HTTP 429 or 5xx), and requests whose
+connection fails or times out, are retried after a backoff that grows each
+time it happens and shrinks again on success. One scheduler can be shared by
+several collection runs (for example, several countries) so that they all draw
+from the same budget. Requests, retries and
+time spent waiting are counted in the metrics module.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from urllib.parse import urlparse
+from lazy import lazy_import
+from metrics import count, timer
+
+requests = lazy_import("requests")
+
+# NYT Article Search allows 10 requests per minute and 4000 per day, which is
+# also why the collection functions used to sleep six seconds between calls.
+NYT_REQUESTS_PER_MINUTE = 10
+NYT_REQUESTS_PER_DAY = 4000
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+class TokenBucket:
+    """
+    A token bucket that refills at a constant rate up to a fixed capacity.
+
+    Attributes:
+        rate: A float representing the number of tokens added per second.
+        capacity: A float representing the maximum number of stored tokens.
+        tokens: A float representing the number of tokens currently stored.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        """
+        Args:
+            rate: A float representing the number of tokens added per second.
+            capacity: A number representing the maximum number of tokens the
+            bucket can hold. The bucket starts full.
+            clock: A function returning the current time in seconds.
+            (Optional).
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._clock = clock
+        self._last_refill = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def wait_time(self):
+        """
+        Find how long to wait until a token is available.
+
+        Returns:
+            A float representing the number of seconds until one token can be
+            taken from the bucket, or 0 if one can be taken now.
+        """
+        self._refill()
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        """
+        Remove one token from the bucket. Only call after wait_time returns 0.
+
+        Returns:
+            None.
+        """
+        self.tokens -= 1
+
+class RateLimiter:
+    """
+    Limits calls to a number of requests per minute and per day.
+
+    Both buckets have to have a token free before a request is let through, so
+    a request never uses up minute budget while waiting on the daily one.
+    """
+
+    def __init__(self, requests_per_minute, requests_per_day, burst=1,
+                 clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            requests_per_minute: A number representing the allowed requests
+            per minute.
+            requests_per_day: A number representing the allowed requests per
+            day, or None for no daily limit.
+            burst: An int representing how many requests can be sent back to
+            back before the per-minute rate applies. Default is one, which
+            spaces requests out evenly. (Optional).
+            clock: A function returning the current time in seconds.
+            (Optional).
+            sleep: A function that sleeps for a number of seconds. (Optional).
+        """
+        self._buckets = [TokenBucket(requests_per_minute / 60, burst, clock)]
+        if requests_per_day is not None:
+            self._buckets.append(
+                TokenBucket(requests_per_day / 86400, requests_per_day, clock))
+        self._sleep = sleep
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a request is allowed by every bucket, then use it up.
+
+        Returns:
+            A float representing the number of seconds spent waiting.
+        """
+        waited = 0
+        while True:
+            with self._lock:
+                wait = max(bucket.wait_time() for bucket in self._buckets)
+                if wait == 0:
+                    for bucket in self._buckets:
+                        bucket.take()
+                    return waited
+            self._sleep(wait)
+            waited += wait
+
+class FetchScheduler:
+    """
+    Runs request functions concurrently under a shared rate limit.
+
+    Functions given to the scheduler should return a requests Response. Those
+    with a status code in RETRY_STATUS_CODES are retried with a backoff that
+    doubles every time the API pushes back, pausing every worker, and halves
+    every time a request succeeds.
+    """
+
+    def __init__(self, requests_per_minute=NYT_REQUESTS_PER_MINUTE,
+                 requests_per_day=NYT_REQUESTS_PER_DAY, max_workers=4, burst=1,
+                 max_retries=5, base_backoff=6, max_backoff=300):
+        """
+        Args:
+            requests_per_minute: A number representing the allowed requests
+            per minute. (Optional).
+            requests_per_day: A number representing the allowed requests per
+            day, or None for no daily limit. (Optional).
+            max_workers: An int representing how many requests can be in
+            flight at once. (Optional).
+            burst: An int representing how many requests can be sent back to
+            back. (Optional).
+            max_retries: An int representing how many times a request is
+            retried before giving up. (Optional).
+            base_backoff: A float representing the first backoff in seconds.
+            (Optional).
+            max_backoff: A float representing the longest backoff in seconds.
+            (Optional).
+        """
+        self.limiter = RateLimiter(requests_per_minute, requests_per_day, burst)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._backoff = 0
+        self._resume_at = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def _wait_for_backoff(self):
+        with self._lock:
+            delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+            count("backoff_wait_seconds_total", delay)
+
+    def _back_off(self, response=None):
+        with self._lock:
+            self._backoff = min(self.max_backoff,
+                                max(self.base_backoff, self._backoff * 2))
+            delay = self._backoff
+            retry_after = "" if response is None \
+                else response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+    def _recover(self):
+        with self._lock:
+            self._backoff /= 2
+
+    def call(self, func, *args, **kwargs):
+        """
+        Call a request function in this thread, respecting the rate limit and
+        retrying when the API pushes back or the connection fails.
+
+        Args:
+            func: A function returning a requests Response.
+            *args: Positional arguments for func.
+            **kwargs: Keyword arguments for func.
+
+        Returns:
+            The Response from the first successful call.
+
+        Raises:
+            requests.HTTPError: If the API still pushes back after
+            max_retries retries.
+            requests.RequestException: If the connection still fails after
+            max_retries retries, such as a ConnectionError or Timeout.
+        """
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_backoff()
+            count("rate_limit_wait_seconds_total", self.limiter.acquire())
+            try:
+                with timer("stage_seconds", stage="request"):
+                    response = func(*args, **kwargs)
+            except requests.RequestException as error:
+                endpoint = urlparse(getattr(error.request, "url", None)
+                                    or "").path
+                count("request_errors_total", endpoint=endpoint,
+                      error=type(error).__name__)
+                if attempt == self.max_retries:
+                    raise
+                count("retries_total", endpoint=endpoint)
+                self._back_off()
+                continue
+            endpoint = urlparse(response.url or "").path
+            count("requests_total", endpoint=endpoint,
+                  status=str(response.status_code))
+            count("response_bytes_total", len(response.content),
+                  endpoint=endpoint)
+            if response.status_code not in RETRY_STATUS_CODES:
+                self._recover()
+                return response
+            if attempt < self.max_retries:
+                count("retries_total", endpoint=endpoint)
+                self._back_off(response)
+        raise requests.HTTPError(
+            f"{response.status_code} Error after {self.max_retries} retries "
+            f"for url: {response.url}", response=response)
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Schedule a request function to be called on the worker pool.
+
+        Args:
+            func: A function returning a requests Response.
+            *args: Positional arguments for func.
+            **kwargs: Keyword arguments for func.
+
+        Returns:
+            A Future that resolves to the Response.
+        """
+        return self._executor.submit(self.call, func, *args, **kwargs)
+
+    def shutdown(self):
+        """
+        Stop the worker pool after all scheduled requests finish.
+
+        Returns:
+            None.
+        """
+        self._executor.shutdown(wait=True)
+
+def iter_in_order(submit, items, lookahead):
+    """
+    Run a function over items a few at a time, giving back the results in
+    order as soon as each one and those before it are done.
+
+    Unlike Executor.map, which starts every item at once, only lookahead items
+    are started ahead of the one being waited on, so items are read, and
+    results kept, no faster than they are used.
+
+    Args:
+        submit: A function taking an item and returning a Future of its
+        result.
+        items: An iterable of items, which can be a generator.
+        lookahead: An int representing how many items can be in progress at
+        once.
+
+    Yields:
+        The result of each item, in the order of items.
+    """
+    pending = deque()
+    items = iter(items)
+    try:
+        for item in items:
+            pending.append(submit(item))
+            if len(pending) >= lookahead:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+def default_scheduler():
+    """
+    Give the scheduler shared by every collection function in this process,
+    so that separate calls draw from the same NYT budget.
+
+    Returns:
+        A FetchScheduler using the NYT Article Search rate limits.
+    """
+    global _default_scheduler # pylint: disable=global-statement
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = FetchScheduler()
+        return _default_scheduler
@@ -0,0 +1,453 @@
+"""
+This module deals with finding the headlines that mention a word or phrase,
+without reading the country files again.
+
+A TermIndex is an inverted index kept in a SQLite file. Headlines are split
+into lowercase words (tokens), and for each token, country and month it keeps
+which headlines use the token and at which word positions. Those postings are
+stored compressed: headline numbers and positions are written as differences
+from the one before, in a variable-length byte encoding (varints) where small
+numbers take one byte. The index is built a month at a time, so months can be
+added as they are collected (see writing.DatasetWriter) and collecting a month
+again replaces its postings.
+
+Queries can combine words and quoted phrases with AND, OR, NOT and
+parentheses, for example 'coup AND (chile OR bolivia) NOT "military junta"'.
+Words next to each other without an operator must all match. The index can
+also give how often a word was used in each month.
+"""
+from collections import defaultdict
+from os import makedirs, path
+import re
+import sqlite3
+import threading
+from corpus import country_corpus
+from dataset import load_country_dataset, remove_possessives
+from lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+DEFAULT_INDEX_PATH = ".cache/terms.sqlite"
+
+TOKEN = re.compile(r"[^\W_]+")
+QUERY_TOKEN = re.compile(r'\(|\)|"[^"]*"|[^\s()"]+')
+OPERATORS = ("AND", "OR", "NOT")
+
+def tokenize(text):
+    """
+    Split text into the lowercase words the index is built from.
+
+    Args:
+        text: A string.
+
+    Returns:
+        A list of strings, without punctuation or possessive "'s" endings.
+    """
+    return TOKEN.findall(remove_possessives(text).lower())
+
+def encode_varints(numbers):
+    """
+    Write non-negative ints in a variable-length byte encoding, seven bits to
+    a byte, with the high bit set on every byte but a number's last.
+
+    Args:
+        numbers: An iterable of non-negative ints.
+
+    Returns:
+        A bytes object.
+    """
+    encoded = bytearray()
+    for number in numbers:
+        while number >= 0x80:
+            encoded.append(number & 0x7F | 0x80)
+            number >>= 7
+        encoded.append(number)
+    return bytes(encoded)
+
+def decode_varints(data):
+    """
+    Read back ints written by encode_varints.
+
+    Args:
+        data: A bytes object.
+
+    Returns:
+        A list of ints.
+    """
+    numbers = []
+    number = 0
+    shift = 0
+    for byte in data:
+        number |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            numbers.append(number)
+            number = 0
+            shift = 0
+    return numbers
+
+def month_postings(headlines):
+    """
+    Build the postings of one month's headlines.
+
+    Args:
+        headlines: A list of headline strings.
+
+    Returns:
+        A dictionary from each token to a tuple of the number of headlines
+        using it, the number of times it is used, and its encoded postings:
+        for each headline, the difference from the previous headline's number,
+        the number of positions, and the differences between positions.
+    """
+    positions = defaultdict(lambda: defaultdict(list))
+    for number, headline in enumerate(headlines):
+        for position, token in enumerate(tokenize(headline)):
+            positions[token][number].append(position)
+
+    postings = {}
+    for token, by_headline in positions.items():
+        numbers = []
+        previous_number = 0
+        occurrences = 0
+        for number, token_positions in by_headline.items():
+            numbers += [number - previous_number, len(token_positions)]
+            numbers += [position - previous_position for position,
+                        previous_position in zip(token_positions,
+                                                 [0] + token_positions[:-1])]
+            previous_number = number
+            occurrences += len(token_positions)
+        postings[token] = (len(by_headline), occurrences,
+                           encode_varints(numbers))
+    return postings
+
+def decode_postings(data):
+    """
+    Read back postings encoded by month_postings.
+
+    Args:
+        data: A bytes object.
+
+    Returns:
+        A dictionary from each headline number to a list of the token's
+        positions in it.
+    """
+    numbers = decode_varints(data)
+    headlines = {}
+    number = 0
+    index = 0
+    while index < len(numbers):
+        number += numbers[index]
+        count = numbers[index + 1]
+        positions = []
+        position = 0
+        for difference in numbers[index + 2:index + 2 + count]:
+            position += difference
+            positions.append(position)
+        headlines[number] = positions
+        index += 2 + count
+    return headlines
+
+def parse_query(query):
+    """
+    Parse a search query into a tree of operations.
+
+    Args:
+        query: A string of words, quoted phrases, AND, OR, NOT and parentheses.
+
+    Returns:
+        A nested tuple: ("phrase", [tokens]), ("and", left, right),
+        ("or", left, right), ("not", operand) or ("and_not", left, right).
+
+    Raises:
+        ValueError: If the query is empty or its parentheses do not match.
+    """
+    parts = QUERY_TOKEN.findall(query)
+    position = [0]
+
+    def peek():
+        return parts[position[0]] if position[0] < len(parts) else None
+
+    def take():
+        position[0] += 1
+        return parts[position[0] - 1]
+
+    def parse_or():
+        node = parse_and()
+        while peek() == "OR":
+            take()
+            node = ("or", node, parse_and())
+        return node
+
+    def parse_and():
+        node = parse_not()
+        while peek() is not None and peek() not in ("OR", ")"):
+            if peek() == "AND":
+                take()
+            if peek() == "NOT":
+                take()
+                node = ("and_not", node, parse_not())
+            else:
+                node = ("and", node, parse_not())
+        return node
+
+    def parse_not():
+        if peek() == "NOT":
+            take()
+            return ("not", parse_not())
+        return parse_primary()
+
+    def parse_primary():
+        part = peek()
+        if part is None or part in OPERATORS or part == ")":
+            raise ValueError(f"expected a word or phrase in {query!r}")
+        take()
+        if part == "(":
+            node = parse_or()
+            if peek() != ")":
+                raise ValueError(f"unmatched parenthesis in {query!r}")
+            take()
+            return node
+        return ("phrase", tokenize(part.strip('"')))
+
+    node = parse_or()
+    if peek() is not None:
+        raise ValueError(f"unmatched parenthesis in {query!r}")
+    return node
+
+class TermIndex:
+    """
+    A persistent inverted index from words to the headlines that use them.
+    """
+
+    def __init__(self, filepath=DEFAULT_INDEX_PATH):
+        """
+        Args:
+            filepath: A string representing the path of the SQLite file.
+            (Optional).
+        """
+        self._lock = threading.Lock()
+        if path.dirname(filepath):
+            makedirs(path.dirname(filepath), exist_ok=True)
+        self._connection = sqlite3.connect(filepath, check_same_thread=False)
+        self._connection.executescript(
+            "CREATE TABLE IF NOT EXISTS countries ("
+            "id INTEGER PRIMARY KEY, name TEXT UNIQUE);"
+            "CREATE TABLE IF NOT EXISTS months ("
+            "country INTEGER, month INTEGER, headlines INTEGER, "
+            "PRIMARY KEY (country, month));"
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "term TEXT, country INTEGER, month INTEGER, headlines INTEGER, "
+            "occurrences INTEGER, data BLOB, "
+            "PRIMARY KEY (term, country, month)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS postings_by_month "
+            "ON postings (country, month);")
+        self._connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Close the underlying database file.
+
+        Returns:
+            None.
+        """
+        with self._lock:
+            self._connection.close()
+
+    def _country_id(self, country_name):
+        self._connection.execute(
+            "INSERT OR IGNORE INTO countries (name) VALUES (?)",
+            (country_name,))
+        return self._connection.execute(
+            "SELECT id FROM countries WHERE name = ?",
+            (country_name,)).fetchone()[0]
+
+    def countries(self):
+        """
+        List the countries in the index.
+
+        Returns:
+            A sorted list of strings of country names.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT name FROM countries ORDER BY name").fetchall()
+        return [row[0] for row in rows]
+
+    def add_months(self, country_name, months):
+        """
+        Index months of headlines, replacing anything indexed for them before.
+
+        Args:
+            country_name: A string representing the name of the country.
+            months: An iterable of (year_month, headlines) pairs, with the
+            month in YYYYMM format and headlines a list of strings.
+
+        Returns:
+            None.
+        """
+        with self._lock:
+            country = self._country_id(country_name)
+            for year_month, headlines in months:
+                month = int(year_month)
+                self._connection.execute(
+                    "DELETE FROM postings WHERE country = ? AND month = ?",
+                    (country, month))
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO months VALUES (?, ?, ?)",
+                    (country, month, len(headlines)))
+                self._connection.executemany(
+                    "INSERT INTO postings VALUES (?, ?, ?, ?, ?, ?)",
+                    [(term, country, month, *posting) for term, posting
+                     in month_postings(headlines).items()])
+            self._connection.commit()
+
+    def add_country(self, country_name):
+        """
+        Index every month of a country's data file, reading the headlines
+        from its corpus.country_corpus.
+
+        Args:
+            country_name: A string representing the name of the country.
+
+        Returns:
+            None.
+        """
+        months = load_country_dataset(country_name).months()
+        with country_corpus(country_name) as corpus:
+            self.add_months(country_name, zip(
+                months, corpus.month_headlines(country_name, months)))
+
+    def _filters(self, countries, start_month, end_month):
+        conditions = []
+        values = []
+        if countries is not None:
+            conditions.append("country IN (SELECT id FROM countries WHERE "
+                              f"name IN ({', '.join('?' * len(countries))}))")
+            values += countries
+        if start_month is not None:
+            conditions.append("month >= ?")
+            values.append(int(start_month))
+        if end_month is not None:
+            conditions.append("month <= ?")
+            values.append(int(end_month))
+        return "".join(f" AND {condition}" for condition in conditions), values
+
+    def _postings(self, token, filters):
+        """
+        Give a token's positions by (country id, month, headline number).
+        """
+        conditions, values = filters
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT country, month, data FROM postings WHERE term = ?"
+                + conditions, [token] + values).fetchall()
+        return {(country, month, number): positions
+                for country, month, data in rows
+                for number, positions in decode_postings(data).items()}
+
+    def _phrase(self, tokens, filters):
+        """
+        Give the set of (country id, month, headline number) of headlines with
+        the tokens next to each other, in order.
+        """
+        if not tokens:
+            return set()
+        matches = self._postings(tokens[0], filters)
+        for offset, token in enumerate(tokens[1:], 1):
+            if not matches:
+                break
+            following = self._postings(token, filters)
+            matches = {
+                headline: [position for position in positions
+                           if position + offset in following[headline]]
+                for headline, positions in matches.items()
+                if headline in following}
+            matches = {headline: positions for headline, positions
+                       in matches.items() if positions}
+        return set(matches)
+
+    def _every_headline(self, filters):
+        conditions, values = filters
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT country, month, headlines FROM months WHERE 1 = 1"
+                + conditions, values).fetchall()
+        return {(country, month, number) for country, month, headlines in rows
+                for number in range(headlines)}
+
+    def _evaluate(self, node, filters):
+        if node[0] == "phrase":
+            return self._phrase(node[1], filters)
+        if node[0] == "not":
+            return self._every_headline(filters) - self._evaluate(node[1],
+                                                                  filters)
+        left = self._evaluate(node[1], filters)
+        right = self._evaluate(node[2], filters)
+        if node[0] == "and":
+            return left & right
+        if node[0] == "or":
+            return left | right
+        return left - right
+
+    def search(self, query, countries=None, start_month=None, end_month=None):
+        """
+        Find the headlines matching a query.
+
+        Args:
+            query: A string of words and quoted phrases combined with AND, OR,
+            NOT and parentheses, as described at the top of this module.
+            countries: A list of country names to search in. Default is every
+            country. (Optional).
+            start_month: A string representing the first month to search, in
+            YYYYMM format. (Optional).
+            end_month: A string representing the last month to search, in
+            YYYYMM format. (Optional).
+
+        Returns:
+            A sorted list of (country name, month in YYYYMM format, headline
+            number in the month) tuples. The headlines themselves can be read
+            with corpus.HeadlineCorpus.headline.
+        """
+        filters = self._filters(countries, start_month, end_month)
+        matches = self._evaluate(parse_query(query), filters)
+        with self._lock:
+            names = dict(self._connection.execute(
+                "SELECT id, name FROM countries").fetchall())
+        return sorted((names[country], str(month), number)
+                      for country, month, number in matches)
+
+    def term_frequencies(self, term, country_name):
+        """
+        Count how many times a word was used in each month of a country.
+
+        Args:
+            term: A string of one word.
+            country_name: A string representing the name of the country.
+
+        Returns:
+            A pandas Series of the number of times the word was used, indexed
+            by every indexed month of the country in YYYYMM format, with 0 for
+            months it was not used in.
+        """
+        tokens = tokenize(term)
+        if len(tokens) != 1:
+            raise ValueError(f"term must be one word, not {term!r}")
+        conditions, values = self._filters([country_name], None, None)
+        with self._lock:
+            months = self._connection.execute(
+                "SELECT month FROM months WHERE 1 = 1" + conditions
+                + " ORDER BY month", values).fetchall()
+            counts = dict(self._connection.execute(
+                "SELECT month, occurrences FROM postings WHERE term = ?"
+                + conditions, tokens + values).fetchall())
+        return pd.Series([counts.get(month, 0) for month, in months],
+                         index=pd.Index([str(month) for month, in months],
+                                        name="month"),
+                         name=tokens[0], dtype="int64")
@@ -0,0 +1,480 @@
+"""
+This module deals with scoring the sentiment of many pieces of text at once.
+
+Scoring goes through a sentiment backend: any object with a name and a
+score_texts method returning one [score, magnitude] pair per text, with the
+score from -1 to 1 like the Google Cloud Natural Language API. Backends built
+on SentimentBackend also get score_months for scoring months of headlines.
+Two backends are included:
+    SentimentEngine ("google") sends the texts to the Natural Language API.
+    LexiconSentimentBackend ("lexicon") scores them offline from the word list
+    in the lexicon module, with NumPy, over several processes for large inputs.
+
+A SentimentEngine sends requests concurrently over one pooled HTTP session,
+through a FetchScheduler so that they stay under the API's rate limit and are
+retried when the API pushes back. Each distinct text is only scored once: the
+engine remembers scores by a hash of the text, and can also keep responses in a
+ResponseCache between runs. Months can be scored as one document, as the
+processing module always has, or one headline at a time with the scores
+combined into a month score. month_fingerprint identifies what a month's score
+depends on, so callers can skip months that have not changed since they were
+last scored.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import json
+import math
+import multiprocessing
+import os
+import re
+import threading
+from caching import ResponseCache, text_hash
+from extraction import response_document, sentiment_scores
+from lazy import lazy_import
+from lexicon import LEXICON
+from scheduling import FetchScheduler
+
+np = lazy_import("numpy")
+requests = lazy_import("requests")
+adapters = lazy_import("requests.adapters")
+
+SENTIMENT_ENDPOINT = "https://language.googleapis.com/v1/documents:analyzeSentiment"
+REQUEST_TIMEOUT = 30
+
+# The API allows 600 requests per minute, and documents of up to a million
+# bytes, counted here in UTF-8.
+SENTIMENT_REQUESTS_PER_MINUTE = 600
+MAX_DOCUMENT_BYTES = 1000000
+
+AGGREGATES = ("mean", "weighted", "distribution")
+
+# The lexicon score is the sum of word valences v, squashed to v / sqrt(v^2 +
+# LEXICON_ALPHA) as VADER does, and its magnitude is the sum of absolute
+# valences divided by LEXICON_MAGNITUDE_SCALE, to be on a similar scale to
+# Google's magnitude.
+LEXICON_ALPHA = 15
+LEXICON_MAGNITUDE_SCALE = 4
+LEXICON_WORD = re.compile(r"[a-z]+")
+
+# Below this many texts, starting worker processes costs more than it saves.
+LEXICON_PARALLEL_THRESHOLD = 20000
+
+def sentiment_body(text):
+    """
+    Build the JSON body of an analyzeSentiment request.
+
+    Args:
+        text: A string to analyze.
+
+    Returns:
+        A string of the JSON request body.
+    """
+    body = {
+        "document": {
+            "type": "PLAIN_TEXT",
+            "language": "en-us",
+            "content": text
+        },
+    "encodingType": "UTF32"
+    }
+    return json.dumps(body)
+
+def sentiment_cache_key(text):
+    """
+    Make the response cache key for an analyzeSentiment request.
+
+    Args:
+        text: A string to analyze.
+
+    Returns:
+        A string identifying the request by a hash of the text.
+    """
+    return ResponseCache.key(SENTIMENT_ENDPOINT, {"text_sha256": text_hash(text)})
+
+def split_text(text, max_bytes=MAX_DOCUMENT_BYTES):
+    """
+    Split text into pieces small enough to send as one document, breaking only
+    between words.
+
+    Args:
+        text: A string.
+        max_bytes: An int representing the largest piece in UTF-8 bytes.
+        (Optional).
+
+    Returns:
+        A list of strings.
+    """
+    if len(text.encode("utf-8")) <= max_bytes:
+        return [text]
+
+    pieces = []
+    words = []
+    size = 0
+    for word in text.split():
+        word_size = len(word.encode("utf-8")) + 1
+        if words and size + word_size > max_bytes:
+            pieces.append(" ".join(words))
+            words = []
+            size = 0
+        words.append(word)
+        size += word_size
+    pieces.append(" ".join(words))
+    return pieces
+
+def aggregate_scores(scores, method="mean"):
+    """
+    Combine several [score, magnitude] pairs into one.
+
+    Args:
+        scores: A list of [score, magnitude] lists.
+        method: A string that is "mean" to average both scores and
+        magnitudes, "weighted" to weight each score by its magnitude and add
+        up the magnitudes, which is roughly how the API combines the sentences
+        of one document, or "distribution" to average them as "mean" does and
+        also give the shares of negative, neutral and positive scores, as
+        counted by sentiment_distribution. Default is "mean". (Optional).
+
+    Returns:
+        A list of the combined score and magnitude, or [0.0, 0.0] if there are
+        no scores. For "distribution" the list goes on with the negative,
+        neutral and positive shares, which are 0.0 if there are no scores.
+    """
+    if method not in AGGREGATES:
+        raise ValueError(f"method must be one of {AGGREGATES}, not {method!r}")
+    if method == "distribution":
+        shares = [number / len(scores) if scores else 0.0
+                  for number in sentiment_distribution(scores).values()]
+        return aggregate_scores(scores, "mean") + shares
+    if not scores:
+        return [0.0, 0.0]
+
+    total_magnitude = sum(magnitude for _, magnitude in scores)
+    if method == "mean":
+        return [sum(score for score, _ in scores) / len(scores),
+                total_magnitude / len(scores)]
+    if total_magnitude == 0:
+        return [0.0, 0.0]
+    return [sum(score * magnitude for score, magnitude in scores)
+            / total_magnitude, total_magnitude]
+
+def sentiment_distribution(scores, edges=(-0.25, 0.25)):
+    """
+    Count how many scores are negative, neutral and positive.
+
+    Args:
+        scores: A list of [score, magnitude] lists.
+        edges: A pair of floats where scores below the first are negative and
+        scores above the second are positive. (Optional).
+
+    Returns:
+        A dictionary with the number of "negative", "neutral" and "positive"
+        scores.
+    """
+    distribution = {"negative": 0, "neutral": 0, "positive": 0}
+    for score, _ in scores:
+        if score < edges[0]:
+            distribution["negative"] += 1
+        elif score > edges[1]:
+            distribution["positive"] += 1
+        else:
+            distribution["neutral"] += 1
+    return distribution
+
+def score_agreement(first_scores, second_scores):
+    """
+    Measure how closely two backends agree on the same texts, for example to
+    check remote scores against the offline lexicon.
+
+    Args:
+        first_scores: A list of [score, magnitude] lists.
+        second_scores: A list of [score, magnitude] lists for the same texts.
+
+    Returns:
+        A dictionary with the Pearson "correlation" of the scores (NaN if
+        either side has no variation), the "mean_absolute_difference" of the
+        scores, and the share of texts where both agree on the "sign".
+    """
+    first = np.array([score for score, _ in first_scores], dtype=float)
+    second = np.array([score for score, _ in second_scores], dtype=float)
+    if len(first) < 2 or first.std() == 0 or second.std() == 0:
+        correlation = math.nan
+    else:
+        correlation = float(np.corrcoef(first, second)[0, 1])
+    return {"correlation": correlation,
+            "mean_absolute_difference": float(np.abs(first - second).mean()),
+            "sign": float((np.sign(first) == np.sign(second)).mean())}
+
+def month_fingerprint(month, backend_name, per_headline=False,
+                      aggregate="mean"):
+    """
+    Fingerprint what a month's score depends on, so that a month whose
+    headlines and scoring are unchanged does not have to be scored again.
+
+    Args:
+        month: A string of the month's text, or a list of its headlines when
+        per_headline is True.
+        backend_name: A string naming the backend that scores the month.
+        per_headline: A boolean that is True if headlines are scored one at a
+        time. (Optional).
+        aggregate: A string naming how headline scores are combined.
+        (Optional).
+
+    Returns:
+        A string of the hexadecimal SHA-256 digest of the inputs.
+    """
+    if not per_headline:
+        aggregate = None
+    return text_hash(json.dumps([backend_name, per_headline, aggregate, month]))
+
+class SentimentBackend:
+    """
+    The base for sentiment backends. Subclasses implement score_texts.
+
+    Attributes:
+        name: A string naming the backend.
+    """
+    name = "base"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Release anything the backend holds open.
+
+        Returns:
+            None.
+        """
+
+    def score_texts(self, texts):
+        """
+        Score a list of texts.
+
+        Args:
+            texts: A list of strings.
+
+        Returns:
+            A list of [score, magnitude] lists in the same order as texts.
+        """
+        raise NotImplementedError
+
+    def score_months(self, months, per_headline=False, aggregate="mean"):
+        """
+        Score several months of headlines.
+
+        Args:
+            months: A list with one entry per month: a string of the month's
+            text, or a list of its headlines when per_headline is True.
+            per_headline: A boolean that is True to score each headline on its
+            own and combine them into the month score. Default is False, which
+            scores each month as one document. (Optional).
+            aggregate: A string naming how headline scores are combined, as
+            in aggregate_scores. (Optional).
+
+        Returns:
+            A list with one [score, magnitude] list per month, followed by the
+        month's bucket shares when aggregate is "distribution".
+        """
+        if not per_headline:
+            return self.score_texts(months)
+
+        headline_scores = iter(self.score_texts(
+            [headline for headlines in months for headline in headlines]))
+        return [aggregate_scores([next(headline_scores) for _ in headlines],
+                                 aggregate)
+                for headlines in months]
+
+    def iter_scores(self, months, per_headline=False, aggregate="mean"):
+        """
+        Score months one at a time as they arrive, for example while they are
+        still being collected by obtaining.iter_headlines_and_hits.
+
+        Args:
+            months: An iterable with one entry per month, as in score_months.
+            per_headline: A boolean that is True to score each headline on its
+            own, as in score_months. (Optional).
+            aggregate: A string naming how headline scores are combined, as
+            in aggregate_scores. (Optional).
+
+        Yields:
+            A [score, magnitude] list for each month, in order.
+        """
+        for month in months:
+            yield self.score_months([month], per_headline, aggregate)[0]
+
+def _lexicon_scores(texts):
+    """
+    Score texts with the lexicon, as one NumPy computation over every word.
+
+    Args:
+        texts: A list of strings.
+
+    Returns:
+        A list of [score, magnitude] lists.
+    """
+    words = [LEXICON_WORD.findall(text.lower()) for text in texts]
+    lengths = np.fromiter((len(text_words) for text_words in words),
+                          dtype=np.int64, count=len(words))
+    valences = np.fromiter((LEXICON.get(word, 0.0) for text_words in words
+                            for word in text_words),
+                           dtype=np.float64, count=int(lengths.sum()))
+    text_numbers = np.repeat(np.arange(len(texts)), lengths)
+
+    totals = np.bincount(text_numbers, weights=valences, minlength=len(texts))
+    magnitudes = np.bincount(text_numbers, weights=np.abs(valences),
+                             minlength=len(texts)) / LEXICON_MAGNITUDE_SCALE
+    scores = totals / np.sqrt(totals * totals + LEXICON_ALPHA)
+    return np.column_stack([np.round(scores, 3),
+                            np.round(magnitudes, 3)]).tolist()
+
+class LexiconSentimentBackend(SentimentBackend):
+    """
+    Scores texts offline from a word list, without any network requests.
+    """
+    name = "lexicon"
+
+    def __init__(self, processes=None,
+                 parallel_threshold=LEXICON_PARALLEL_THRESHOLD):
+        """
+        Args:
+            processes: An int representing how many processes to spread large
+            inputs over. Default is the number of CPUs. (Optional).
+            parallel_threshold: An int representing the fewest texts that are
+            spread over processes. (Optional).
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.parallel_threshold = parallel_threshold
+
+    def score_texts(self, texts):
+        """
+        Score a list of texts with the lexicon.
+
+        Args:
+            texts: A list of strings.
+
+        Returns:
+            A list of [score, magnitude] lists in the same order as texts.
+        """
+        texts = list(texts)
+        if self.processes == 1 or len(texts) < self.parallel_threshold:
+            return _lexicon_scores(texts)
+
+        chunk_size = math.ceil(len(texts) / self.processes)
+        chunks = [texts[start:start + chunk_size]
+                  for start in range(0, len(texts), chunk_size)]
+        # Worker processes are spawned, not forked, since the pipeline scores
+        # countries from several threads at once.
+        with ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn")) as pool:
+            return [scores for chunk_scores in pool.map(_lexicon_scores, chunks)
+                    for scores in chunk_scores]
+
+class SentimentEngine(SentimentBackend):
+    """
+    Scores many texts with the analyzeSentiment endpoint concurrently.
+
+    Attributes:
+        url: A string representing the full endpoint URL, with API key.
+        cache: A ResponseCache or None.
+        requests_sent: An int counting the texts sent to the API.
+    """
+    name = "google"
+
+    def __init__(self, url=None, api_key="", max_workers=8, cache=None,
+                 scheduler=None):
+        """
+        Args:
+            url: A string representing the endpoint URL, including any API
+            key. Default is the Google endpoint with api_key. (Optional).
+            api_key: A string representing a Google Cloud API key, used when
+            url is not given. (Optional).
+            max_workers: An int representing how many requests can be in
+            flight at once. (Optional).
+            cache: A ResponseCache to answer repeated requests from.
+            (Optional).
+            scheduler: A FetchScheduler to send requests through. Default is a
+            new one for the Natural Language API's rate limit. (Optional).
+        """
+        self.url = url or f"{SENTIMENT_ENDPOINT}?key={api_key}"
+        self.cache = cache
+        self.requests_sent = 0
+        self._own_scheduler = scheduler is None
+        self._scheduler = scheduler or FetchScheduler(
+            requests_per_minute=SENTIMENT_REQUESTS_PER_MINUTE,
+            requests_per_day=None, max_workers=max_workers, burst=max_workers,
+            base_backoff=1, max_backoff=60)
+        self._session = requests.Session()
+        adapter = adapters.HTTPAdapter(pool_connections=1,
+                                       pool_maxsize=max_workers)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._scores = {}
+        self._lock = threading.Lock()
+
+    def close(self):
+        """
+        Close the HTTP session, and the scheduler if the engine made it.
+
+        Returns:
+            None.
+        """
+        if self._own_scheduler:
+            self._scheduler.shutdown()
+        self._session.close()
+
+    def _post(self, text):
+        with self._lock:
+            self.requests_sent += 1
+        return self._session.post(self.url, data=sentiment_body(text),
+                                  timeout=REQUEST_TIMEOUT)
+
+    def _submit(self, text):
+        if self.cache is None:
+            return self._scheduler.submit(self._post, text)
+        return self.cache.submit(sentiment_cache_key(text), self._scheduler,
+                                 self._post, text)
+
+    def score_texts(self, texts):
+        """
+        Score a list of texts, sending each distinct text that has not been
+        scored before once.
+
+        Texts too long for one request are split up and their pieces combined
+        with a magnitude-weighted score. Empty texts score [0.0, 0.0] without
+        a request.
+
+        Args:
+            texts: A list of strings.
+
+        Returns:
+            A list of [score, magnitude] lists in the same order as texts.
+        """
+        pieces = {}
+        for text in texts:
+            for piece in split_text(text):
+                key = text_hash(piece)
+                if piece.strip() and key not in self._scores:
+                    pieces[key] = piece
+
+        requests_by_key = {key: self._submit(piece)
+                           for key, piece in pieces.items()}
+        for key, request in requests_by_key.items():
+            response = request.result()
+            response.raise_for_status()
+            self._scores[key] = sentiment_scores(response_document(response))
+
+        results = []
+        for text in texts:
+            piece_scores = [self._scores[text_hash(piece)]
+                            for piece in split_text(text) if piece.strip()]
+            if len(piece_scores) == 1:
+                results.append(list(piece_scores[0]))
+            else:
+                results.append(aggregate_scores(piece_scores, "weighted"))
+        return results
+
+BACKENDS = {backend.name: backend for backend in (SentimentEngine,
+                                                  LexiconSentimentBackend)}
@@ -0,0 +1,306 @@
+"""
+This module deals with where a country's data is stored on disk and in what
+format.
+
+Country data is always written to a csv file, where each month's headlines are
+saved as the text of a Python list. It can also be converted to a Parquet file
+next to the csv, where headlines are a real list of strings, hit counts and
+scores are typed columns, and the month is a date. When a Parquet file exists
+and is at least as new as the csv it is read instead, and only the columns
+asked for are loaded, so charts that only need hit counts never read any
+headline text. Parquet support needs the optional pyarrow library; without it
+everything falls back to the csv files.
+
+Running this module converts every csv file in CountryData to Parquet.
+"""
+import ast
+from glob import glob
+import os
+from os import path
+import stat
+import tempfile
+from lazy import lazy_import
+from metrics import timer
+
+pd = lazy_import("pandas")
+pa = lazy_import("pyarrow", optional=True)
+pc = lazy_import("pyarrow.compute", optional=True)
+pq = lazy_import("pyarrow.parquet", optional=True)
+
+DATA_FOLDER = "CountryData"
+HEADLINES = "Month's Headlines"
+# The shares of a month's headlines scored negative, neutral and positive,
+# written when headlines are scored one at a time with the "distribution"
+# aggregate.
+SHARE_COLUMNS = ["Negative Share", "Neutral Share", "Positive Share"]
+NUMERIC_COLUMNS = ["Number of Hits", "Sentiment Score (-1 to 1)",
+                   "Magnitude"] + SHARE_COLUMNS
+
+def country_data_path(country_name, extension="csv"):
+    """
+    Give the path of a country's data file.
+
+    Args:
+        country_name: A string representing the name of the country.
+        extension: A string representing the file format, "csv" or
+        "parquet". Default is "csv". (Optional).
+
+    Returns:
+        A string representing the path to the country's data file.
+    """
+    return f'{DATA_FOLDER}/{country_name}_data.{extension}'
+
+def parse_headline_list(headlines):
+    """
+    Turn the text of a headline list saved in a csv back into a list.
+
+    Args:
+        headlines: A string holding a list of headlines as saved in the csv,
+        or a float NaN / empty string for a month without headlines.
+
+    Returns:
+        A list of strings, one per headline.
+    """
+    if not isinstance(headlines, str) or headlines in ("", "[]"):
+        return []
+    try:
+        return [str(headline) for headline in ast.literal_eval(headlines)]
+    except (ValueError, SyntaxError):
+        # Some saved lists are not valid Python, for example when a headline
+        # has unescaped quotes in it, so split them up by hand instead.
+        return headlines[2:-2].split("', '")
+
+def headline_list(headlines):
+    """
+    Give a month's headlines as a list whether they were read from a csv or a
+    Parquet file.
+
+    Args:
+        headlines: A string holding a list of headlines as saved in the csv,
+        a sequence of headline strings, or NaN for a month without headlines.
+
+    Returns:
+        A list of strings, one per headline.
+    """
+    if isinstance(headlines, str) or not hasattr(headlines, "__iter__"):
+        return parse_headline_list(headlines)
+    return list(headlines)
+
+def country_data_source(country_name):
+    """
+    Choose which of a country's data files to read.
+
+    Args:
+        country_name: A string representing the name of the country.
+
+    Returns:
+        A string representing the path to the Parquet file if pyarrow is
+        installed and the file is at least as new as the csv, otherwise the
+        path to the csv file.
+    """
+    csv_path = country_data_path(country_name)
+    parquet_path = country_data_path(country_name, "parquet")
+    if pq is not None and path.exists(parquet_path) and (
+            not path.exists(csv_path)
+            or path.getmtime(parquet_path) >= path.getmtime(csv_path)):
+        return parquet_path
+    return csv_path
+
+def read_frame(filepath, columns=None):
+    """
+    Read a country data file into a DataFrame with the csv's column names.
+
+    Args:
+        filepath: A string representing the path of a csv or Parquet file.
+        columns: A list of the column names to load. Default loads them all.
+        (Optional).
+
+    Returns:
+        A pandas DataFrame. Months are strings in MM-YYYY format. Headlines are
+        arrays of strings when read from Parquet and list text when read from
+        a csv.
+    """
+    if not filepath.endswith(".parquet"):
+        with timer("stage_seconds", stage="read"):
+            return pd.read_csv(filepath, usecols=columns)
+
+    parquet_columns = None if columns is None else [
+        "Month" if column == "MM-YYYY" else column for column in columns]
+    with timer("stage_seconds", stage="read"):
+        table = pq.read_table(filepath, columns=parquet_columns)
+    if "Month" in table.column_names:
+        months = pc.strftime(table["Month"].cast(pa.timestamp("s")), "%m-%Y")
+        table = table.set_column(table.column_names.index("Month"), "MM-YYYY",
+                                 months)
+    return table.to_pandas()
+
+def frame_columns(filepath):
+    """
+    Give the columns of a country data file without reading its rows, so
+    callers can leave out columns, such as the sentiment scores, that a file
+    does not have yet.
+
+    Args:
+        filepath: A string representing the path of a csv or Parquet file.
+
+    Returns:
+        A list of the column names, with the csv's "MM-YYYY" in place of the
+        Parquet "Month".
+    """
+    if not filepath.endswith(".parquet"):
+        return list(pd.read_csv(filepath, nrows=0).columns)
+    return ["MM-YYYY" if column == "Month" else column
+            for column in pq.read_schema(filepath).names]
+
+def read_country_frame(country_name, columns=None):
+    """
+    Read a country's data from whichever file country_data_source picks.
+
+    Args:
+        country_name: A string representing the name of the country.
+        columns: A list of the column names to load. Default loads them all.
+        (Optional).
+
+    Returns:
+        A pandas DataFrame as returned by read_frame.
+    """
+    return read_frame(country_data_source(country_name), columns)
+
+def to_table(frame):
+    """
+    Convert a country DataFrame in csv form to a typed Arrow table.
+
+    Args:
+        frame: A pandas DataFrame with the csv's columns, or some of them.
+
+    Returns:
+        A pyarrow Table with a date "Month" column in place of "MM-YYYY",
+        numeric hits and scores, and headlines as a list of strings.
+    """
+    arrays = {}
+    for column in frame.columns:
+        if column == "MM-YYYY":
+            months = pd.to_datetime(frame[column], format="%m-%Y")
+            arrays["Month"] = pa.array(months.dt.date, type=pa.date32())
+        elif column == HEADLINES:
+            arrays[column] = pa.array(
+                [headline_list(headlines) for headlines in frame[column]],
+                type=pa.list_(pa.string()))
+        elif column == "Number of Hits":
+            arrays[column] = pa.array(pd.to_numeric(frame[column]),
+                                      type=pa.int64(), from_pandas=True)
+        elif column in NUMERIC_COLUMNS:
+            arrays[column] = pa.array(pd.to_numeric(frame[column]),
+                                      type=pa.float64(), from_pandas=True)
+        else:
+            arrays[column] = pa.array(frame[column], type=pa.string(),
+                                      from_pandas=True)
+    return pa.table(arrays)
+
+def write_country_parquet(country_name):
+    """
+    Convert a country's csv file to a Parquet file next to it.
+
+    Args:
+        country_name: A string representing the name of the country.
+
+    Returns:
+        A string representing the path of the Parquet file.
+    """
+    parquet_path = country_data_path(country_name, "parquet")
+    frame = pd.read_csv(country_data_path(country_name))
+    pq.write_table(to_table(frame), parquet_path)
+    return parquet_path
+
+def file_mode(filepath):
+    """
+    Give the permissions a file has, or would get if it were created now.
+
+    Args:
+        filepath: A string representing the path of the file.
+
+    Returns:
+        An int of the file's permission bits.
+    """
+    try:
+        return stat.S_IMODE(os.stat(filepath).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+def replace_file(filepath, write):
+    """
+    Write a file by writing a temporary file next to it and renaming it into
+    place, so readers never see a half-written file.
+
+    Args:
+        filepath: A string representing the path of the file.
+        write: A function taking the temporary file's path and writing the
+        new contents to it.
+
+    Returns:
+        None.
+    """
+    folder, name = path.split(filepath)
+    handle, temporary_path = tempfile.mkstemp(prefix=f".{name}.",
+                                              dir=folder or ".")
+    os.close(handle)
+    try:
+        # mkstemp makes the file private; keep the permissions the file had.
+        os.chmod(temporary_path, file_mode(filepath))
+        write(temporary_path)
+        os.replace(temporary_path, filepath)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+def write_country_frame(country_name, frame):
+    """
+    Save a country's data to its csv file, and to its Parquet file too if it
+    has one, so the Parquet copy does not go out of date. Each file is
+    replaced whole, see replace_file.
+
+    Args:
+        country_name: A string representing the name of the country.
+        frame: A pandas DataFrame with the csv's columns.
+
+    Returns:
+        None.
+    """
+    with timer("stage_seconds", stage="write"):
+        csv_frame = frame.copy()
+        if HEADLINES in csv_frame:
+            # Parquet headlines are arrays, which have to be saved in the same
+            # list form as collected headlines.
+            csv_frame[HEADLINES] = [
+                headlines if isinstance(headlines, str)
+                or not hasattr(headlines, "__iter__")
+                else headline_list(headlines)
+                for headlines in csv_frame[HEADLINES]]
+        replace_file(country_data_path(country_name),
+                     lambda filepath: csv_frame.to_csv(filepath,
+                                                       index = False))
+
+        parquet_path = country_data_path(country_name, "parquet")
+        if pq is not None and path.exists(parquet_path):
+            table = to_table(frame)
+            replace_file(parquet_path,
+                         lambda filepath: pq.write_table(table, filepath))
+
+def convert_all():
+    """
+    Convert every country csv file in the data folder to Parquet.
+
+    Returns:
+        A list of strings representing the paths of the Parquet files written.
+    """
+    suffix = "_data.csv"
+    return [write_country_parquet(path.basename(csv_path)[:-len(suffix)])
+            for csv_path in sorted(glob(f"{DATA_FOLDER}/*{suffix}"))]
+
+if __name__ == "__main__":
+    if pq is None:
+        raise SystemExit("pyarrow is needed to write Parquet files")
+    for written_path in convert_all():
+        print(written_path)
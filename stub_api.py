@@ -0,0 +1,313 @@
+"""
+This module deals with running a local stand-in for the NYT Article Search API
+and the Google Natural Language analyzeSentiment endpoint, so that collection
+and processing code can be tested without API keys or network access.
+
+The stub server counts every call it receives and can be told to answer the
+first few requests with an error status to exercise retries. It can also wait
+before each answer and answer 429 past a rate limit, to stand in for the real
+APIs' latency and limits in benchmarks.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+from dates import format_year_months, month_date_ranges, month_range
+from scheduling import TokenBucket
+
+ARTICLE_SEARCH_PATH = "/svc/search/v2/articlesearch.json"
+SENTIMENT_PATH = "/v1/documents:analyzeSentiment"
+
+# A fail status that closes the connection without answering.
+DROP_CONNECTION = 0
+
+# Words the stub sentiment endpoint treats as positive or negative.
+STUB_POSITIVE_WORDS = {"peace", "growth", "win", "agreement", "good"}
+STUB_NEGATIVE_WORDS = {"coup", "war", "crisis", "riot", "bad"}
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """
+    Answers requests for the stub server that owns it.
+    """
+
+    def log_message(self, format, *args): # pylint: disable=redefined-builtin
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self): # pylint: disable=invalid-name
+        """
+        Answer an Article Search request.
+        """
+        stub = self.server.stub
+        parsed = urlparse(self.path)
+        query = {key: values[0] for key, values in
+                 parse_qs(parsed.query).items()}
+        status = stub.record_call(parsed.path, query)
+
+        if status == DROP_CONNECTION:
+            self.close_connection = True
+        elif status != 200:
+            self._send_json(status, {"fault": "stub error"})
+        elif parsed.path == ARTICLE_SEARCH_PATH:
+            self._send_json(200, stub.article_search(query))
+        else:
+            self._send_json(404, {"fault": "not found"})
+
+    def do_POST(self): # pylint: disable=invalid-name
+        """
+        Answer an analyzeSentiment request.
+        """
+        stub = self.server.stub
+        parsed = urlparse(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        status = stub.record_call(parsed.path, body)
+
+        if status == DROP_CONNECTION:
+            self.close_connection = True
+        elif status != 200:
+            self._send_json(status, {"error": "stub error"})
+        elif parsed.path == SENTIMENT_PATH:
+            self._send_json(200, stub.analyze_sentiment(body))
+        else:
+            self._send_json(404, {"error": "not found"})
+
+class StubAPIServer:
+    """
+    A local HTTP server imitating the NYT Article Search API and the Google
+    analyzeSentiment endpoint.
+
+    Attributes:
+        calls: A list of (path, query) tuples for every request received, where
+        query is a dictionary of the request's query parameters, or the JSON
+        body for a POST request.
+        fail_statuses: A list of HTTP status codes to answer the next requests
+        with, one per request, before answering normally. DROP_CONNECTION
+        closes the connection instead of answering.
+        latency: A float representing the seconds to wait before answering
+        each request.
+        untitled: A set of ints representing the positions in the results of
+        articles to give without a headline.
+        facet_limit: An int representing how many months a pub_month facet
+        gives, leaving out the rest while the hits still count them, or None
+        to give every month.
+    """
+
+    def __init__(self, hits=None, fail_statuses=(), latency=0,
+                 requests_per_second=None, burst=1):
+        """
+        Args:
+            hits: A function taking a search term and the begin and end dates
+            of a request in YYYYMMDD format and returning the number of hits
+            for that date range. Default gives every range 25 hits.
+            (Optional).
+            fail_statuses: A sequence of HTTP status codes to answer the first
+            requests with, one per request, before answering normally.
+            (Optional).
+            latency: A float representing the seconds to wait before
+            answering each request. (Optional).
+            requests_per_second: A float representing how many requests are
+            answered per second before answering 429, or None for no limit.
+            (Optional).
+            burst: An int representing how many requests can come back to
+            back within the rate limit. (Optional).
+        """
+        self.hits = hits or (lambda search_term, begin_date, end_date: 25)
+        self.calls = []
+        self.fail_statuses = list(fail_statuses)
+        self.latency = latency
+        self.untitled = set()
+        self.facet_limit = None
+        self._bucket = None if requests_per_second is None else TokenBucket(
+            requests_per_second, burst)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self._server.stub = self
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        daemon=True)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def url(self):
+        """
+        The base URL of the running server, without a trailing slash.
+        """
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def article_search_url(self):
+        """
+        The URL of the stub Article Search endpoint.
+        """
+        return self.url + ARTICLE_SEARCH_PATH
+
+    @property
+    def sentiment_url(self):
+        """
+        The URL of the stub analyzeSentiment endpoint.
+        """
+        return self.url + SENTIMENT_PATH
+
+    @property
+    def call_count(self):
+        """
+        The number of requests received so far.
+        """
+        with self._lock:
+            return len(self.calls)
+
+    def start(self):
+        """
+        Start serving requests on a background thread.
+
+        Returns:
+            None.
+        """
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the server and release its port.
+
+        Returns:
+            None.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+    def record_call(self, path, query):
+        """
+        Count a request, wait for the server's latency and decide which
+        status code to answer it with.
+
+        Args:
+            path: A string representing the request path.
+            query: A dictionary of the request's query parameters.
+
+        Returns:
+            An int representing the HTTP status code to send.
+        """
+        with self._lock:
+            self.calls.append((path, query))
+            if self.fail_statuses:
+                status = self.fail_statuses.pop(0)
+            elif self._bucket is not None and self._bucket.wait_time() > 0:
+                status = 429
+            else:
+                if self._bucket is not None:
+                    self._bucket.take()
+                status = 200
+        if self.latency:
+            time.sleep(self.latency)
+        return status
+
+    def article_search(self, query):
+        """
+        Build an Article Search response body for a request.
+
+        Each result has a document id and headline that are unique to the
+        search term, begin date and position in the results, so requests for
+        overlapping date ranges that start on the same day share documents.
+        The fl parameter limits the fields of each result, and facet_fields
+        set to pub_month adds the hits of each month (see month_terms), in
+        which case the hits are those of the months.
+
+        Args:
+            query: A dictionary of the request's query parameters.
+
+        Returns:
+            A dictionary shaped like an Article Search JSON response.
+        """
+        search_term = query.get("q", "")
+        begin_date = query.get("begin_date", "")
+        end_date = query.get("end_date", "")
+        page = int(query.get("page", 0))
+        num_hits = self.hits(search_term, begin_date, end_date)
+
+        first = page * 10
+        last = min(num_hits, first + 10)
+        docs = [
+            {
+                "_id": f"nyt://article/{search_term}-{begin_date}-{number}",
+                "headline": {"main": f"{search_term} {begin_date} headline "
+                                     f"{number}"},
+            }
+            for number in range(first, last)
+        ]
+        for number, doc in zip(range(first, last), docs):
+            if number in self.untitled:
+                del doc["headline"]
+        if "fl" in query:
+            fields = query["fl"].split(",")
+            docs = [{field: doc[field] for field in fields if field in doc}
+                    for doc in docs]
+        response = {"docs": docs, "meta": {"hits": num_hits, "offset": first}}
+        if query.get("facet_fields") == "pub_month":
+            terms = self.month_terms(search_term, begin_date, end_date)
+            response["meta"]["hits"] = sum(term["count"] for term in terms)
+            response["facets"] = {"pub_month": {
+                "terms": terms[:self.facet_limit]}}
+        return {"status": "OK", "response": response}
+
+    def month_terms(self, search_term, begin_date, end_date):
+        """
+        Count the hits of each month in a date range as a pub_month facet.
+
+        Args:
+            search_term: A string representing the search term.
+            begin_date: A string representing the start date in format
+            YYYYMMDD.
+            end_date: A string representing the end date in format YYYYMMDD.
+
+        Returns:
+            A list of {"term": month number, "count": hits} dictionaries for
+            the months with hits, counting each month's hits with the hits
+            function over the part of the month inside the range.
+        """
+        months = format_year_months(month_range(begin_date[:6],
+                                                end_date[:6])).tolist()
+        first_days, last_days = month_date_ranges(months)
+        terms = []
+        for month, first_day, last_day in zip(months, first_days, last_days):
+            count = self.hits(search_term, max(first_day, begin_date),
+                              min(last_day, end_date))
+            if count:
+                terms.append({"term": str(int(month[4:])), "count": count})
+        return terms
+
+    def analyze_sentiment(self, body):
+        """
+        Build an analyzeSentiment response body for a request.
+
+        The score is the share of positive words minus the share of negative
+        words from STUB_POSITIVE_WORDS and STUB_NEGATIVE_WORDS, and the
+        magnitude is the number of those words found, divided by ten.
+
+        Args:
+            body: A dictionary of the request's JSON body.
+
+        Returns:
+            A dictionary shaped like an analyzeSentiment JSON response.
+        """
+        words = body["document"]["content"].lower().split()
+        positive = sum(word in STUB_POSITIVE_WORDS for word in words)
+        negative = sum(word in STUB_NEGATIVE_WORDS for word in words)
+        score = (positive - negative) / max(1, positive + negative)
+        return {"documentSentiment": {"score": round(score, 1),
+                                      "magnitude": (positive + negative) / 10},
+                "language": "en"}
@@ -0,0 +1,229 @@
+"""
+This module deals with counting the words of each month's headlines ahead of
+time, so word clouds do not have to split and count the headlines again.
+
+For each country, the words of every month are counted once the way WordCloud
+counts them (with wordcloud's STOPWORDS removed and plurals merged into the
+singular, but without two-word phrases, which can't be counted a month at a
+time). The counts are kept sparse, as a running total over the months for
+each word. The count of a word over any range of months is then the total at
+the range's last month minus the total before its first month, so adding up a
+twenty-year range costs the same as a single month.
+
+Counts are saved in .cache/termcounts and built again when the country's data
+file changes.
+"""
+import os
+from os import path
+import threading
+from corpus import country_corpus
+from dataset import file_version, load_country_dataset
+from lazy import lazy_import
+from storage import country_data_source, replace_file
+
+np = lazy_import("numpy")
+wc = lazy_import("wordcloud")
+
+TERM_COUNTS_FOLDER = ".cache/termcounts"
+
+_term_counts = {}
+_term_counts_lock = threading.Lock()
+
+def month_word_counts(text):
+    """
+    Count the words of one month's text as WordCloud would.
+
+    Args:
+        text: A string of the month's headlines.
+
+    Returns:
+        A dictionary from each word to the number of times it is used.
+    """
+    return wc.WordCloud(stopwords=wc.STOPWORDS,
+                        collocations=False).process_text(text)
+
+class TermCounts:
+    """
+    The word counts of every month of one country.
+
+    Attributes:
+        months: A list of strings of the months in YYYYMM format, in order.
+        vocabulary: A NumPy array of every word used.
+        source: A string representing the path of the data file counted.
+        version: A tuple of the data file's version when counted, as given
+        by dataset.file_version.
+    """
+
+    def __init__(self, months, vocabulary, keys, totals, source="",
+                 version=(0, 0)):
+        """
+        Args:
+            months: A list of strings of the months in YYYYMM format.
+            vocabulary: A NumPy array of strings of every word used.
+            keys: A sorted NumPy int64 array with an entry for each word and
+            month it is used in, of the word's number times the number of
+            months plus the month's number.
+            totals: A NumPy int64 array of the word's running total through
+            each entry's month.
+            source: A string representing the path of the data file counted.
+            (Optional).
+            version: A tuple of the data file's version. (Optional).
+        """
+        self.months = list(months)
+        self.vocabulary = vocabulary
+        self.source = source
+        self.version = tuple(version)
+        self._keys = keys
+        self._totals = totals
+        self._month_numbers = {month: number
+                               for number, month in enumerate(self.months)}
+
+    @classmethod
+    def count(cls, country_name):
+        """
+        Count the words of every month of a country's data file, reading
+        the headlines from its corpus.country_corpus.
+
+        Args:
+            country_name: A string representing the name of the country.
+
+        Returns:
+            A TermCounts.
+        """
+        dataset = load_country_dataset(country_name)
+        months = dataset.months()
+        month_numbers_by_month = {year_month: number for number, year_month
+                                  in enumerate(months)}
+        vocabulary = {}
+        word_numbers = []
+        month_numbers = []
+        counts = []
+        with country_corpus(country_name) as corpus:
+            texts = corpus.iter_month_texts(country_name, min(months),
+                                            max(months)) if months else []
+            for year_month, text in texts:
+                month_number = month_numbers_by_month[year_month]
+                for word, word_count in month_word_counts(text).items():
+                    word_numbers.append(vocabulary.setdefault(
+                        word, len(vocabulary)))
+                    month_numbers.append(month_number)
+                    counts.append(word_count)
+
+        word_numbers = np.array(word_numbers, dtype=np.int64)
+        month_numbers = np.array(month_numbers, dtype=np.int64)
+        counts = np.array(counts, dtype=np.int64)
+        order = np.lexsort((month_numbers, word_numbers))
+        word_numbers = word_numbers[order]
+        counts = counts[order]
+
+        # Running totals restart at each word's first entry.
+        totals = np.cumsum(counts)
+        starts = np.flatnonzero(np.diff(word_numbers, prepend=-1))
+        totals -= np.repeat(totals[starts] - counts[starts],
+                            np.diff(np.append(starts, len(counts))))
+
+        return cls(months, np.array(list(vocabulary), dtype=str),
+                   word_numbers * max(1, len(months)) + month_numbers[order],
+                   totals, dataset.filepath, dataset.version)
+
+    @classmethod
+    def load(cls, filepath):
+        """
+        Read counts saved by save.
+
+        Args:
+            filepath: A string representing the path of the .npz file.
+
+        Returns:
+            A TermCounts.
+        """
+        with np.load(filepath) as saved:
+            return cls(saved["months"].tolist(), saved["vocabulary"],
+                       saved["keys"], saved["totals"], str(saved["source"]),
+                       saved["version"].tolist())
+
+    def save(self, filepath):
+        """
+        Write the counts to a file.
+
+        Args:
+            filepath: A string representing the path of the .npz file.
+
+        Returns:
+            None.
+        """
+        def write(temporary_path):
+            with open(temporary_path, "wb") as saved:
+                np.savez(saved, months=np.array(self.months, dtype=str),
+                         vocabulary=self.vocabulary, keys=self._keys,
+                         totals=self._totals, source=np.array(self.source),
+                         version=np.array(self.version, dtype=np.int64))
+
+        replace_file(filepath, write)
+
+    def _totals_through(self, month_number):
+        """
+        Give every word's total over the months up to and including one.
+        """
+        if month_number < 0 or not len(self._keys):
+            return np.zeros(len(self.vocabulary), dtype=np.int64)
+        month_count = max(1, len(self.months))
+        words = np.arange(len(self.vocabulary), dtype=np.int64)
+        positions = np.searchsorted(self._keys, words * month_count
+                                    + month_number, side="right") - 1
+        found = (positions >= 0) & (self._keys[positions] // month_count
+                                    == words)
+        return np.where(found, self._totals[positions], 0)
+
+    def frequencies(self, start_month=None, end_month=None):
+        """
+        Add up the word counts over a range of months.
+
+        Args:
+            start_month: A string representing the first month in YYYYMM
+            format. Default is the first month. (Optional).
+            end_month: A string representing the last month in YYYYMM
+            format. Default is the last month. (Optional).
+
+        Returns:
+            A dictionary from each word used in the range to its count, to
+            give to WordCloud.generate_from_frequencies.
+
+        Raises:
+            KeyError: If a month is not in the data.
+        """
+        first = self._month_numbers[start_month] if start_month else 0
+        last = (self._month_numbers[end_month] if end_month
+                else len(self.months) - 1)
+        totals = self._totals_through(last) - self._totals_through(first - 1)
+        used = np.flatnonzero(totals)
+        return dict(zip(self.vocabulary[used].tolist(),
+                        totals[used].tolist()))
+
+def load_term_counts(country_name, folder=TERM_COUNTS_FOLDER):
+    """
+    Give the word counts of a country, counting them only if they have not
+    been counted since its data file last changed.
+
+    Args:
+        country_name: A string representing the name of the country.
+        folder: A string representing the folder the counts are saved in.
+        (Optional).
+
+    Returns:
+        A TermCounts.
+    """
+    source = country_data_source(country_name)
+    version = file_version(source)
+    filepath = path.join(folder, f"{country_name}.npz")
+    with _term_counts_lock:
+        term_counts = _term_counts.get(path.abspath(filepath))
+        if term_counts is None and path.exists(filepath):
+            term_counts = TermCounts.load(filepath)
+        if term_counts is None or (term_counts.source, term_counts.version) \
+                != (source, version):
+            term_counts = TermCounts.count(country_name)
+            os.makedirs(folder, exist_ok=True)
+            term_counts.save(filepath)
+        _term_counts[path.abspath(filepath)] = term_counts
+        return term_counts
@@ -0,0 +1,81 @@
+"""
+This module deals with testing the aggregation module.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from aggregation import HITS, MAGNITUDE, SENTIMENT, chart_series, \
+    country_rollups, downsample_indices, monthly_series, rollup
+
+FRAME = pd.DataFrame({"MM-YYYY": ["11-1999", "12-1999", "01-2000", "02-2000"],
+                      HITS: [10, 30, 0, 4],
+                      SENTIMENT: [0.5, -0.5, np.nan, 0.25]})
+
+ROLLUP_CASES = [
+    ("month", [10, 30, 0, 4], [0.5, -0.5, np.nan, 0.25], [1, 1, 1, 1]),
+                                    #Tests that months are kept as they are
+    ("quarter", [40, 4], [-0.25, 0.25], [2, 2]),
+                                    #Tests that quarters start in January
+    ("year", [40, 4], [-0.25, 0.25], [2, 2]), #Tests that years are split
+]
+
+@pytest.mark.parametrize("period,hits,sentiment,months", ROLLUP_CASES)
+def test_rollup(period, hits, sentiment, months):
+    """
+    Test that rollups add up hits and weight sentiment by hits.
+
+    The specific tests are commented above next to the variable ROLLUP_CASES.
+    """
+    rolled = rollup(monthly_series(FRAME), period)
+    assert rolled[HITS].tolist() == hits
+    np.testing.assert_allclose(rolled[SENTIMENT], sentiment)
+    assert rolled["Months"].tolist() == months
+    assert rolled[MAGNITUDE].isna().all()
+
+def test_monthly_series_dates():
+    """
+    Test that months become the first day of each month.
+    """
+    series = monthly_series(FRAME)
+    assert series.index[0] == pd.Timestamp("1999-11-01")
+    assert series.index[-1] == pd.Timestamp("2000-02-01")
+
+def test_downsample_keeps_shape():
+    """
+    Test that downsampling keeps the ends and the peaks of a long series.
+    """
+    values = np.zeros(10000)
+    values[1234] = 100
+    values[8765] = -100
+    kept = downsample_indices(np.arange(10000), values, 50)
+    assert len(kept) == 50
+    assert kept[0] == 0 and kept[-1] == 9999
+    assert 1234 in kept and 8765 in kept
+    assert np.all(np.diff(kept) > 0)
+
+def test_chart_series_fits_points():
+    """
+    Test that a chart's series is rolled up and thinned to fit max_points.
+    """
+    monthly, period = chart_series("Chile")
+    assert period == "month"
+    assert len(monthly) == len(country_rollups("Chile")["month"])
+
+    yearly, period = chart_series("Chile", max_points=12)
+    assert period == "year"
+    assert len(yearly) == 12
+    assert yearly[HITS].max() == country_rollups("Chile")["year"][HITS].max()
+
+def test_unprocessed_country_rolled_up(tmp_path, monkeypatch):
+    """
+    Test that a country whose data has no sentiment scores yet is rolled up
+    with NaN sentiment and magnitude.
+    """
+    (tmp_path / "CountryData").mkdir()
+    FRAME[["MM-YYYY", HITS]].assign(**{"Country Name": "Nowhere"}).to_csv(
+        tmp_path / "CountryData" / "Nowhere_data.csv", index=False)
+    monkeypatch.chdir(tmp_path)
+
+    yearly = country_rollups("Nowhere")["year"]
+    assert yearly[HITS].tolist() == [40, 4]
+    assert yearly[SENTIMENT].isna().all() and yearly[MAGNITUDE].isna().all()
@@ -0,0 +1,59 @@
+"""
+This module deals with testing the benchmark module and the stub API's latency
+and rate limit.
+"""
+import time
+import pytest
+import requests
+from benchmark import STAGES, compare_results, load_results, run_benchmark, \
+    save_result
+from stub_api import StubAPIServer
+
+def test_stub_latency_and_rate_limit():
+    """
+    Test that the stub waits before answering and answers 429 past its rate
+    limit.
+    """
+    with StubAPIServer(latency=0.05, requests_per_second=1, burst=2) as stub:
+        start = time.perf_counter()
+        statuses = [requests.get(stub.article_search_url,
+                                 params={"q": "Chile", "page": 0},
+                                 timeout=5).status_code for _ in range(3)]
+        assert time.perf_counter() - start >= 0.15
+    assert statuses == [200, 200, 429]
+
+def test_run_benchmark(tmp_path):
+    """
+    Test that a small benchmark times every stage, working only in its
+    scratch folder.
+    """
+    stages = run_benchmark(1, str(tmp_path / "run"), latency=0,
+                           collect_countries=1, collect_months=2,
+                           render_countries=1)
+    assert list(stages) == list(STAGES)
+    assert all(seconds >= 0 for seconds in stages.values())
+    assert (tmp_path / "run" / "Charts" / "comparison.png").exists()
+
+COMPARE_CASES = [
+    ([1.0, 3.0, 2.0], [1.0], 0.5), #Tests that the median base run is used
+    ([2.0], [4.0, 4.0], 2.0), #Tests a slower head
+]
+
+@pytest.mark.parametrize("base_times,head_times,expected", COMPARE_CASES)
+def test_compare_results(tmp_path, base_times, head_times, expected):
+    """
+    Test that saved results of two commits are compared stage by stage.
+
+    The specific tests are commented above next to the variable
+    COMPARE_CASES.
+    """
+    filepath = str(tmp_path / "results.jsonl")
+    for commit, times in (("base", base_times), ("head", head_times)):
+        for seconds in times:
+            save_result({"commit": commit, "scale": 10,
+                         "stages": {"index": seconds}}, filepath)
+    save_result({"commit": "head", "scale": 100, "stages": {"index": 1.0}},
+                filepath)
+    comparison = compare_results(load_results(filepath), "base", "head")
+    assert list(comparison) == [(10, "index")]
+    assert comparison[(10, "index")][2] == pytest.approx(expected)
@@ -0,0 +1,132 @@
+"""
+This module deals with testing the caching module and its use by the
+collection functions in the obtaining module.
+"""
+import time
+import pytest
+import requests
+from caching import CacheMiss, ResponseCache
+from obtaining import collect_headlines_and_hits, monthly_hits
+
+def make_response(content, status=200):
+    """
+    Build a requests Response with the given body and status code.
+    """
+    response = requests.Response()
+    response.status_code = status
+    response._content = content # pylint: disable=protected-access
+    return response
+
+@pytest.fixture(name="cache_path")
+def fixture_cache_path(tmp_path):
+    """
+    Give a path for a cache file that is removed after the test.
+    """
+    return str(tmp_path / "responses.sqlite")
+
+CACHE_KEY_CASES = [
+    ({"q": "Chile", "page": 0, "api-key": "abc"},
+     {"q": "Chile", "page": 0, "api-key": "xyz"}, True),
+     #Tests that the API key is not part of the key
+    ({"q": "Chile", "page": 0}, {"q": " chile ", "page": "0"}, True),
+     #Tests that search terms and values are normalized
+    ({"q": "Chile", "page": 0}, {"q": "Chile", "page": 1}, False),
+     #Tests that different pages have different keys
+]
+
+@pytest.mark.parametrize("first,second,same", CACHE_KEY_CASES)
+def test_cache_key(first, second, same):
+    """
+    Test that cache keys only depend on what is being asked for.
+
+    The specific tests are commented above next to the variable
+    CACHE_KEY_CASES.
+    """
+    assert (ResponseCache.key("url", first) ==
+            ResponseCache.key("url", second)) == same
+
+def test_store_and_lookup(cache_path):
+    """
+    Test that a stored response is given back and counted as a hit, while
+    failed responses are not stored.
+    """
+    cache = ResponseCache(cache_path)
+    cache.store("good", make_response(b'{"a": 1}'))
+    cache.store("bad", make_response(b"", status=429))
+
+    assert cache.lookup("good").json() == {"a": 1}
+    assert cache.lookup("bad") is None
+    assert cache.stats["hits"] == 1
+    assert cache.stats["misses"] == 1
+
+def test_ttl_expires_entries(cache_path):
+    """
+    Test that entries older than the time to live are treated as missing,
+    except by a cache-only cache.
+    """
+    cache = ResponseCache(cache_path, ttl=0.01)
+    cache.store("key", make_response(b"{}"))
+    time.sleep(0.02)
+    assert cache.lookup("key") is None
+    assert ResponseCache(cache_path,
+                         mode="cache-only").lookup("key") is not None
+
+def test_lru_eviction(cache_path):
+    """
+    Test that the least recently used entry is dropped when the cache goes
+    over its size limit.
+    """
+    cache = ResponseCache(cache_path, max_bytes=20)
+    cache.store("first", make_response(b"1" * 10))
+    cache.store("second", make_response(b"2" * 10))
+    cache.lookup("first")
+    cache.store("third", make_response(b"3" * 10))
+
+    assert cache.lookup("second") is None
+    assert cache.lookup("first") is not None
+    assert cache.stats["evictions"] == 1
+
+def test_cache_only_mode_raises(cache_path):
+    """
+    Test that a cache-only cache raises CacheMiss instead of sending requests.
+    """
+    cache = ResponseCache(cache_path, mode="cache-only")
+    with pytest.raises(CacheMiss):
+        cache.call("key", lambda: pytest.fail("request was sent"))
+
+def test_rerun_is_served_from_cache(stub, scheduler, cache_path):
+    """
+    Test that collecting the same months twice only reaches the API once, and
+    that refresh mode reaches it again.
+    """
+    first = collect_headlines_and_hits("Chile", "197309", "197310", "key",
+                                       scheduler, ResponseCache(cache_path))
+    assert stub.call_count == 6
+
+    offline = ResponseCache(cache_path, mode="cache-only")
+    second = collect_headlines_and_hits("Chile", "197309", "197310", "other",
+                                        scheduler, offline)
+    assert second == first
+    assert stub.call_count == 6
+    assert offline.stats["hits"] == 6
+
+    collect_headlines_and_hits("Chile", "197309", "197310", "key", scheduler,
+                               ResponseCache(cache_path, mode="refresh"))
+    assert stub.call_count == 12
+
+def test_hits_only_and_headline_responses_kept_apart(stub, scheduler,
+                                                     cache_path):
+    """
+    Test that a hits-only response and a headline response for the same month
+    are cached apart, so headlines are never read from a response without
+    them.
+    """
+    cache = ResponseCache(cache_path)
+    assert monthly_hits("Chile", "197309", "197309", "key", scheduler,
+                        cache) == [["Chile", "197309", 25]]
+    month = collect_headlines_and_hits("Chile", "197309", "197309", "key",
+                                       scheduler, cache)[0]
+    assert len(month[3]) == 25 and all(month[3])
+    assert cache.stats["stores"] == 1 + 3
+    assert {query.get("fl") for _, query in stub.calls} == {"_id",
+                                                           "_id,headline"}
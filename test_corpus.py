@@ -0,0 +1,120 @@
+"""
+This module deals with testing the corpus module.
+"""
+import os
+import shutil
+import pandas as pd
+import pytest
+from corpus import CORPUS_FILE, HeadlineCorpus, StaleCorpus, build_corpus, \
+    open_corpus
+from dataset import load_country_dataset
+from processing import sentiment_and_magnitude_to_csv
+from search import TermIndex
+from sentiment import LexiconSentimentBackend
+from termcounts import TermCounts
+
+@pytest.fixture(name="corpus")
+def fixture_corpus(tmp_path):
+    """
+    Build a corpus of the test and Bolivia data in a temporary folder.
+    """
+    build_corpus(["test", "Bolivia"], str(tmp_path))
+    with HeadlineCorpus(str(tmp_path)) as headline_corpus:
+        yield headline_corpus
+
+def test_month_text_matches_dataset(corpus):
+    """
+    Test that every month's text from the corpus matches the dataset's.
+    """
+    for country_name in ["test", "Bolivia"]:
+        dataset = load_country_dataset(country_name)
+        for month in dataset.months():
+            assert corpus.month_text(country_name, month) == \
+                dataset.headline_text(month)
+
+def test_range_bytes_is_contiguous(corpus):
+    """
+    Test that a range of months is one slice of the corpus with a headline on
+    each line.
+    """
+    assert bytes(corpus.range_bytes("test", "201801", "201802")) == \
+        b"Test Headline\nTest headline 2\nHere's 'a' headline"
+    assert bytes(corpus.range_bytes("test", "201901", "201912")) == b""
+
+def test_headline_lookup(corpus):
+    """
+    Test that single headlines are found by country, month and number.
+    """
+    assert corpus.headline("test", "201801", 1) == "Test headline 2"
+    with pytest.raises(KeyError):
+        corpus.headline("test", "201801", 2)
+
+def test_iter_month_texts(corpus):
+    """
+    Test that month texts are given one month at a time in order.
+    """
+    assert list(corpus.iter_month_texts("test", "201802", "201803")) == [
+        ("201802", "Here 'a' headline"), ("201803", "More testing")]
+
+def test_stale_corpus_rebuilt(tmp_path, monkeypatch):
+    """
+    Test that a corpus whose data file has changed raises instead of giving
+    old headlines, and that open_corpus builds it again.
+    """
+    data_path = "CountryData/test_data.csv"
+    (tmp_path / "CountryData").mkdir()
+    shutil.copyfile(data_path, tmp_path / data_path)
+    monkeypatch.chdir(tmp_path)
+    build_corpus(["test"])
+
+    with open(data_path, "a", encoding="utf-8") as data_file:
+        data_file.write("test,01-2019,1,0.0,0.1,\"['New headline']\"\n")
+    with HeadlineCorpus() as corpus:
+        assert corpus.stale_countries() == ["test"]
+        with pytest.raises(StaleCorpus):
+            corpus.month_text("test", "201901")
+
+    with open_corpus(["test"]) as corpus:
+        assert not corpus.stale_countries()
+        assert corpus.month_text("test", "201901") == "New headline"
+
+def test_months_out_of_order(tmp_path, monkeypatch):
+    """
+    Test that months written out of order in a data file are put in order,
+    so ranges of months are still found.
+    """
+    (tmp_path / "CountryData").mkdir()
+    pd.DataFrame({"Country Name": "test",
+                  "MM-YYYY": ["03-2018", "01-2018", "02-2018"],
+                  "Number of Hits": [1, 1, 1],
+                  "Month's Headlines": ["['March']", "['January']",
+                                        "['February']"]}).to_csv(
+                                            tmp_path / "CountryData" /
+                                            "test_data.csv", index=False)
+    monkeypatch.chdir(tmp_path)
+
+    with open_corpus(["test"]) as corpus:
+        assert bytes(corpus.range_bytes("test", "201801", "201802")) == \
+            b"January\nFebruary"
+        assert corpus.month_text("test", "201803") == "March"
+
+def test_readers_share_country_corpus(tmp_path, monkeypatch):
+    """
+    Test that word counting, search indexing and sentiment scoring read a
+    country's headlines from one corpus, built once.
+    """
+    (tmp_path / "CountryData").mkdir()
+    shutil.copy("CountryData/test_data.csv", tmp_path / "CountryData")
+    monkeypatch.chdir(tmp_path)
+
+    counts = TermCounts.count("test")
+    corpus_path = os.path.join(".cache", "corpus", "test", CORPUS_FILE)
+    built = os.stat(corpus_path).st_mtime_ns
+    with TermIndex("terms.sqlite") as index:
+        index.add_country("test")
+        assert index.search("testing") == [("test", "201803", 0)]
+    sentiment_and_magnitude_to_csv(
+        "test", backend=LexiconSentimentBackend(processes=1))
+    assert os.stat(corpus_path).st_mtime_ns == built
+    assert counts.frequencies("201801", "201801") == {"Test": 2,
+                                                      "Headline": 2}
@@ -0,0 +1,62 @@
+"""
+This module deals with testing the dataset module.
+"""
+import shutil
+import pytest
+from dataset import clean_headlines, load_country_dataset
+
+CLEAN_HEADLINES_CASES = [
+    ("['Test Headline', 'Test headline 2']", "Test Headline Test headline 2"),
+                                        #Tests that list artifacts are removed
+    ("['Chile" + chr(8217) + "s Army']", "Chile Army"),
+                                        #Tests that curly possessives removed
+]
+
+@pytest.mark.parametrize("test_input,expected", CLEAN_HEADLINES_CASES)
+def test_clean_headlines(test_input, expected):
+    """
+    Test that clean_headlines turns a stored headline list into plain text.
+
+    The specific tests are commented above next to the variable
+    CLEAN_HEADLINES_CASES.
+    """
+    assert clean_headlines(test_input) == expected
+
+@pytest.fixture(name="country_folder")
+def fixture_country_folder(tmp_path, monkeypatch):
+    """
+    Run the test from a folder holding a copy of the test country's data.
+    """
+    (tmp_path / "CountryData").mkdir()
+    shutil.copy("CountryData/test_data.csv", tmp_path / "CountryData")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+@pytest.mark.usefixtures("country_folder")
+def test_dataset_is_loaded_once():
+    """
+    Test that loading the same unchanged country twice gives the same object.
+    """
+    assert load_country_dataset("test") is load_country_dataset("test")
+
+def test_dataset_reloads_after_change(country_folder):
+    """
+    Test that the dataset is parsed again after its file changes.
+    """
+    first = load_country_dataset("test")
+    with open(country_folder / "CountryData/test_data.csv", "a",
+              encoding="utf-8") as file:
+        file.write("test,04-2018,0,0.0,0.0,\n")
+
+    second = load_country_dataset("test")
+    assert second is not first
+    assert second.months() == ["201801", "201802", "201803", "201804"]
+    assert second.headline_text("201804") == ""
+
+def test_headline_texts_range():
+    """
+    Test that a range of months gives each month's text in order.
+    """
+    dataset = load_country_dataset("test")
+    assert dataset.headline_texts("201802", "201803") == [
+        "Here 'a' headline", "More testing"]
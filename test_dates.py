@@ -0,0 +1,41 @@
+"""
+This module deals with testing the dates module.
+"""
+import numpy as np
+import pytest
+from dates import format_year_months, month_date_ranges, month_range, \
+    to_month_years, to_year_months
+
+MONTH_RANGE_CASES = [
+    (("199911", "200002"), ["199911", "199912", "200001", "200002"]),
+                                    #Tests that ranges cross the year
+    (("197309", "197309"), ["197309"]), #Tests a range of one month
+    (("197310", "197309"), []), #Tests that a backwards range is empty
+]
+
+@pytest.mark.parametrize("test_input,expected", MONTH_RANGE_CASES)
+def test_month_range(test_input, expected):
+    """
+    Test that month_range gives every month between the two, inclusive.
+
+    The specific tests are commented above next to the variable
+    MONTH_RANGE_CASES.
+    """
+    assert format_year_months(month_range(*test_input)).tolist() == expected
+
+def test_month_date_ranges():
+    """
+    Test that the first and last day of months follow the Gregorian calendar.
+    """
+    first_days, last_days = month_date_ranges(["190002", "200002", "197309"])
+    assert first_days.tolist() == ["19000201", "20000201", "19730901"]
+    assert last_days.tolist() == ["19000228", "20000229", "19730930"]
+
+def test_format_conversions_round_trip():
+    """
+    Test that months convert between YYYYMM and MM-YYYY formats in bulk.
+    """
+    year_months = format_year_months(month_range("185001", "215012"))
+    month_years = to_month_years(year_months)
+    assert month_years[0] == "01-1850"
+    assert np.array_equal(to_year_months(month_years), year_months)
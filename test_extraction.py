@@ -0,0 +1,45 @@
+"""
+This module deals with testing the extraction module.
+"""
+import json
+import pytest
+from extraction import article_docs, article_hits, article_month_counts, \
+    parse_body, sample_article_page, sentiment_scores
+
+SENTIMENT_CASES = [
+    ({"score": -0.4, "magnitude": 2.5}, [-0.4, 2.5]), #Tests both fields
+    ({"magnitude": 0.3}, [0.0, 0.3]), #Tests that a zero score left out is 0
+    ({}, [0.0, 0.0]), #Tests a response without any scores
+]
+
+@pytest.mark.parametrize("test_input,expected", SENTIMENT_CASES)
+def test_sentiment_scores(test_input, expected):
+    """
+    Test that the score and magnitude are read from a sentiment response.
+
+    The specific tests are commented above next to the variable
+    SENTIMENT_CASES.
+    """
+    assert sentiment_scores({"documentSentiment": test_input}) == expected
+
+def test_matches_jq_queries():
+    """
+    Test that articles are read the same as with the jq queries used before.
+    """
+    pyjq = pytest.importorskip("pyjq")
+    content = sample_article_page()
+    document = parse_body(content)
+    assert article_hits(document) == pyjq.all(".response .meta .hits",
+                                              json.loads(content))[0]
+    assert article_docs(document) == pyjq.all(
+        ".response .docs[] | [._id, .headline .main]", json.loads(content))
+
+def test_missing_fields():
+    """
+    Test that articles without a headline and responses without facets are
+    read without errors.
+    """
+    document = parse_body(b'{"response": {"docs": [{"_id": "a"}], '
+                          b'"meta": {"hits": 1}}}')
+    assert article_docs(document) == [["a", None]]
+    assert article_month_counts(document) == {}
@@ -0,0 +1,33 @@
+"""
+This module deals with testing the flags module.
+"""
+import pytest
+from flags import PREVIEW_SIZE, clear_flag_cache, flag_colors, flag_mask
+
+@pytest.fixture(autouse=True)
+def fixture_empty_cache():
+    """
+    Start each test without any flags loaded.
+    """
+    clear_flag_cache()
+
+def test_flag_loaded_once():
+    """
+    Test that a flag is only read once at each size, and cannot be changed by
+    the callers it is shared with.
+    """
+    mask = flag_mask("Chile")
+    assert flag_mask("Chile") is mask
+    assert flag_colors("Chile") is flag_colors("Chile")
+    assert mask.shape[:2] == (591, 845)
+    with pytest.raises(ValueError):
+        mask[0, 0] = 0
+
+def test_preview_flag_is_smaller():
+    """
+    Test that a preview flag fits in PREVIEW_SIZE and keeps its proportions.
+    """
+    preview = flag_mask("Bolivia", PREVIEW_SIZE)
+    assert preview.shape[1] == PREVIEW_SIZE
+    assert preview.shape[0] == pytest.approx(818 * PREVIEW_SIZE / 1200, abs=1)
+    assert flag_mask("Bolivia").shape[:2] == (818, 1200)
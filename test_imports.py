@@ -0,0 +1,73 @@
+"""
+This module deals with testing that the modules import quickly, putting off
+the heavy libraries until they are used.
+
+The import-time budgets depend on how busy the machine is, so they only run
+when the NYTC_BENCHMARK environment variable is set, as in
+NYTC_BENCHMARK=1 python -m pytest test_imports.py.
+"""
+import os
+import sys
+import pytest
+from lazy import LazyModule, import_seconds, imported_libraries, \
+    lazy_import
+
+# Libraries that take a tenth of a second or more to import.
+HEAVY_LIBRARIES = {"numpy", "pandas", "matplotlib", "wordcloud", "PIL",
+                   "pyarrow", "requests"}
+
+IMPORT_BUDGET_CASES = [
+    ("dates", 0.1), #Tests modules that only work on data
+    ("storage", 0.1),
+    ("dataset", 0.1),
+    ("writing", 0.1),
+    ("corpus", 0.1),
+    ("search", 0.1),
+    ("termcounts", 0.1),
+    ("aggregation", 0.1),
+    ("panel", 0.1),
+    ("flags", 0.1),
+    ("extraction", 0.1),
+    ("scheduling", 0.1),
+    ("caching", 0.1),
+    ("jobs", 0.1),
+    ("metrics", 0.1),
+    ("obtaining", 0.25), #Tests modules that collect, score and draw, which
+    ("sentiment", 0.25), #import thread and process pools
+    ("processing", 0.25),
+    ("rendering", 0.25),
+    ("visualization", 0.25),
+    ("pipeline", 0.25),
+]
+
+@pytest.mark.skipif(not os.environ.get("NYTC_BENCHMARK"),
+                    reason="timing test, set NYTC_BENCHMARK to run it")
+@pytest.mark.parametrize("module,budget", IMPORT_BUDGET_CASES)
+def test_import_budget(module, budget):
+    """
+    Test that importing each module takes less than its budget in seconds.
+
+    The specific tests are commented above next to the variable
+    IMPORT_BUDGET_CASES.
+    """
+    assert import_seconds(module) < budget
+
+@pytest.mark.parametrize("module", ["pipeline", "visualization"])
+def test_heavy_libraries_not_imported(module):
+    """
+    Test that the modules that import every other one load none of the heavy
+    libraries until they are used.
+    """
+    assert not imported_libraries(module) & HEAVY_LIBRARIES
+
+def test_lazy_module_imports_on_use():
+    """
+    Test that a lazy module works like the module once used, and that a
+    missing optional library is given as None.
+    """
+    sys.modules.pop("wave", None)
+    wave = lazy_import("wave")
+    assert isinstance(wave, LazyModule) and "wave" not in sys.modules
+    assert wave.Error.__name__ == "Error"
+    assert "wave" in sys.modules
+    assert lazy_import("not_an_installed_library", optional=True) is None
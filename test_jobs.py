@@ -0,0 +1,74 @@
+"""
+This module deals with testing that collection runs checkpointed in a JobStore
+can be resumed without repeating requests.
+"""
+import os
+import pandas as pd
+import pytest
+from jobs import JobStore
+from obtaining import collect_month, reset_data_entries, \
+    write_hits_and_headlines_to_file
+
+@pytest.fixture(name="job")
+def fixture_job(tmp_path, monkeypatch):
+    """
+    Give a JobStore and run the test from an empty folder with a CountryData
+    folder for csv files.
+    """
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "CountryData").mkdir()
+    store = JobStore(str(tmp_path / "jobs.sqlite"))
+    yield store
+    store.close()
+
+def test_pages_are_not_fetched_twice(stub, scheduler, job):
+    """
+    Test that pages recorded in the job store are not requested again.
+    """
+    first = collect_month("Chile", "197309", "key", scheduler, job=job)
+    assert stub.call_count == 3
+    second = collect_month("Chile", "197309", "key", scheduler, job=job)
+    assert second == first
+    assert stub.call_count == 3
+
+def test_resume_collects_only_missing_months(stub, scheduler, job):
+    """
+    Test that a run over a longer range only collects the months an earlier
+    run did not write, and that re-running a finished run sends no requests.
+    """
+    write_hits_and_headlines_to_file("Chile", "197301", "197302", "key",
+                                     scheduler, job=job)
+    assert stub.call_count == 2 * 3
+
+    written = write_hits_and_headlines_to_file("Chile", "197301", "197303",
+                                               "key", scheduler, job=job)
+    assert [entry[1] for entry in written] == ["197303"]
+    assert stub.call_count == 3 * 3
+
+    assert write_hits_and_headlines_to_file("Chile", "197301", "197303", "key",
+                                            scheduler, job=job) == []
+    assert stub.call_count == 3 * 3
+
+    data = pd.read_csv("CountryData/Chile_data.csv")
+    assert list(data["MM-YYYY"]) == ["01-1973", "02-1973", "03-1973"]
+    assert job.completed_months("Chile") == {"197301", "197302", "197303"}
+
+@pytest.mark.parametrize("lose_data", [
+    os.remove, #Tests a deleted data file
+    lambda filepath: reset_data_entries("Chile"), #Tests a reset data file
+])
+def test_lost_months_collected_again(stub, scheduler, job, lose_data):
+    """
+    Test that months recorded as written are collected again once the data
+    file no longer has them.
+    """
+    write_hits_and_headlines_to_file("Chile", "197301", "197302", "key",
+                                     scheduler, job=job)
+    lose_data("CountryData/Chile_data.csv")
+
+    written = write_hits_and_headlines_to_file("Chile", "197301", "197302",
+                                               "key", scheduler, job=job)
+    assert [entry[1] for entry in written] == ["197301", "197302"]
+    assert stub.call_count == 2 * 2 * 3
+    data = pd.read_csv("CountryData/Chile_data.csv")
+    assert list(data["MM-YYYY"]) == ["01-1973", "02-1973"]
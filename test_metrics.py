@@ -0,0 +1,131 @@
+"""
+This module deals with testing the metrics module and the counts kept by the
+modules it measures.
+"""
+import json
+import os
+import subprocess
+import sys
+import pytest
+from caching import ResponseCache
+from metrics import REGISTRY, Metrics, json_lines, prometheus_text, stage, \
+    write_metrics
+from obtaining import collect_month
+from stub_api import StubAPIServer
+
+def metric_value(name, **labels):
+    """
+    Give the value of a counter, or the count of a timer, in the registry.
+    """
+    for metric in REGISTRY.snapshot():
+        if metric["name"] == name and metric["labels"] == labels:
+            return metric.get("value", metric.get("count"))
+    return 0
+
+@pytest.fixture(autouse=True)
+def fixture_reset():
+    """
+    Start every test with no metrics.
+    """
+    REGISTRY.reset()
+    yield
+    REGISTRY.reset()
+
+def test_prometheus_text():
+    """
+    Test that counters and timers are given in the Prometheus format, with
+    label values escaped.
+    """
+    metrics = Metrics()
+    metrics.count("requests_total", endpoint="/a", status="200")
+    metrics.count("requests_total", 2, endpoint="/a", status="200")
+    metrics.count("requests_total", endpoint='say "hi"', status="429")
+    metrics.observe("stage_seconds", 0.5, stage="collect")
+    metrics.observe("stage_seconds", 1.5, stage="collect")
+    assert prometheus_text(metrics).splitlines() == [
+        "# TYPE nytc_requests_total counter",
+        'nytc_requests_total{endpoint="/a",status="200"} 3',
+        'nytc_requests_total{endpoint="say \\"hi\\"",status="429"} 1',
+        "# TYPE nytc_stage_seconds summary",
+        'nytc_stage_seconds_count{stage="collect"} 2',
+        'nytc_stage_seconds_sum{stage="collect"} 2.0',
+        "# TYPE nytc_stage_seconds_max gauge",
+        'nytc_stage_seconds_max{stage="collect"} 1.5',
+    ]
+
+def test_write_metrics(tmp_path):
+    """
+    Test that metrics are saved as JSON lines or Prometheus text depending on
+    the file name.
+    """
+    metrics = Metrics()
+    metrics.count("retries_total", endpoint="/a")
+    write_metrics(str(tmp_path / "metrics.jsonl"), metrics)
+    write_metrics(str(tmp_path / "metrics.prom"), metrics)
+    line = json.loads((tmp_path / "metrics.jsonl").read_text())
+    assert line["name"] == "retries_total" and line["value"] == 1
+    assert (tmp_path / "metrics.prom").read_text() == prometheus_text(metrics)
+    assert json_lines(Metrics()) == ""
+
+def test_stage_profiled(tmp_path, monkeypatch):
+    """
+    Test that a stage is timed, and profiled only when the environment
+    variable is set, without profiling the stages inside it again.
+    """
+    with stage("process"):
+        pass
+    assert not os.listdir(tmp_path)
+
+    monkeypatch.setenv("NYTC_PROFILE", str(tmp_path))
+    with stage("collect"):
+        with stage("render", chart="scatter"):
+            pass
+    assert [name.split("-")[0] for name in os.listdir(tmp_path)] == ["collect"]
+    assert metric_value("stage_seconds", stage="process") == 1
+    assert metric_value("stage_seconds", stage="render", chart="scatter") == 1
+
+def test_collection_counted(tmp_path, monkeypatch, scheduler):
+    """
+    Test that collecting a month counts its requests, bytes, retries, cache
+    lookups and JSON parsing.
+    """
+    with StubAPIServer(fail_statuses=[429]) as server:
+        monkeypatch.setattr("obtaining.ARTICLE_SEARCH_URL",
+                            server.article_search_url)
+        cache = ResponseCache(str(tmp_path / "responses.sqlite"))
+        collect_month("Chile", "197309", "key", scheduler, cache)
+        collect_month("Chile", "197309", "key", scheduler, cache)
+        cache.close()
+
+    endpoint = "/svc/search/v2/articlesearch.json"
+    assert metric_value("requests_total", endpoint=endpoint, status="200") == 3
+    assert metric_value("requests_total", endpoint=endpoint, status="429") == 1
+    assert metric_value("retries_total", endpoint=endpoint) == 1
+    assert metric_value("response_bytes_total", endpoint=endpoint) > 0
+    assert metric_value("cache_lookups_total", result="miss") == 3
+    assert metric_value("cache_lookups_total", result="hit") == 3
+    assert metric_value("stage_seconds", stage="request") == 4
+    assert metric_value("stage_seconds", stage="parse") == 6
+
+def test_workers_leave_metrics_file(tmp_path):
+    """
+    Test that rendering in worker processes leaves the metrics file to the
+    main process, which saves its own totals when it exits.
+    """
+    metrics_path = tmp_path / "metrics.prom"
+    jobs = [(str(tmp_path / "a.png"), "scatter", "test", (), {}),
+            (str(tmp_path / "b.png"), "bubble", "test", (), {})]
+    code = ("import os\n"
+            "from rendering import chart_figure, render_charts\n"
+            "chart_figure('scatter', 'test')\n"
+            f"render_charts({jobs!r}, processes=2)\n"
+            f"print(os.path.exists({str(metrics_path)!r}))\n")
+    output = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True,
+        text=True, env={**os.environ, "NYTC_METRICS": str(metrics_path)},
+        cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    assert output.split() == ["False"]
+    lines = metrics_path.read_text().splitlines()
+    assert 'nytc_stage_seconds_count{chart="scatter",stage="render"} 1' \
+        in lines
+    assert not any('chart="bubble"' in line for line in lines)
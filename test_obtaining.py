@@ -1,14 +1,22 @@
 """
 This module deals with testing some of the functions in the obtaining module.
 """
+import asyncio
 import pytest
-from obtaining import days_in_month, next_month
+from obtaining import MONTHS_IN_FLIGHT, aiter_headlines_and_hits, \
+    collect_headlines_and_hits, collect_month, days_in_month, \
+    iter_headlines_and_hits, iter_monthly_hits, monthly_hits, next_month, \
+    split_date_range, survey_hits, write_hits_and_headlines_to_file
+from search import TermIndex
+from storage import read_country_frame
 
 DAYS_IN_MONTH_CASES = [
     ("200002", "29"), #Tests that leap years have 29 days in February
     ("200102", "28"), #Tests that non-leap years have 28 in February
     ("200001", "31"), #Tests that leap years do not have other months affected
     ("200101", "31"), #Tests that non-leap years have correct number of days
+    ("190002", "28"), #Tests that centuries are not leap years
+    ("210002", "28"), #Tests that centuries after 2000 are not leap years
 ]
 
 @pytest.mark.parametrize("test_input,expected", DAYS_IN_MONTH_CASES)
@@ -39,3 +47,135 @@ def test_next_month(test_input, expected):
     NEXT_MONTH_CASES.
     """
     assert next_month(test_input) == expected
+
+SPLIT_DATE_RANGE_CASES = [
+    (("19730901", "19730930"), [["19730901", "19730907"],
+                                ["19730908", "19730914"],
+                                ["19730915", "19730921"],
+                                ["19730922", "19730928"],
+                                ["19730929", "19730930"]]),
+                                #Tests that a month is split into weeks
+    (("19730908", "19730914"), [["19730908", "19730908"],
+                                ["19730909", "19730909"],
+                                ["19730910", "19730910"],
+                                ["19730911", "19730911"],
+                                ["19730912", "19730912"],
+                                ["19730913", "19730913"],
+                                ["19730914", "19730914"]]),
+                                #Tests that a week is split into days
+]
+
+@pytest.mark.parametrize("test_input,expected", SPLIT_DATE_RANGE_CASES)
+def test_split_date_range(test_input, expected):
+    """
+    Test that the split_date_range function covers the same days with smaller
+    date ranges.
+
+    The specific tests are commented above next to the variable
+    SPLIT_DATE_RANGE_CASES.
+    """
+    assert split_date_range(*test_input) == expected
+
+def test_collect_month_requests_each_page(stub, scheduler):
+    """
+    Test that every page of a month is requested once and headlines from
+    different pages are all kept.
+    """
+    month = collect_month("Chile", "197309", "key", scheduler)
+    pages = sorted(int(query["page"]) for _, query in stub.calls)
+    assert pages == [0, 1, 2]
+    assert month[2] == 25
+    assert len(month[3]) == len(set(month[3])) == 25
+
+def test_collect_month_splits_past_page_limit(stub, scheduler):
+    """
+    Test that a month with more hits than the API pages through is split into
+    weeks, and duplicate articles across requests are dropped.
+    """
+    stub.hits = lambda search_term, begin_date, end_date: (
+        1200 if begin_date[6:] == "01" and end_date[6:] == "30" else 15)
+    month = collect_month("Chile", "197309", "key", scheduler)
+
+    assert month[2] == 1200
+    # One page of the month, then two pages for each of the five weeks.
+    assert stub.call_count == 1 + 5 * 2
+    # The first week starts on the same day as the month, so its articles are
+    # the ten already seen on the month's first page.
+    assert len(month[3]) == 10 + 5 * 15 - 10
+
+def test_months_streamed_without_collecting_whole_range(stub, scheduler):
+    """
+    Test that the first month is given back while only a few months past it
+    have been requested.
+    """
+    months = iter_headlines_and_hits("Chile", "197001", "197912", "key",
+                                     scheduler)
+    assert next(months)[1] == "197001"
+    months.close()
+    requested_months = {query["begin_date"][:6] for _, query in stub.calls}
+    assert len(requested_months) <= MONTHS_IN_FLIGHT
+
+    hits = iter_monthly_hits("Chile", "198001", "198912", "key", scheduler)
+    assert next(hits) == ["Chile", "198001", 25]
+    hits.close()
+
+@pytest.mark.usefixtures("stub")
+def test_months_streamed_to_asyncio(scheduler):
+    """
+    Test that the async iterator gives the same months as the list version.
+    """
+    async def collect():
+        return [entry async for entry in aiter_headlines_and_hits(
+            "Chile", "197301", "197303", "key", scheduler)]
+
+    assert asyncio.run(collect()) == collect_headlines_and_hits(
+        "Chile", "197301", "197303", "key", scheduler)
+
+def test_hits_counted_with_one_request_per_year(stub, scheduler):
+    """
+    Test that hits-only counting makes one request per year, asks for no
+    more than the article ids, and gives the same counts as full requests.
+    """
+    stub.hits = lambda search_term, begin_date, end_date: (
+        int(begin_date[4:6]) if begin_date[6:] == "01" else 0)
+    hits = survey_hits(["Chile", "Libya"], "197211", "197403", "key",
+                       scheduler)
+    assert stub.call_count == 2 * 3
+    assert all(query["fl"] == "_id" for _, query in stub.calls)
+    assert hits["Chile"] == monthly_hits("Chile", "197211", "197403", "key",
+                                         scheduler, by_year=False)
+    assert hits["Libya"][:3] == [["Libya", "197211", 11],
+                                 ["Libya", "197212", 12],
+                                 ["Libya", "197301", 1]]
+
+def test_partial_facet_counted_month_by_month(stub, scheduler):
+    """
+    Test that a year whose facet leaves out a month is counted with a request
+    per month instead of giving the missing month no hits.
+    """
+    stub.hits = lambda search_term, begin_date, end_date: (
+        int(begin_date[4:6]) if begin_date[6:] == "01" else 0)
+    stub.facet_limit = 11
+    hits = monthly_hits("Chile", "197301", "197312", "key", scheduler)
+    assert stub.call_count == 1 + 12
+    assert all(query.get("fl") == "_id,headline"
+               for _, query in stub.calls[1:])
+    assert hits == [["Chile", f"1973{month:02d}", month]
+                    for month in range(1, 13)]
+
+def test_articles_without_headline_left_out(stub, scheduler, tmp_path,
+                                            monkeypatch):
+    """
+    Test that an article without a headline is not saved or indexed, instead
+    of being written as the text None and breaking the index.
+    """
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "CountryData").mkdir()
+    stub.hits = lambda search_term, begin_date, end_date: 3
+    stub.untitled = {1}
+    with TermIndex(str(tmp_path / "terms.sqlite")) as index:
+        write_hits_and_headlines_to_file("Chile", "197309", "197309", "key",
+                                         scheduler, index=index)
+        assert len(index.search("headline")) == 2
+    headlines = read_country_frame("Chile")["Month's Headlines"][0]
+    assert "None" not in headlines and "headline 2" in headlines
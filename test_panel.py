@@ -0,0 +1,89 @@
+"""
+This module deals with testing the panel module.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from dates import month_range
+from panel import CountryPanel, load_panel
+
+@pytest.fixture(name="panel")
+def fixture_panel():
+    """
+    A panel of three countries over a year, one of them missing months.
+    """
+    rng = np.random.default_rng(0)
+    hits = rng.integers(0, 100, (3, 12)).astype(float)
+    hits[2, :4] = np.nan
+    sentiment = rng.uniform(-1, 1, (3, 12))
+    return CountryPanel(["A", "B", "C"], month_range("197301", "197312"),
+                        hits, sentiment, np.abs(sentiment))
+
+def test_countries_share_month_index():
+    """
+    Test that countries collected over different years are lined up by month.
+    """
+    panel = load_panel(["Bolivia", "Chile"])
+    assert str(panel.months[0]) == "1960-01"
+    assert str(panel.months[-1]) == "2021-01"
+    assert panel.hits.shape == (2, len(panel.months))
+    chile = pd.read_csv("CountryData/Chile_data.csv")
+    assert panel.hits[panel.row("Chile"), 0] == chile["Number of Hits"][0]
+    assert np.isnan(panel.hits[panel.row("Bolivia"), 0])
+    assert load_panel(["Bolivia", "Chile"]) is panel
+
+def test_statistics_match_pandas(panel):
+    """
+    Test that the array statistics agree with pandas on the same data.
+    """
+    frame = panel.frame("hits")
+    pd.testing.assert_frame_equal(panel.correlation("hits"), frame.corr(),
+                                  check_dtype=False, atol=1e-6)
+    rolled = frame.rolling(3, min_periods=1).mean().where(frame.notna())
+    rolled.iloc[:2] = np.nan
+    np.testing.assert_allclose(panel.rolling("hits", 3), rolled.T.to_numpy(),
+                               rtol=1e-6)
+    np.testing.assert_allclose(np.nansum(panel.normalize("hits", "share"),
+                                         axis=0),
+                               1, rtol=1e-6)
+
+def test_event_statistics(panel):
+    """
+    Test that months around an event are lined up, including months outside
+    the panel.
+    """
+    window = panel.event_window("hits", "197302", before=2, after=1)
+    assert np.isnan(window[:, 0]).all()
+    np.testing.assert_array_equal(window[0, 1:], panel.hits[0, :3])
+
+    statistics = panel.event_statistics("hits", "197307", before=3, after=3)
+    assert statistics.loc["A", "Before"] == pytest.approx(
+        panel.hits[0, 3:6].mean())
+    assert statistics.loc["A", "Change"] == pytest.approx(
+        panel.hits[0, 7:10].mean() - panel.hits[0, 3:6].mean())
+
+def test_save_and_load(panel, tmp_path):
+    """
+    Test that a saved panel is read back the same.
+    """
+    panel.save(str(tmp_path / "panel.npz"))
+    loaded = CountryPanel.load(str(tmp_path / "panel.npz"))
+    assert loaded.countries == panel.countries
+    np.testing.assert_array_equal(loaded.months, panel.months)
+    np.testing.assert_array_equal(loaded.hits, panel.hits)
+
+def test_unprocessed_country_left_nan(tmp_path, monkeypatch):
+    """
+    Test that a country whose data has no sentiment scores yet has its hits
+    read and NaN sentiment and magnitude.
+    """
+    (tmp_path / "CountryData").mkdir()
+    pd.DataFrame({"Country Name": "Nowhere", "MM-YYYY": ["01-1973", "02-1973"],
+                  "Number of Hits": [3, 5]}).to_csv(
+                      tmp_path / "CountryData" / "Nowhere_data.csv",
+                      index=False)
+    monkeypatch.chdir(tmp_path)
+
+    panel = CountryPanel.from_countries(["Nowhere"])
+    assert panel.hits.tolist() == [[3, 5]]
+    assert np.isnan(panel.sentiment).all() and np.isnan(panel.magnitude).all()
@@ -0,0 +1,48 @@
+"""
+This module deals with testing the pipeline module against the stub API.
+"""
+import pandas as pd
+import pytest
+from pipeline import StageSkipped, run_pipeline
+from sentiment import LexiconSentimentBackend
+
+@pytest.fixture(name="workspace")
+def fixture_workspace(tmp_path, monkeypatch):
+    """
+    Run the test from an empty folder with a CountryData folder.
+    """
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "CountryData").mkdir()
+    return tmp_path
+
+def test_countries_run_through_every_stage(stub, scheduler, workspace):
+    """
+    Test that each country is collected, scored and charted, with collection
+    drawing from the one scheduler given.
+    """
+    results = run_pipeline(["Chile", "Bolivia"], "197301", "197302", "key",
+                           backend=LexiconSentimentBackend(processes=1),
+                           scheduler=scheduler, render_processes=2)
+    for country_name in ["Chile", "Bolivia"]:
+        assert results[country_name]["obtain"] == 2
+        assert results[country_name]["process"] == 2
+        assert sorted(results[country_name]["render"]) == [
+            f"Charts/{country_name}_bubble.png",
+            f"Charts/{country_name}_scatter.png"]
+        data = pd.read_csv(workspace / f"CountryData/{country_name}_data.csv")
+        assert data["Sentiment Score (-1 to 1)"].notna().all()
+    assert (workspace / "Charts/Chile_scatter.png").stat().st_size > 0
+    assert stub.call_count == 2 * 2 * 3
+
+@pytest.mark.usefixtures("workspace")
+def test_failed_stage_skips_later_stages(stub, scheduler):
+    """
+    Test that a country whose collection fails is not scored or charted.
+    """
+    stub.fail_statuses = [400]
+    results = run_pipeline(["Chile"], "197301", "197301", "key",
+                           stages=["obtain", "process"],
+                           backend=LexiconSentimentBackend(processes=1),
+                           scheduler=scheduler)
+    assert isinstance(results["Chile"]["obtain"], Exception)
+    assert isinstance(results["Chile"]["process"], StageSkipped)
@@ -0,0 +1,31 @@
+"""
+This module deals with testing the rendering module.
+"""
+import matplotlib.pyplot as plt
+from rendering import chart_figure, month_word_cloud_jobs, render_charts, \
+    save_chart
+
+def test_charts_drawn_without_pyplot(tmp_path):
+    """
+    Test that saving charts leaves no figures open in pyplot.
+    """
+    figures_before = plt.get_fignums()
+    for chart in ["scatter", "bubble"]:
+        save_chart(str(tmp_path / f"{chart}.png"), chart, "Bolivia")
+    figure = chart_figure("word_cloud", "Bolivia", "201803", "201803",
+                          preview=True)
+    assert len(figure.axes[0].images) == 1
+    assert plt.get_fignums() == figures_before
+    assert (tmp_path / "scatter.png").stat().st_size > 0
+
+def test_month_word_clouds_in_processes(tmp_path):
+    """
+    Test that one word cloud per month is saved by worker processes.
+    """
+    jobs = month_word_cloud_jobs("Bolivia", str(tmp_path / "frames"),
+                                 "201801", "201803", preview=True)
+    assert render_charts(jobs, processes=2) == [
+        str(tmp_path / f"frames/Bolivia_{month}.png")
+        for month in ["201801", "201802", "201803"]]
+    assert all((tmp_path / f"frames/Bolivia_{month}.png").exists()
+               for month in ["201801", "201802", "201803"])
@@ -0,0 +1,137 @@
+"""
+This module deals with testing the scheduling module and the collection
+functions that use it, against a local stub of the NYT Article Search API.
+"""
+from concurrent.futures import Future
+import pytest
+import obtaining
+from obtaining import collect_countries, collect_headlines_and_hits, \
+    monthly_hits
+from scheduling import RateLimiter, TokenBucket, iter_in_order
+from stub_api import DROP_CONNECTION
+
+class FakeClock:
+    """
+    A clock that only moves forward when told to sleep.
+    """
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        """
+        Move the clock forward instead of sleeping.
+        """
+        self.now += seconds
+
+def test_token_bucket_refills_at_rate():
+    """
+    Test that an empty bucket reports the time until its next token.
+    """
+    clock = FakeClock()
+    bucket = TokenBucket(rate=0.5, capacity=1, clock=clock)
+    assert bucket.wait_time() == 0
+    bucket.take()
+    assert bucket.wait_time() == pytest.approx(2)
+    clock.sleep(2)
+    assert bucket.wait_time() == 0
+
+def test_rate_limiter_spaces_requests():
+    """
+    Test that ten requests at ten per minute take nine gaps of six seconds.
+    """
+    clock = FakeClock()
+    limiter = RateLimiter(10, None, clock=clock, sleep=clock.sleep)
+    for _ in range(10):
+        limiter.acquire()
+    assert clock.now == pytest.approx(54)
+
+def test_rate_limiter_daily_budget():
+    """
+    Test that the daily bucket holds requests back once it runs out.
+    """
+    clock = FakeClock()
+    limiter = RateLimiter(60, 2, burst=10, clock=clock, sleep=clock.sleep)
+    limiter.acquire()
+    limiter.acquire()
+    assert clock.now == 0
+    limiter.acquire()
+    assert clock.now == pytest.approx(86400 / 2)
+
+def test_scheduler_retries_after_429(stub, scheduler):
+    """
+    Test that requests answered with 429 or 5xx are retried until they work.
+    """
+    stub.fail_statuses = [429, 503]
+    hits = monthly_hits("Chile", "197301", "197301", "key", scheduler)
+    assert hits == [["Chile", "197301", 25]]
+    assert stub.call_count == 3
+
+def test_scheduler_gives_up(stub, scheduler):
+    """
+    Test that a request failing more than max_retries times raises an error.
+    """
+    stub.fail_statuses = [500] * 3
+    scheduler.max_retries = 2
+    with pytest.raises(obtaining.requests.HTTPError) as error:
+        monthly_hits("Chile", "197301", "197301", "key", scheduler)
+    assert error.value.response.status_code == 500
+    assert stub.call_count == 3
+
+def test_scheduler_retries_dropped_connection(stub, scheduler):
+    """
+    Test that a request whose connection drops is retried, and that one that
+    keeps dropping raises the connection error after max_retries retries.
+    """
+    stub.fail_statuses = [DROP_CONNECTION, 503]
+    hits = monthly_hits("Chile", "197301", "197301", "key", scheduler)
+    assert hits == [["Chile", "197301", 25]]
+    assert stub.call_count == 3
+
+    stub.fail_statuses = [DROP_CONNECTION] * 3
+    scheduler.max_retries = 2
+    with pytest.raises(obtaining.requests.ConnectionError):
+        monthly_hits("Chile", "197302", "197302", "key", scheduler)
+    assert stub.call_count == 6
+
+def test_collect_headlines_and_hits_call_count(stub, scheduler):
+    """
+    Test that collection makes one request per page of results per month.
+    """
+    results = collect_headlines_and_hits("Chile", "197211", "197302", "key",
+                                         scheduler)
+    assert [entry[1] for entry in results] == ["197211", "197212", "197301",
+                                               "197302"]
+    assert all(entry[2] == 25 for entry in results)
+    assert stub.call_count == 4 * 3
+
+def test_collect_countries_shares_scheduler(stub, scheduler):
+    """
+    Test that several countries can be collected under one scheduler.
+    """
+    results = collect_countries(["Chile", "Libya"], "201101", "201102", "key",
+                                scheduler)
+    assert sorted(results) == ["Chile", "Libya"]
+    assert results["Libya"][1][:3] == ["Libya", "201102", 25]
+    assert stub.call_count == 2 * 2 * 3
+
+def test_iter_in_order_looks_ahead_a_bounded_number():
+    """
+    Test that iter_in_order gives results in order while only starting a few
+    items ahead of the one being used.
+    """
+    started = []
+
+    def submit(item):
+        started.append(item)
+        future = Future()
+        future.set_result(item * 2)
+        return future
+
+    results = iter_in_order(submit, iter(range(100)), lookahead=3)
+    assert next(results) == 0
+    assert started == [0, 1, 2]
+    assert list(results) == [2 * item for item in range(1, 100)]
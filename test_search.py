@@ -0,0 +1,107 @@
+"""
+This module deals with testing the search module.
+"""
+import pytest
+from search import TermIndex, decode_postings, decode_varints, \
+    encode_varints, month_postings, parse_query
+from writing import DatasetWriter
+
+HEADLINES = {
+    "197308": ["Allende Faces Strikes", "Truckers Strike in Chile"],
+    "197309": ["Military Junta Seizes Power in Chile", "Allende Is Dead",
+               "Junta Names Pinochet", "Chile's Military Rulers Meet"],
+}
+
+@pytest.fixture(name="index")
+def fixture_index(tmp_path):
+    """
+    Give a TermIndex of a few months of headlines in a temporary file.
+    """
+    with TermIndex(str(tmp_path / "terms.sqlite")) as term_index:
+        term_index.add_months("Chile", HEADLINES.items())
+        term_index.add_months("Bolivia",
+                              [("197309", ["Bolivia Watches Chile"])])
+        yield term_index
+
+@pytest.mark.parametrize("numbers", [[0, 1, 127, 128, 300, 2 ** 40], []])
+def test_varints_round_trip(numbers):
+    """
+    Test that encoded ints decode to the same ints, small ones in one byte.
+    """
+    assert decode_varints(encode_varints(numbers)) == numbers
+    assert len(encode_varints([5, 127])) == 2
+
+def test_month_postings_round_trip():
+    """
+    Test that postings give back each headline and position a word is at.
+    """
+    headlines_used, occurrences, data = month_postings(
+        ["a chile b", "x", "chile chile"])["chile"]
+    assert (headlines_used, occurrences) == (2, 3)
+    assert decode_postings(data) == {0: [1], 2: [0, 1]}
+
+SEARCH_CASES = [
+    ("allende", [("Chile", "197308", 0), ("Chile", "197309", 1)]),
+                                        #Tests a word, ignoring case
+    ("junta AND pinochet", [("Chile", "197309", 2)]), #Tests AND
+    ("junta pinochet", [("Chile", "197309", 2)]), #Tests implied AND
+    ("strike OR strikes", [("Chile", "197308", 0), ("Chile", "197308", 1)]),
+                                        #Tests OR
+    ("junta NOT pinochet", [("Chile", "197309", 0)]), #Tests AND NOT
+    ('"military junta"', [("Chile", "197309", 0)]), #Tests that phrases are
+                                                    #matched in order
+    ('"junta military"', []), #Tests that words out of order do not match
+    ("chile NOT (allende OR junta)", [("Bolivia", "197309", 0),
+                                      ("Chile", "197308", 1),
+                                      ("Chile", "197309", 3)]),
+                                        #Tests parentheses and possessives
+]
+
+@pytest.mark.parametrize("test_input,expected", SEARCH_CASES)
+def test_search(index, test_input, expected):
+    """
+    Test that queries find the expected headlines.
+
+    The specific tests are commented above next to the variable SEARCH_CASES.
+    """
+    assert index.search(test_input) == expected
+
+def test_search_filters(index):
+    """
+    Test that searches can be limited to countries and months.
+    """
+    assert index.search("chile", countries=["Bolivia"]) == [
+        ("Bolivia", "197309", 0)]
+    assert index.search("chile", start_month="197309",
+                        end_month="197309", countries=["Chile"]) == [
+                            ("Chile", "197309", 0), ("Chile", "197309", 3)]
+    assert len(index.search("NOT chile")) == 3
+
+def test_bad_query(index):
+    """
+    Test that a query with unmatched parentheses is rejected.
+    """
+    with pytest.raises(ValueError):
+        index.search("(coup")
+
+def test_term_frequencies(index):
+    """
+    Test that word counts per month include months without the word.
+    """
+    assert index.term_frequencies("Allende", "Chile").to_dict() == {
+        "197308": 1, "197309": 1}
+    assert index.term_frequencies("truckers", "Chile").to_dict() == {
+        "197308": 1, "197309": 0}
+
+def test_writer_updates_index(index, tmp_path, monkeypatch):
+    """
+    Test that months written through a DatasetWriter are indexed, replacing
+    what was indexed for them before.
+    """
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "CountryData").mkdir()
+    with DatasetWriter("Chile", index=index) as writer:
+        writer.write("09-1973", 1, ["Coup in Chile"])
+    assert index.search("coup") == [("Chile", "197309", 0)]
+    assert index.search("junta") == []
+    assert index.search("truckers") == [("Chile", "197308", 1)]
@@ -0,0 +1,203 @@
+"""
+This module deals with testing the sentiment module against a local stub of
+the analyzeSentiment endpoint.
+"""
+import shutil
+import pandas as pd
+import pytest
+from processing import sentiment_and_magnitude_to_csv
+from sentiment import LexiconSentimentBackend, SentimentEngine, \
+    aggregate_scores, score_agreement, sentiment_distribution, split_text
+from storage import SHARE_COLUMNS
+from stub_api import StubAPIServer
+from writing import DatasetWriter
+
+@pytest.fixture(name="sentiment_stub")
+def fixture_sentiment_stub():
+    """
+    Run a stub server for the engine to send requests to.
+    """
+    with StubAPIServer() as server:
+        yield server
+
+@pytest.fixture(name="engine")
+def fixture_engine(sentiment_stub):
+    """
+    Give a sentiment engine pointed at the stub server.
+    """
+    with SentimentEngine(sentiment_stub.sentiment_url) as sentiment_engine:
+        yield sentiment_engine
+
+AGGREGATE_SCORES_CASES = [
+    (([[0.5, 1.0], [-0.5, 3.0]], "mean"), [0.0, 2.0]), #Tests plain averages
+    (([[0.5, 1.0], [-0.5, 3.0]], "weighted"), [-0.25, 4.0]),
+                                            #Tests magnitude-weighted scores
+    (([], "mean"), [0.0, 0.0]), #Tests that no scores give a neutral score
+    (([[-0.8, 1.0], [0.1, 1.0], [0.6, 1.0], [0.9, 1.0]], "distribution"),
+     [0.2, 1.0, 0.25, 0.25, 0.5]), #Tests averages followed by bucket shares
+]
+
+@pytest.mark.parametrize("test_input,expected", AGGREGATE_SCORES_CASES)
+def test_aggregate_scores(test_input, expected):
+    """
+    Test that aggregate_scores combines headline scores as described.
+
+    The specific tests are commented above next to the variable
+    AGGREGATE_SCORES_CASES.
+    """
+    assert aggregate_scores(*test_input) == pytest.approx(expected)
+
+def test_sentiment_distribution():
+    """
+    Test that scores are counted into negative, neutral and positive.
+    """
+    assert sentiment_distribution([[-0.8, 1], [0.1, 1], [0.6, 1], [0.9, 1]]) \
+        == {"negative": 1, "neutral": 1, "positive": 2}
+
+def test_split_text():
+    """
+    Test that long texts are split between words into small enough pieces.
+    """
+    assert split_text("coup war peace", max_bytes=9) == ["coup war", "peace"]
+
+def test_repeated_texts_scored_once(sentiment_stub, engine):
+    """
+    Test that each distinct text is only sent once, even across calls, and
+    empty texts are not sent at all.
+    """
+    scores = engine.score_texts(["peace growth", "coup", "peace growth", ""])
+    assert scores == [[1.0, 0.2], [-1.0, 0.1], [1.0, 0.2], [0.0, 0.0]]
+    assert sentiment_stub.call_count == 2
+
+    engine.score_texts(["coup"])
+    assert sentiment_stub.call_count == 2
+
+def test_retries_after_429(sentiment_stub, engine):
+    """
+    Test that requests the API pushes back on are retried.
+    """
+    sentiment_stub.fail_statuses = [429]
+    engine._scheduler.base_backoff = 0.01 # pylint: disable=protected-access
+    assert engine.score_texts(["war"]) == [[-1.0, 0.1]]
+    assert sentiment_stub.call_count == 2
+
+def test_per_headline_months(engine):
+    """
+    Test that scoring per headline combines each month's headline scores.
+    """
+    months = [["peace talks", "coup attempt"], [], ["riot"]]
+    assert engine.score_months(months, per_headline=True) == [
+        [0.0, 0.1], [0.0, 0.0], [-1.0, 0.1]]
+    assert engine.score_months(["peace talks coup attempt"]) == [[0.0, 0.2]]
+
+def test_sentiment_to_csv(sentiment_stub, engine, tmp_path, monkeypatch):
+    """
+    Test that a country's file is updated with one score per month, sending
+    one request per month with headlines.
+    """
+    (tmp_path / "CountryData").mkdir()
+    shutil.copy("CountryData/test_data.csv", tmp_path / "CountryData")
+    monkeypatch.chdir(tmp_path)
+
+    sentiment_and_magnitude_to_csv("test", backend=engine)
+    data = pd.read_csv("CountryData/test_data.csv")
+    assert list(data["Sentiment Score (-1 to 1)"]) == [0.0, 0.0, 0.0]
+    assert list(data["Magnitude"]) == [0.0, 0.0, 0.0]
+    assert sentiment_stub.call_count == 3
+
+def test_lexicon_backend():
+    """
+    Test that the lexicon backend scores texts offline with the same
+    [score, magnitude] form, positive and negative as expected.
+    """
+    backend = LexiconSentimentBackend(processes=1)
+    scores = backend.score_texts(["Peace treaty signed", "Coup kills dozens",
+                                  "Senate meets"])
+    assert scores[0][0] > 0 > scores[1][0]
+    assert scores[2] == [0.0, 0.0]
+    assert all(-1 <= score <= 1 and magnitude >= 0
+               for score, magnitude in scores)
+
+def test_lexicon_backend_in_processes():
+    """
+    Test that spreading texts over processes gives the same scores in order.
+    """
+    texts = ["war", "peace", "budget"] * 10
+    parallel = LexiconSentimentBackend(processes=2, parallel_threshold=0)
+    assert parallel.score_texts(texts) == \
+        LexiconSentimentBackend(processes=1).score_texts(texts)
+
+def test_score_agreement():
+    """
+    Test that agreement between two sets of scores is measured.
+    """
+    agreement = score_agreement([[0.5, 1], [-0.5, 1]], [[0.25, 1], [-0.25, 1]])
+    assert agreement["correlation"] == pytest.approx(1)
+    assert agreement["mean_absolute_difference"] == pytest.approx(0.25)
+    assert agreement["sign"] == 1
+
+def test_sentiment_to_csv_only_scores_changed_months(sentiment_stub, tmp_path,
+                                                     monkeypatch):
+    """
+    Test that scoring a country again only sends requests for months that were
+    added or changed since the last run, and keeps the other rows' scores.
+    """
+    (tmp_path / "CountryData").mkdir()
+    shutil.copy("CountryData/test_data.csv", tmp_path / "CountryData")
+    monkeypatch.chdir(tmp_path)
+
+    def score_country(**options):
+        with SentimentEngine(sentiment_stub.sentiment_url) as engine:
+            return sentiment_and_magnitude_to_csv("test", backend=engine,
+                                                  **options)
+
+    assert score_country() == 3
+    assert score_country() == 0
+    assert sentiment_stub.call_count == 3
+
+    data = pd.read_csv("CountryData/test_data.csv")
+    data.loc[len(data)] = ["test", "04-2018", 3, None, None,
+                           "['Coup ends in war']"]
+    data.to_csv("CountryData/test_data.csv", index=False)
+    assert score_country() == 1
+    assert sentiment_stub.call_count == 4
+    data = pd.read_csv("CountryData/test_data.csv")
+    assert list(data["Sentiment Score (-1 to 1)"]) == [0.0, 0.0, 0.0, -1.0]
+
+    assert score_country(per_headline=True) == 4
+    assert score_country(incremental=False) == 4
+
+def test_iter_scores_matches_score_months():
+    """
+    Test that months scored as a stream get the same scores as a list.
+    """
+    backend = LexiconSentimentBackend(processes=1)
+    months = ["peace treaty", "coup", ""]
+    assert list(backend.iter_scores(iter(months))) == \
+        backend.score_months(months)
+
+def test_sentiment_distribution_to_csv(tmp_path, monkeypatch):
+    """
+    Test that scoring headlines one at a time with the "distribution"
+    aggregate writes each month's bucket shares next to its score, and that
+    collecting more months keeps them.
+    """
+    (tmp_path / "CountryData").mkdir()
+    pd.DataFrame({"Country Name": "test", "MM-YYYY": ["01-2018", "02-2018"],
+                  "Number of Hits": [3, 1],
+                  "Month's Headlines": [
+                      "['Peace treaty signed', 'Coup kills dozens', "
+                      "'Senate meets']", "['Senate meets']"]}).to_csv(
+                          tmp_path / "CountryData" / "test_data.csv",
+                          index=False)
+    monkeypatch.chdir(tmp_path)
+
+    assert sentiment_and_magnitude_to_csv(
+        "test", backend=LexiconSentimentBackend(processes=1),
+        per_headline=True, aggregate="distribution") == 2
+    with DatasetWriter("test") as writer:
+        writer.write("03-2018", 0, [])
+    data = pd.read_csv("CountryData/test_data.csv")
+    assert list(data.loc[0, SHARE_COLUMNS]) == pytest.approx([1 / 3] * 3)
+    assert list(data.loc[1, SHARE_COLUMNS]) == [0.0, 1.0, 0.0]
+    assert data[SHARE_COLUMNS].iloc[2].isna().all()
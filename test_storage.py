@@ -0,0 +1,75 @@
+"""
+This module deals with testing the storage module.
+"""
+import os
+import shutil
+import pytest
+import storage
+from dataset import load_country_dataset
+
+pytest.importorskip("pyarrow")
+
+PARSE_HEADLINE_LIST_CASES = [
+    ("['Test Headline', 'Test headline 2']", ["Test Headline",
+                                              "Test headline 2"]),
+                                        #Tests that a valid list is parsed
+    ("['Here's 'a' headline']", ["Here's 'a' headline"]),
+                                        #Tests that unescaped quotes are kept
+    ("[\"Chile's Army\", 'Coup']", ["Chile's Army", "Coup"]),
+                                        #Tests double-quoted list items
+    (float("nan"), []), #Tests that a month without headlines gives no list
+]
+
+@pytest.mark.parametrize("test_input,expected", PARSE_HEADLINE_LIST_CASES)
+def test_parse_headline_list(test_input, expected):
+    """
+    Test that parse_headline_list turns saved list text back into a list.
+
+    The specific tests are commented above next to the variable
+    PARSE_HEADLINE_LIST_CASES.
+    """
+    assert storage.parse_headline_list(test_input) == expected
+
+@pytest.fixture(name="converted")
+def fixture_converted(tmp_path, monkeypatch):
+    """
+    Run the test from a folder holding the test country's data converted to
+    Parquet.
+    """
+    (tmp_path / "CountryData").mkdir()
+    shutil.copy("CountryData/test_data.csv", tmp_path / "CountryData")
+    monkeypatch.chdir(tmp_path)
+    storage.write_country_parquet("test")
+    return tmp_path
+
+def test_parquet_is_preferred_when_fresh(converted):
+    """
+    Test that the Parquet file is read while it is newer than the csv, and the
+    csv is read again once the csv changes.
+    """
+    assert storage.country_data_source("test").endswith(".parquet")
+
+    csv_path = converted / "CountryData/test_data.csv"
+    parquet_mtime = os.path.getmtime(csv_path.with_suffix(".parquet"))
+    os.utime(csv_path, (parquet_mtime + 1, parquet_mtime + 1))
+    assert storage.country_data_source("test").endswith(".csv")
+
+@pytest.mark.usefixtures("converted")
+def test_column_projection():
+    """
+    Test that only the asked-for columns are loaded, with typed values.
+    """
+    frame = storage.read_country_frame("test", ["MM-YYYY", "Number of Hits"])
+    assert list(frame.columns) == ["MM-YYYY", "Number of Hits"]
+    assert list(frame["MM-YYYY"]) == ["01-2018", "02-2018", "03-2018"]
+    assert list(frame["Number of Hits"]) == [14, 10, 10]
+
+@pytest.mark.usefixtures("converted")
+def test_parquet_matches_csv_text():
+    """
+    Test that headlines read from Parquet give the same text as the csv.
+    """
+    dataset = load_country_dataset("test")
+    assert dataset.filepath.endswith(".parquet")
+    assert dataset.headline_texts() == ["Test Headline Test headline 2",
+                                        "Here 'a' headline", "More testing"]
@@ -0,0 +1,58 @@
+"""
+This module deals with testing the termcounts module.
+"""
+from collections import Counter
+import shutil
+import pytest
+from dataset import load_country_dataset
+from termcounts import TermCounts, load_term_counts, month_word_counts
+
+@pytest.fixture(name="bolivia")
+def fixture_bolivia():
+    """
+    Give the word counts of the Bolivia data.
+    """
+    return TermCounts.count("Bolivia")
+
+def test_range_matches_month_counts(bolivia):
+    """
+    Test that the counts over a range of months are the sum of each month's
+    counts.
+    """
+    dataset = load_country_dataset("Bolivia")
+    months = dataset.months()
+    start, end = months[3], months[20]
+    expected = Counter()
+    for month in months[3:21]:
+        expected.update(month_word_counts(dataset.headline_text(month)))
+    assert bolivia.frequencies(start, end) == dict(expected)
+    assert bolivia.frequencies(months[5], months[5]) == \
+        month_word_counts(dataset.headline_text(months[5]))
+
+def test_stopwords_removed(bolivia):
+    """
+    Test that stopwords are not counted.
+    """
+    frequencies = bolivia.frequencies()
+    assert "the" not in frequencies and "The" not in frequencies
+    assert frequencies["Bolivia"] > 0
+
+def test_counts_saved_and_rebuilt(tmp_path, monkeypatch):
+    """
+    Test that counts are saved, read back, and counted again once the data
+    file changes.
+    """
+    (tmp_path / "CountryData").mkdir()
+    shutil.copy("CountryData/test_data.csv", tmp_path / "CountryData")
+    monkeypatch.chdir(tmp_path)
+
+    counts = load_term_counts("test", str(tmp_path / "counts"))
+    assert counts.frequencies("201802", "201803") == {
+        "a'": 1, "headline": 1, "testing": 1}
+    assert TermCounts.load(str(tmp_path / "counts/test.npz")).frequencies() \
+        == counts.frequencies()
+
+    with open("CountryData/test_data.csv", "a", encoding="utf-8") as file:
+        file.write("test,04-2018,1,0.0,0.0,\"['Coup']\"\n")
+    assert load_term_counts("test", str(tmp_path / "counts")).frequencies(
+        "201804") == {"Coup": 1}
@@ -0,0 +1,71 @@
+"""
+This module deals with testing the writing module.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import pytest
+from obtaining import reset_data_entries, write_data_to_file
+from writing import DatasetWriter
+
+@pytest.fixture(name="data_folder")
+def fixture_data_folder(tmp_path, monkeypatch):
+    """
+    Run the test from an empty folder with a CountryData folder.
+    """
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "CountryData").mkdir()
+    return tmp_path / "CountryData"
+
+def write_months(country_name, months):
+    """
+    Write one row per month, as a separate collector process would.
+    """
+    with DatasetWriter(country_name, batch_size=2) as writer:
+        for month in months:
+            writer.write(f"{month:02}-2000", month, [f"Headline {month}"])
+
+def test_months_written_in_batches(data_folder):
+    """
+    Test that months are only written once a batch is full or the writer is
+    closed.
+    """
+    with DatasetWriter("Chile", batch_size=2) as writer:
+        assert writer.write("01-1973", 5, ["Coup"]) == []
+        assert not (data_folder / "Chile_data.csv").exists()
+        assert writer.write("02-1973", 6, []) == ["01-1973", "02-1973"]
+        writer.write("03-1973", 7, ["Peace"])
+    data = pd.read_csv(data_folder / "Chile_data.csv")
+    assert list(data["MM-YYYY"]) == ["01-1973", "02-1973", "03-1973"]
+    assert list(data["Number of Hits"]) == [5, 6, 7]
+    assert list(data["Month's Headlines"]) == ["['Coup']", "[]", "['Peace']"]
+
+def test_upsert_by_month(data_folder):
+    """
+    Test that writing a month again replaces its row, keeps its sentiment
+    scores, keeps months in order, and drops the empty row of a reset file.
+    """
+    reset_data_entries("Chile")
+    write_data_to_file("Chile", "02-1973", 6, ["Old"])
+    data = pd.read_csv(data_folder / "Chile_data.csv")
+    data["Sentiment Score (-1 to 1)"] = [0.5]
+    data.to_csv(data_folder / "Chile_data.csv", index=False)
+
+    with DatasetWriter("Chile") as writer:
+        writer.write("02-1973", 8, ["New"])
+        writer.write("01-1973", 5, ["Coup"])
+    data = pd.read_csv(data_folder / "Chile_data.csv")
+    assert list(data["MM-YYYY"]) == ["01-1973", "02-1973"]
+    assert list(data["Number of Hits"]) == [5, 8]
+    assert list(data["Month's Headlines"]) == ["['Coup']", "['New']"]
+    assert data["Sentiment Score (-1 to 1)"][1] == 0.5
+
+def test_processes_write_same_country(data_folder):
+    """
+    Test that several processes writing the same country do not lose each
+    other's months.
+    """
+    with ProcessPoolExecutor(max_workers=3) as pool:
+        list(pool.map(write_months, ["Chile"] * 3,
+                      [range(1, 13, 3), range(2, 13, 3), range(3, 13, 3)]))
+    data = pd.read_csv(data_folder / "Chile_data.csv")
+    assert list(data["Number of Hits"]) == list(range(1, 13))
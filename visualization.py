@@ -5,47 +5,36 @@ files.
 The three main visualizations created in this module are scatterplot,
 wordcloud, and bubblechart. There are some variations of the wordcloud creation
 so that wordclouds can be created for all the csv data, or just some of it.
+Wordclouds are drawn from word counts made ahead of time by the termcounts
+module, so a wordcloud of many months takes as long as one of a single month,
+and flags are loaded once through the flags module.
+
+These functions show the charts with pyplot, for the notebook. The charts
+themselves are drawn by the rendering module, which can also save them
+without pyplot.
 """
-import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
-from wordcloud import WordCloud, STOPWORDS, ImageColorGenerator
-from PIL import Image
-from processing import all_headlines_in_string, headline_list_to_string
+from lazy import lazy_import
+from rendering import CHART_SIZE, WORD_CLOUD_SIZE, draw_bubble_chart, \
+    draw_comparison_chart, draw_scatter_plot, draw_word_cloud
+
+plt = lazy_import("matplotlib.pyplot")
 
-def create_scatter_plot(country_name):
+def create_scatter_plot(country_name, period="auto"):
     """
     Display a scatter plot of hits per month for a country using matplotlib.
 
     Args:
         country_name: A string that is the name of the country for which to
         visualize number of hits
+        period: A string, "month", "quarter" or "year", to add up the hits of
+        each period, or "auto" to choose one that fits the chart. (Optional).
     Returns:
         None.
     """
+    _, axis = plt.subplots(figsize = CHART_SIZE)
+    draw_scatter_plot(axis, country_name, period)
 
-    country_data = pd.read_csv(f'CountryData/{country_name}_data.csv')
-
-    num_entries = len(country_data['MM-YYYY'])
-
-    begin_date = country_data["MM-YYYY"][0]
-    end_date = country_data["MM-YYYY"][num_entries - 1]
-
-    _, axis = plt.subplots(figsize = (20, 10))
-    axis.scatter(country_data['MM-YYYY'], country_data['Number of Hits'])
-
-    axis.set_xlabel('Time Frame (MM-YYYY)', fontsize = 20)
-    axis.set_ylabel('Number of Hits', fontsize = 20)
-    axis.set_title(f'Number of Hits in NYTimes Articles per Month for ' \
-              f'{country_name} from {begin_date} to {end_date}', fontsize = 25)
-
-    axis.xaxis.set_major_locator(plt.MaxNLocator(30))
-    axis.xaxis.labelpad = 30
-    axis.yaxis.labelpad = 30
-
-    plt.xticks(rotation = 45)
-
-def create_word_cloud_one_month(country_name, yearmonth):
+def create_word_cloud_one_month(country_name, yearmonth, preview=False):
     """
     Create a wordcloud based on the headlines collected about the country for
     the given month.
@@ -55,26 +44,16 @@ def create_word_cloud_one_month(country_name, yearmonth):
         to create the wordcloud.
         yearmonth: A string representing the month for which to get headlines,
         in YYYYMM format.
+        preview: A boolean that is True to draw on a smaller copy of the flag
+        (see flags.PREVIEW_SIZE), which is quicker. (Optional).
     Returns:
         None.
     """
+    _, axis = plt.subplots(figsize = WORD_CLOUD_SIZE)
+    draw_word_cloud(axis, country_name, yearmonth, yearmonth, preview)
 
-    text = headline_list_to_string(country_name, yearmonth)
-    num_words = len(text.split())
-
-    background_flag_mask = np.array(Image.open(f"CountryFlags/{country_name}_flag.png"))
-
-    wordcloud = WordCloud(mask=background_flag_mask, background_color="white",
-                          stopwords = STOPWORDS, max_words = num_words).generate(text)
-    colors = ImageColorGenerator(background_flag_mask)
-
-    colored_cloud = wordcloud.recolor(color_func = colors)
-
-    plt.figure(figsize = (20, 20))
-    plt.axis('off')
-    plt.imshow(colored_cloud)
-
-def create_word_cloud_certain_months(country_name, start_month, end_month):
+def create_word_cloud_certain_months(country_name, start_month, end_month,
+                                     preview=False):
     """
     Create a wordcloud based on the headlines collected about a country for
     a set range of months.
@@ -86,66 +65,30 @@ def create_word_cloud_certain_months(country_name, start_month, end_month):
         YYYYMM format.
         end_month: A string representing the end month of headliens in YYYYMM
         format.
+        preview: A boolean that is True to draw on a smaller copy of the flag
+        (see flags.PREVIEW_SIZE), which is quicker. (Optional).
     Returns:
         None.
     """
+    _, axis = plt.subplots(figsize = WORD_CLOUD_SIZE)
+    draw_word_cloud(axis, country_name, start_month, end_month, preview)
 
-    country_dataframe = pd.read_csv(f"CountryData/{country_name}_data.csv")
-
-    begin_index = country_dataframe.index[
-        country_dataframe['MM-YYYY'] == f"{start_month[4:]}-{start_month[0:4]}"
-        ][0]
-    end_index = country_dataframe.index[
-        country_dataframe["MM-YYYY"] == f"{end_month[4:]}-{end_month[0:4]}"
-        ][0]
-
-    text = ""
-    for index in range(begin_index, end_index + 1):
-        month = country_dataframe["MM-YYYY"][index][0:2]
-        year = country_dataframe["MM-YYYY"][index][3:]
-        text += headline_list_to_string(country_name, year + month)
-        text += " "
-
-    background_flag_mask = np.array(Image.open(f"CountryFlags/{country_name}_flag.png"))
-
-    wordcloud = WordCloud(mask=background_flag_mask, background_color="white",
-                          stopwords = STOPWORDS,
-                          max_words = len(text.split())).generate(text)
-    colors = ImageColorGenerator(background_flag_mask)
-
-    colored_cloud = wordcloud.recolor(color_func = colors)
-
-    plt.figure(figsize = (20, 20))
-    plt.axis('off')
-    plt.imshow(colored_cloud)
-
-def create_word_cloud_all(country_name):
+def create_word_cloud_all(country_name, preview=False):
     """
     Create a wordcloud based on all the headlines collected about the country.
 
     Args:
         country_name: A string representing the name of the country for which
         to create the wordcloud.
+        preview: A boolean that is True to draw on a smaller copy of the flag
+        (see flags.PREVIEW_SIZE), which is quicker. (Optional).
     Returns:
         None.
     """
+    _, axis = plt.subplots(figsize = WORD_CLOUD_SIZE)
+    draw_word_cloud(axis, country_name, preview=preview)
 
-    text = all_headlines_in_string(country_name)
-    num_words = len(text.split())
-
-    background_flag_mask = np.array(Image.open(f"CountryFlags/{country_name}_flag.png"))
-
-    wordcloud = WordCloud(mask=background_flag_mask, background_color="white",
-                          stopwords = STOPWORDS, max_words = num_words).generate(text)
-    colors = ImageColorGenerator(background_flag_mask)
-
-    colored_cloud = wordcloud.recolor(color_func = colors)
-
-    plt.figure(figsize = (20, 20))
-    plt.axis('off')
-    plt.imshow(colored_cloud)
-
-def create_bubble_chart(country_name):
+def create_bubble_chart(country_name, period="auto"):
     """
     Create a bubble chart for a country based on number of hits and sentiment
     score over time.
@@ -153,37 +96,31 @@ def create_bubble_chart(country_name):
     Args:
         country_name: A string representing the name of the country for which
         to create a chart.
+        period: A string, "month", "quarter" or "year", to add up each period
+        into one bubble, or "auto" to choose one that fits the chart.
+        (Optional).
     Returns:
         None.
     """
+    _, axis = plt.subplots(figsize = CHART_SIZE)
+    draw_bubble_chart(axis, country_name, period)
 
-    if country_name[-7 :] == "_subset":
-        name = country_name[: -7]
-    else:
-        name = country_name
-
-    country_data = pd.read_csv(f"CountryData/{country_name}_data.csv")
-    num_entries = len(country_data["Country Name"])
-
-    begin_date = country_data["MM-YYYY"][0]
-    end_date = country_data["MM-YYYY"][num_entries - 1]
-
-    _, axis = plt.subplots(figsize = (20, 10))
-    scatterplot = axis.scatter(country_data['MM-YYYY'], country_data["Sentiment Score (-1 to 1)"],
-              s = 10 * country_data["Number of Hits"], alpha = .5, color = 'purple')
-
-    axis.set_xlabel('Time Frame (MM-YYYY)', fontsize = 20)
-    axis.set_ylabel('Sentiment Score (-1 to 1)', fontsize = 20)
-    axis.set_title(f"New York Times Mentions and Sentiment for {name} from " \
-              f"{begin_date} to {end_date}", fontsize = 20)
-
-    handles, labels = scatterplot.legend_elements(prop = "sizes",
-    alpha = 0.5, color = "purple", num = 4)
-    axis.legend(handles, labels, title = "Number of Hits Times Ten",
-    labelspacing = 3, handletextpad = 5, borderpad = 3, bbox_to_anchor = (1, 1))
-
-    axis.xaxis.set_major_locator(plt.MaxNLocator(30))
-    axis.xaxis.labelpad = 30
-    axis.yaxis.labelpad = 30
+def create_comparison_chart(country_names, metric="hits", normalization=None,
+                            window=1):
+    """
+    Create a chart comparing several countries over time, with a line for
+    each country.
 
-    plt.xticks(rotation = 45)
+    Args:
+        country_names: A list of strings of the names of the countries.
+        metric: A string, "hits", "sentiment" or "magnitude". (Optional).
+        normalization: A string, "zscore", "peak" or "share", to scale each
+        country's series so countries of different sizes can be compared.
+        (Optional).
+        window: An int representing the number of months to average each
+        point over. (Optional).
+    Returns:
+        None.
+    """
+    _, axis = plt.subplots(figsize = CHART_SIZE)
+    draw_comparison_chart(axis, country_names, metric, normalization, window)
@@ -0,0 +1,197 @@
+"""
+This module deals with writing collected months to a country's csv file.
+
+A DatasetWriter keeps the months it is given in memory and writes them in
+batches, instead of reading the whole file again for every month. Each batch
+is merged into the file by month, so collecting a month again replaces its row
+rather than adding a second one, and the months are kept in order. The merged
+file is written to a temporary file and renamed into place, so readers never
+see half of it, while a lock on a file next to it lets several processes
+write to the same country one batch at a time. Locking needs the fcntl module,
+which is only on Unix; elsewhere batches are still written whole but not
+locked. Given a TermIndex, each written batch is also added to the index.
+"""
+import os
+from dataset import file_version
+from dates import to_year_months
+from lazy import lazy_import
+from metrics import timer
+from storage import HEADLINES, country_data_path, write_country_frame
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+pd = lazy_import("pandas")
+
+COLUMNS = ["Country Name", "MM-YYYY", "Number of Hits",
+           "Sentiment Score (-1 to 1)", "Magnitude", HEADLINES]
+COLLECTED_COLUMNS = ["Country Name", "Number of Hits", HEADLINES]
+
+# Months kept in memory before they are written. Collecting a month takes
+# several requests, so a batch is small compared to the time it took.
+BATCH_SIZE = 12
+
+def month_order(dates):
+    """
+    Give sort keys that put months in MM-YYYY format in time order.
+
+    Args:
+        dates: A pandas Index or Series of strings in MM-YYYY format.
+
+    Returns:
+        The same dates rearranged to YYYYMM format.
+    """
+    return pd.Index(to_year_months(dates))
+
+class FileLock:
+    """
+    An exclusive lock shared between processes, held on a separate lock file
+    for as long as the lock is entered as a context manager.
+    """
+
+    def __init__(self, filepath):
+        """
+        Args:
+            filepath: A string representing the path of the lock file.
+        """
+        self.filepath = filepath
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.filepath, "a", encoding="utf-8") # pylint: disable=consider-using-with
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+class DatasetWriter:
+    """
+    Buffers the collected months of one country and writes them to its csv
+    file in batches.
+
+    Attributes:
+        country_name: A string representing the name of the country.
+        filepath: A string representing the path of the csv file.
+        batch_size: An int representing how many months are kept before they
+        are written.
+    """
+
+    def __init__(self, country_name, batch_size=BATCH_SIZE, index=None):
+        """
+        Args:
+            country_name: A string representing the name of the country.
+            batch_size: An int representing how many months are kept before
+            they are written. (Optional).
+            index: A TermIndex from the search module to add each batch of
+            months to once it is written. (Optional).
+        """
+        self.country_name = country_name
+        self.filepath = country_data_path(country_name)
+        self.batch_size = batch_size
+        self.index = index
+        self._rows = {}
+        self._lock = FileLock(self.filepath + ".lock")
+        # The file's contents as of this writer's last write, and the version
+        # of the file they belong to, so it is only read again if another
+        # writer has changed it since.
+        self._frame = None
+        self._version = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def write(self, date, num_hits, headlines):
+        """
+        Add one month, writing the batch if it is full.
+
+        Args:
+            date: A string representing the month in MM-YYYY format.
+            num_hits: An int representing the number of hits for the month.
+            headlines: A list containing all of the headlines for the month.
+
+        Returns:
+            A list of the months written to the file, in MM-YYYY format,
+            empty if the month was only buffered.
+        """
+        self._rows[date] = [self.country_name, num_hits, list(headlines)]
+        if len(self._rows) >= self.batch_size:
+            return self.flush()
+        return []
+
+    def written_months(self):
+        """
+        Find the months the file has rows for.
+
+        Returns:
+            A set of strings representing months in the format YYYYMM.
+        """
+        return set(to_year_months(self._read()["MM-YYYY"]).tolist())
+
+    def _read(self):
+        """
+        Give the file's rows, without the empty row left by
+        obtaining.reset_data_entries.
+        """
+        if not os.path.exists(self.filepath):
+            return pd.DataFrame(columns=COLUMNS)
+        version = file_version(self.filepath)
+        if self._frame is None or version != self._version:
+            with timer("stage_seconds", stage="read"):
+                frame = pd.read_csv(self.filepath)
+            self._frame = frame[frame["Country Name"].notna()]
+        return self._frame
+
+    def flush(self):
+        """
+        Merge the buffered months into the file.
+
+        Returns:
+            A list of the months written, in MM-YYYY format.
+        """
+        if not self._rows:
+            return []
+
+        new_rows = pd.DataFrame.from_dict(
+            {date: [country_name, num_hits, str(headlines)] for date,
+             (country_name, num_hits, headlines) in self._rows.items()},
+            orient="index", columns=COLLECTED_COLUMNS)
+        with self._lock:
+            frame = self._read().astype(
+                dict.fromkeys(COLLECTED_COLUMNS, object)).set_index("MM-YYYY")
+            frame = frame.reindex(frame.index.append(
+                new_rows.index.difference(frame.index, sort=False)))
+            frame.loc[new_rows.index, COLLECTED_COLUMNS] = new_rows
+            frame = frame.sort_index(key=month_order, kind="stable")
+            frame.index.name = "MM-YYYY"
+            frame = frame.reset_index()
+            # Columns written by later stages, such as the headline shares
+            # of sentiment scoring, are kept after the collected ones.
+            frame = frame.reindex(columns=COLUMNS + [
+                column for column in frame.columns if column not in COLUMNS])
+            frame["Number of Hits"] = frame["Number of Hits"].astype("Int64")
+
+            write_country_frame(self.country_name, frame)
+            self._frame = frame
+            self._version = file_version(self.filepath)
+
+        if self.index is not None:
+            self.index.add_months(self.country_name, zip(
+                to_year_months(list(self._rows)),
+                [row[2] for row in self._rows.values()]))
+
+        written = list(self._rows)
+        self._rows = {}
+        return written